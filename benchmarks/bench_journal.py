@@ -0,0 +1,68 @@
+"""
+Measure order journal commit throughput for several group commit sizes,
+and how fast a store is rebuilt from a snapshot plus a journal.
+
+Run from the repository root:
+    python benchmarks/bench_journal.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from journal import OrderJournal  # noqa: E402
+from journal import replay  # noqa: E402
+from products import Product  # noqa: E402
+from snapshot import save_snapshot  # noqa: E402
+from store import Store  # noqa: E402
+
+PRODUCTS = 10000
+ORDERS = 20000
+GROUP_SIZES = [1, 16, 256]
+
+
+def make_store() -> Store:
+    return Store([Product(f"SKU-{number:08d}", price=10, quantity=10 ** 9)
+                  for number in range(PRODUCTS)])
+
+
+def random_orders(store: Store) -> list:
+    random_gen = random.Random(0)
+    return [[(random_gen.choice(store.product), random_gen.randint(1, 3))
+             for _ in range(random_gen.randint(1, 5))]
+            for _ in range(ORDERS)]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot_path = os.path.join(directory, 'inventory.snap')
+        print(f'{"group size":>10} {"orders/sec":>12} {"fsyncs":>8}')
+        for group_size in GROUP_SIZES:
+            store = make_store()
+            save_snapshot(store, snapshot_path)
+            orders = random_orders(store)
+            journal_path = os.path.join(directory, f'{group_size}.journal')
+            store.journal = OrderJournal(journal_path, group_size=group_size,
+                                         group_interval=1.0)
+            count = ORDERS if group_size > 1 else ORDERS // 10
+            start = time.perf_counter()
+            for shopping_list in orders[:count]:
+                store.place_order(shopping_list)
+            store.journal.close()
+            elapsed = time.perf_counter() - start
+            print(f'{group_size:>10} {count / elapsed:>12.0f} '
+                  f'{store.journal.syncs:>8}')
+
+        start = time.perf_counter()
+        replay(snapshot_path, journal_path)
+        elapsed = time.perf_counter() - start
+        print(f'replayed {PRODUCTS} products + {ORDERS} orders in '
+              f'{elapsed:.3f}s')
+
+
+if __name__ == '__main__':
+    main()
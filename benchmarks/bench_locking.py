@@ -0,0 +1,61 @@
+"""
+Compare order throughput of a Store shared by many threads, locked with
+one global lock or with striped per-product locks.
+
+Run from the repository root:
+    python benchmarks/bench_locking.py
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from products import Product  # noqa: E402
+from store import Store  # noqa: E402
+
+PRODUCTS = 1000
+THREADS = 8
+ORDERS_PER_THREAD = 5000
+
+
+def run(lock_stripes: int) -> float:
+    """
+    This function runs the same random orders from many threads against a
+    fresh store and returns the number of orders per second
+    :param lock_stripes: int
+    :return: float
+    """
+    product_list = [Product(f"Item {number}", price=1, quantity=10 ** 9)
+                    for number in range(PRODUCTS)]
+    store = Store(product_list, lock_stripes=lock_stripes)
+
+    def shopper(seed):
+        random_gen = random.Random(seed)
+        for _ in range(ORDERS_PER_THREAD):
+            store.place_order([(random_gen.choice(product_list),
+                                random_gen.randint(1, 3))
+                               for _ in range(random_gen.randint(1, 5))])
+
+    threads = [threading.Thread(target=shopper, args=(seed,))
+               for seed in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return THREADS * ORDERS_PER_THREAD / (time.perf_counter() - start)
+
+
+def main():
+    for label, lock_stripes in (('global lock', 1),
+                                ('striped, 64 locks', 64),
+                                ('striped, 1024 locks', 1024)):
+        print(f'{label:>20}: {run(lock_stripes):10.0f} orders/sec')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Compare adding up order totals as floats, as Decimals and as integer
+cents: the time to price a batch of orders and sum it, and the drift of
+the float sum from the exact total.
+
+Run from the repository root:
+    python benchmarks/bench_money.py
+"""
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import money  # noqa: E402
+import promotions  # noqa: E402
+from products import Product  # noqa: E402
+from store import Store  # noqa: E402
+
+PRODUCTS = 1000
+ORDERS = 100000
+PROMOTIONS = [None, promotions.SecondHalfPrice("Second Half!"),
+              promotions.ThirdOneFree("Third One Free!"),
+              promotions.PercentDiscount("30% off!", percent=30)]
+
+
+def make_store() -> Store:
+    random_gen = random.Random(0)
+    product_list = []
+    for number in range(PRODUCTS):
+        product = Product(f"SKU-{number:08d}",
+                          price=random_gen.randint(1, 99999) / 100,
+                          quantity=10 ** 12)
+        product.promotion = PROMOTIONS[number % len(PROMOTIONS)]
+        product_list.append(product)
+    return Store(product_list)
+
+
+def random_orders(store: Store) -> list:
+    random_gen = random.Random(1)
+    return [[(random_gen.choice(store.product), random_gen.randint(1, 4))
+             for _ in range(random_gen.randint(1, 5))]
+            for _ in range(ORDERS)]
+
+
+def timed(function):
+    start = time.perf_counter()
+    value = function()
+    return value, time.perf_counter() - start
+
+
+def main():
+    store = make_store()
+    orders = random_orders(store)
+
+    float_results, float_time = timed(lambda: store.place_orders(orders))
+    cents_results, cents_time = timed(
+        lambda: store.place_orders(orders, cents=True))
+
+    float_totals = [result.total_price for result in float_results]
+    cents_totals = [result.total_price for result in cents_results]
+    float_sum, float_sum_time = timed(lambda: sum(float_totals))
+    decimal_sum, decimal_sum_time = timed(
+        lambda: sum(Decimal(str(total)) for total in float_totals))
+    cents_sum, cents_sum_time = timed(lambda: sum(cents_totals))
+
+    print(f'{ORDERS} orders')
+    print(f'{"":<10} {"price batch":>12} {"sum totals":>12} {"total":>20}')
+    print(f'{"float":<10} {float_time:>11.3f}s {float_sum_time:>11.4f}s '
+          f'{float_sum!r:>20}')
+    print(f'{"Decimal":<10} {"":>12} {decimal_sum_time:>11.4f}s '
+          f'{str(decimal_sum):>20}')
+    print(f'{"cents":<10} {cents_time:>11.3f}s {cents_sum_time:>11.4f}s '
+          f'{money.format_cents(cents_sum):>20}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Compare startup cost of building a catalog eagerly, as main.main() does,
+with loading it from a memory-mapped binary snapshot.
+
+Run from the repository root:
+    python benchmarks/bench_snapshot.py [catalog size ...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import promotions  # noqa: E402
+from products import Product  # noqa: E402
+from snapshot import Snapshot  # noqa: E402
+from snapshot import save_snapshot  # noqa: E402
+from store import Store  # noqa: E402
+
+SIZES = [10 ** 4, 10 ** 5, 10 ** 6]
+LOOKUPS = 1000
+
+
+def rows(size: int) -> list:
+    """
+    This function returns plain catalog data, as parsed from a source
+    :param size: int
+    :return: list of (name, price, quantity) tuples
+    """
+    random_gen = random.Random(size)
+    return [(f"SKU-{number:08d}", round(random_gen.uniform(1, 2000), 2),
+             random_gen.randint(0, 1000)) for number in range(size)]
+
+
+def eager(catalog: list) -> Store:
+    """
+    This function builds every product up front like main.main() does
+    :param catalog: list of (name, price, quantity) tuples
+    :return: Store
+    """
+    promotion = promotions.ThirdOneFree("Third One Free!")
+    product_list = []
+    for name, price, quantity in catalog:
+        product = Product(name, price=price, quantity=quantity)
+        product.promotion = promotion
+        product_list.append(product)
+    return Store(product_list)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or SIZES
+    print(f'{"size":>10} {"eager":>10} {"snapshot open":>14} '
+          f'{"open+lookups":>13} {"snapshot->Store":>16} {"file MB":>8}')
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            catalog = rows(size)
+            store, eager_time = timed(eager, catalog)
+            path = os.path.join(directory, f'{size}.snap')
+            save_snapshot(store, path)
+            del store
+
+            snapshot, open_time = timed(Snapshot, path)
+            picks = random.Random(0).sample(range(size), min(LOOKUPS, size))
+            _, lookup_time = timed(lambda: [snapshot[pick]
+                                            for pick in picks])
+            snapshot.close()
+
+            with Snapshot(path) as snapshot:
+                _, store_time = timed(snapshot.to_store)
+            print(f'{size:>10} {eager_time:>9.3f}s {open_time:>13.6f}s '
+                  f'{open_time + lookup_time:>12.4f}s {store_time:>15.3f}s '
+                  f'{os.path.getsize(path) / 2 ** 20:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
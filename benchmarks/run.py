@@ -0,0 +1,205 @@
+"""
+Benchmark suite for the catalog, ordering and promotion hot paths.
+
+Every benchmark reports the best time per operation over several repeats.
+Results are written as JSON so runs can be compared, and a run can be
+checked against a saved baseline to flag regressions.
+
+Run from the repository root:
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --sizes 100 1000000 --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import promotions  # noqa: E402
+from products import Product  # noqa: E402
+from store import Store  # noqa: E402
+
+DEFAULT_SIZES = [10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5]
+ALL_SIZES = [10 ** exponent for exponent in range(2, 8)]
+ORDER_LINES = 100
+REPEATS = 5
+MIN_TIME = 0.05  # seconds each repeat runs for at least
+
+PROMOTIONS = {
+    'none': lambda: None,
+    'SecondHalfPrice': lambda: promotions.SecondHalfPrice("Second Half!"),
+    'ThirdOneFree': lambda: promotions.ThirdOneFree("Third One Free!"),
+    'PercentDiscount': lambda: promotions.PercentDiscount("30% off!",
+                                                          percent=30),
+}
+
+
+def measure(operation, setup=None) -> float:
+    """
+    This function returns the best time in seconds of one call of an
+    operation. Each repeat calls it in a loop for at least MIN_TIME.
+    :param operation: function without arguments
+    :param setup: function - optional -> called before every repeat
+    :return: float
+    """
+    best = float('inf')
+    for _ in range(REPEATS):
+        if setup is not None:
+            setup()
+        calls = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < MIN_TIME:
+            operation()
+            calls += 1
+            elapsed = time.perf_counter() - start
+        best = min(best, elapsed / calls)
+    return best
+
+
+def make_catalog(size: int) -> list:
+    """
+    This function builds a catalog mixing all promotion classes
+    :param size: int
+    :return: list of product objects
+    """
+    promotion_list = [factory() for factory in PROMOTIONS.values()]
+    product_list = []
+    for number in range(size):
+        product = Product(f"SKU-{number:08d}", price=10 + number % 990,
+                          quantity=10 ** 12)
+        product.promotion = promotion_list[number % len(promotion_list)]
+        product_list.append(product)
+    return product_list
+
+
+def bench_buy() -> dict:
+    """
+    This function times Product.buy with and without each promotion class
+    :return: dict of benchmark name -> seconds per call
+    """
+    results = {}
+    for name, factory in PROMOTIONS.items():
+        product = Product("Example Product", price=10.99, quantity=10 ** 12)
+        product.promotion = factory()
+        results[f'Product.buy[{name}]'] = measure(lambda: product.buy(3))
+    return results
+
+
+def bench_store(size: int) -> dict:
+    """
+    This function times the store operations on a catalog of a given size
+    :param size: int
+    :return: dict of benchmark name -> seconds per call
+    """
+    product_list = make_catalog(size)
+    store = Store(product_list)
+    other = Store(make_catalog(min(size, 1000)))
+    step = max(1, size // ORDER_LINES)
+    shopping_list = [(product_list[(line * step) % size], 1)
+                     for line in range(ORDER_LINES)]
+    probe = product_list[size // 2].name
+
+    def check_observers():
+        # Only store itself may still be tracking its products
+        if len(product_list[-1]._observers) != 1:
+            raise RuntimeError("Merged stores are kept alive by products.")
+
+    def toggle():
+        # Changing the active set makes the next listing rebuild its view
+        product_list[0].active = not product_list[0].active
+
+    return {
+        f'Store.order[{ORDER_LINES} lines]':
+            measure(lambda: store.order(shopping_list)),
+        'Store.get_all_products': measure(store.get_all_products),
+        'Store.get_all_products[after change]':
+            measure(lambda: (toggle(), store.get_all_products())),
+        'Store.get_total_quantity': measure(store.get_total_quantity),
+        'Store.__contains__': measure(lambda: probe in store),
+        # Every merged store is dropped right after the call and products
+        # hold their stores weakly, so the stores merged during the timing
+        # loop do not pile up on the shared products and slow later calls
+        'Store.__add__[+1000]': measure(lambda: store + other,
+                                        setup=check_observers),
+    }
+
+
+def run(sizes) -> dict:
+    """
+    This function runs every benchmark and returns the results document
+    :param sizes: list of catalog sizes
+    :return: dict
+    """
+    results = {name: {'1': seconds} for name, seconds in bench_buy().items()}
+    for size in sizes:
+        print(f'catalog size {size}...', file=sys.stderr)
+        for name, seconds in bench_store(size).items():
+            results.setdefault(name, {})[str(size)] = seconds
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """
+    This function lists the benchmarks which got slower than the baseline
+    by more than the threshold
+    :param current: results document
+    :param baseline: results document
+    :param threshold: float - allowed slowdown, 0.25 is 25%
+    :return: list of (name, size, baseline seconds, current seconds)
+    """
+    regressions = []
+    for name, by_size in current['results'].items():
+        for size, seconds in by_size.items():
+            before = baseline['results'].get(name, {}).get(size)
+            if before and seconds > before * (1 + threshold):
+                regressions.append((name, size, before, seconds))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=DEFAULT_SIZES,
+                        help='catalog sizes, default 10^2 to 10^5')
+    parser.add_argument('--all-sizes', action='store_true',
+                        help='catalog sizes 10^2 to 10^7')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='slowdown flagged as regression, default 0.25')
+    args = parser.parse_args(argv)
+
+    current = run(ALL_SIZES if args.all_sizes else args.sizes)
+    for name, by_size in current['results'].items():
+        for size, seconds in by_size.items():
+            print(f'{name:<40} {size:>10} {seconds * 1e6:>14.3f} us')
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(current, output_file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(current, json.load(baseline_file),
+                                  args.threshold)
+        for name, size, before, seconds in regressions:
+            print(f'REGRESSION {name} [{size}]: {before * 1e6:.3f} us -> '
+                  f'{seconds * 1e6:.3f} us')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+import numpy as np
+
+from products import Product
+from products import NonStockedProduct
+from products import LimitedProduct
+
+# Product kinds stored in the kind column
+KIND_STOCKED = 0
+KIND_NON_STOCKED = 1
+KIND_LIMITED = 2
+
+# Promotion id used for rows without a promotion
+NO_PROMOTION = -1
+
+
+# Class to create lightweight product views on a columnar store row
+class ProductView(Product):
+    def __init__(self, store, row: int) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        The view holds no product data itself, every field is read from
+        and written to the columns of the store.
+        :param store: ColumnarStore - mandatory
+        :param row: int - mandatory
+        """
+        self._store = store
+        self._row = row
+        self._observers = ()
+
+    def __str__(self) -> str:
+        """
+        This function returns the item as the matching product class would
+        :return: str
+        """
+        if self.kind == KIND_NON_STOCKED:
+            return NonStockedProduct.__str__(self)
+        return Product.__str__(self)
+
+    def __repr__(self) -> str:
+        return f'<ProductView row={self._row} {self.name!r}>'
+
+    @property
+    def row(self) -> int:
+        """
+        This function returns the row of the product in its store
+        :return: int
+        """
+        return self._row
+
+    @property
+    def kind(self) -> int:
+        """
+        This function returns the product kind stored for the row
+        :return: int
+        """
+        return int(self._store._kinds[self._row])
+
+    @property
+    def name(self) -> str:
+        return self._store._names[self._row]
+
+    @property
+    def price(self) -> float:
+        return float(self._store._prices[self._row])
+
+    @property
+    def maximum(self) -> int:
+        return int(self._store._maximums[self._row])
+
+    @property
+    def quantity(self) -> int:
+        return int(self._store._quantities[self._row])
+
+    @quantity.setter
+    def quantity(self, quantity: int) -> None:
+        """
+        This function sets new quantity of the row. If the updated quantity
+        is ZERO the row is deactivated, like Product.quantity does.
+        :param quantity: int
+        :return: None
+        """
+        if not isinstance(quantity, int):
+            raise TypeError("Invalid quantity type. Expected int.")
+        self._store._quantities[self._row] = quantity
+        if quantity == 0:
+            self._store._active[self._row] = False
+
+    @property
+    def active(self) -> bool:
+        return bool(self._store._active[self._row])
+
+    @active.setter
+    def active(self, value: bool) -> None:
+        self._store._active[self._row] = value
+
+    @property
+    def promotion(self):
+        promotion_id = self._store._promotion_ids[self._row]
+        if promotion_id == NO_PROMOTION:
+            return None
+        return self._store.promotions[promotion_id]
+
+    @promotion.setter
+    def promotion(self, promotion) -> None:
+        self._store._promotion_ids[self._row] = \
+            self._store._promotion_id(promotion)
+
+    def get_price(self, quantity: int = 1) -> float:
+        """
+        This function prices the quantity with the rules of the product
+        class the row was created from, without changing the stock.
+        :param quantity: int
+        :return: total_price: float
+        """
+        if self.kind == KIND_LIMITED:
+            return LimitedProduct.get_price(self, quantity)
+        # Views are short-lived and the row can change under them, so the
+        # pricing is compiled on every call and never memoized
+        return self._build_pricer()(quantity)
+
+    def get_price_cents(self, quantity: int = 1) -> int:
+        """
+        This function prices the quantity in whole cents, see get_price
+        :param quantity: int
+        :return: total_price: int
+        """
+        if self.kind == KIND_LIMITED:
+            return LimitedProduct.get_price_cents(self, quantity)
+        return self._build_cents_pricer()(quantity)
+
+    def stock_needed(self, quantity: int = 1) -> int:
+        """
+        This function returns how many units buying the quantity takes
+        from the stock of the row
+        :param quantity: int
+        :return: int
+        """
+        if self.kind == KIND_NON_STOCKED:
+            return 0
+        if self.kind == KIND_LIMITED:
+            return self.maximum
+        return quantity
+
+    def buy(self, quantity: int = 1, cents: bool = False) -> float:
+        """
+        This function buys the quantity with the rules of the product
+        class the row was created from, and returns the total price.
+        :param quantity: int
+        :param cents: bool - optional -> return the price in whole cents
+        :return: total_price: float, or int with cents
+        """
+        if self.kind == KIND_NON_STOCKED:
+            return NonStockedProduct.buy(self, quantity, cents)
+        if self.kind == KIND_LIMITED:
+            return LimitedProduct.buy(self, quantity, cents)
+        return Product.buy(self, quantity, cents)
+
+
+# Class to create stores keeping products in parallel NumPy columns
+class ColumnarStore:
+    def __init__(self, product=(), capacity: int = 16) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        Products are copied into the columns, the objects are not kept.
+        :param product: iterable of product objects - optional
+        :param capacity: int - optional -> initial number of rows
+        """
+        capacity = max(capacity, 1)
+        self._size = 0
+        self._names = []
+        self._rows = {}  # product name / SKU -> row
+        self._prices = np.zeros(capacity, dtype=np.float64)
+        self._quantities = np.zeros(capacity, dtype=np.int64)
+        self._active = np.zeros(capacity, dtype=np.bool_)
+        self._kinds = np.zeros(capacity, dtype=np.int8)
+        self._maximums = np.zeros(capacity, dtype=np.int64)
+        self._promotion_ids = np.full(capacity, NO_PROMOTION, dtype=np.int32)
+        self.promotions = []  # promotion id -> promotion object
+        self._promotion_lookup = {}  # id(promotion) -> promotion id
+        for item in product:
+            self.add_product(item)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, product_name) -> bool:
+        """
+        Check if an active product with the given name exists in the store.
+        :param product_name: str or product object
+        :return: bool
+        """
+        if not isinstance(product_name, str):
+            product_name = product_name.name
+        row = self._rows.get(product_name)
+        return row is not None and bool(self._active[row])
+
+    # Read-only views on the used part of every column
+    @property
+    def names(self) -> list:
+        return self._names
+
+    @property
+    def prices(self):
+        return self._prices[:self._size]
+
+    @property
+    def quantities(self):
+        return self._quantities[:self._size]
+
+    @property
+    def active(self):
+        return self._active[:self._size]
+
+    @property
+    def kinds(self):
+        return self._kinds[:self._size]
+
+    @property
+    def maximums(self):
+        return self._maximums[:self._size]
+
+    @property
+    def promotion_ids(self):
+        return self._promotion_ids[:self._size]
+
+    def _grow(self) -> None:
+        """
+        This function doubles the capacity of every column
+        :return: None
+        """
+        capacity = len(self._prices) * 2
+        for column in ('_prices', '_quantities', '_active', '_kinds',
+                       '_maximums', '_promotion_ids'):
+            old = getattr(self, column)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, column, new)
+
+    def _promotion_id(self, promotion) -> int:
+        """
+        This function returns the id of a promotion, registering it in the
+        promotion table the first time it is seen
+        :param promotion: Promotion object or None
+        :return: int
+        """
+        if promotion is None:
+            return NO_PROMOTION
+        promotion_id = self._promotion_lookup.get(id(promotion))
+        if promotion_id is None:
+            promotion_id = len(self.promotions)
+            self.promotions.append(promotion)
+            self._promotion_lookup[id(promotion)] = promotion_id
+        return promotion_id
+
+    def add_product(self, product) -> ProductView:
+        """
+        This function copies a product object into a new row
+        :param product: object
+        :return: ProductView on the new row
+        """
+        if product.name in self._rows:
+            raise ValueError("Product is already in store.")
+        if self._size == len(self._prices):
+            self._grow()
+        row = self._size
+        if isinstance(product, NonStockedProduct):
+            kind = KIND_NON_STOCKED
+        elif isinstance(product, LimitedProduct):
+            kind = KIND_LIMITED
+        else:
+            kind = KIND_STOCKED
+        self._names.append(product.name)
+        self._rows[product.name] = row
+        self._prices[row] = product.price
+        self._quantities[row] = product.quantity
+        self._active[row] = product.active
+        self._kinds[row] = kind
+        self._maximums[row] = getattr(product, 'maximum', 0)
+        self._promotion_ids[row] = self._promotion_id(product.promotion)
+        self._size += 1
+        return ProductView(self, row)
+
+    def row_of(self, name: str) -> int:
+        """
+        This function returns the row of the product with the given name
+        :param name: str
+        :return: int
+        """
+        return self._rows[name]
+
+    def rows_of(self, names):
+        """
+        This function returns the rows of several products as an array
+        :param names: iterable of str
+        :return: numpy array of rows
+        """
+        return np.fromiter((self._rows[name] for name in names),
+                           dtype=np.int64)
+
+    def get_product(self, name: str):
+        """
+        This function returns a view on the product with the given name,
+        or None if there is no such product
+        :param name: str
+        :return: ProductView or None
+        """
+        row = self._rows.get(name)
+        if row is None:
+            return None
+        return ProductView(self, row)
+
+    def get_total_quantity(self) -> int:
+        """
+        This function returns the total quantity of all items in store
+        :return: total_quantity: int
+        """
+        return int(self.quantities.sum())
+
+    def get_all_products(self) -> list:
+        """
+        This function returns views on the active products in store
+        :return: product_list: list
+        """
+        return [ProductView(self, int(row))
+                for row in np.flatnonzero(self.active)]
+
+    def order(self, shopping_list) -> float:
+        """
+        This function gets a list of (product, quantity) tuples and returns
+        the total price. Products can be views or any object with the name
+        of a product of this store.
+        :param shopping_list: list
+        :return: total_price: float
+        """
+        total_price: float = 0
+        for product, quantity in shopping_list:
+            if not isinstance(product, ProductView) or \
+                    product._store is not self:
+                product = ProductView(self, self._rows[product.name])
+            total_price += product.buy(quantity)
+        return total_price
+
+    def restock(self, rows, amounts, reactivate: bool = True) -> None:
+        """
+        This function adds stock to many rows at once. Rows may repeat.
+        :param rows: array of rows, or of product names
+        :param amounts: array of quantities to add, or one quantity for all
+        :param reactivate: bool - optional -> activate rows which have
+        stock after the restock
+        :return: None
+        """
+        rows = np.asarray(rows)
+        if rows.dtype.kind in 'UO':
+            rows = self.rows_of(rows.tolist())
+        amounts = np.broadcast_to(np.asarray(amounts, dtype=np.int64),
+                                  rows.shape)
+        if (amounts < 0).any():
+            raise ValueError("Restock amount cannot be negative.")
+        np.add.at(self._quantities, rows, amounts)
+        if reactivate:
+            restocked = rows[self._quantities[rows] > 0]
+            self._active[restocked] = True
+
+    def deactivate_out_of_stock(self) -> int:
+        """
+        This function deactivates every stocked product with no stock left
+        :return: number of products deactivated
+        """
+        sold_out = self.active & (self.quantities == 0) & \
+            (self.kinds != KIND_NON_STOCKED)
+        self._active[:self._size][sold_out] = False
+        return int(sold_out.sum())
+
+    def inventory_value(self) -> float:
+        """
+        This function returns the total value of the stock in store at
+        list prices
+        :return: float
+        """
+        return float(np.dot(self.prices, self.quantities))
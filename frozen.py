@@ -0,0 +1,242 @@
+import copy
+import weakref
+
+# Product fields the store is told about, see Product._notify
+FIELDS = ('quantity', 'active', 'price', 'promotion')
+
+
+# Class to create a point-in-time, read-only view of a store
+class FrozenStore:
+    def __init__(self, store) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        Use Store.snapshot(), which creates the view while the store is
+        locked. Nothing is copied: the store tells the view about every
+        change after it was taken, and the view keeps the value a product
+        field had before its first change. Taking the view is O(1) and it
+        costs memory only for what changed since.
+        :param store: Store object - mandatory
+        """
+        self._store = weakref.ref(store)
+        self._total_quantity = store._total_quantity
+        self._before = {}  # id(product) -> (product, {field: old value})
+        self._added = {}  # id(product) -> product added after the view
+        self._removed = []  # products removed after the view
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        This function stops the store from tracking changes for the view.
+        A closed view cannot be read anymore.
+        :return: None
+        """
+        store = self._store()
+        if store is not None:
+            store._snapshots.discard(self)
+        self._before.clear()
+        self._added.clear()
+        self._removed.clear()
+        self.closed = True
+
+    def _changed(self, product, field: str, old_value) -> None:
+        """
+        This function is called by the store with the lock held, before a
+        change of a product field is applied to its indexes. Only the first
+        change after the view was taken is kept.
+        :param product: object
+        :param field: str
+        :param old_value: value before the change
+        :return: None
+        """
+        if id(product) in self._added:
+            return
+        entry = self._before.get(id(product))
+        if entry is None:
+            entry = self._before[id(product)] = (product, {})
+        entry[1].setdefault(field, old_value)
+
+    def _product_added(self, product) -> None:
+        self._added[id(product)] = product
+
+    def _product_removed(self, product) -> None:
+        """
+        This function is called by the store when a product is removed.
+        The store stops hearing about the product, so every field of it
+        not changed so far is kept now.
+        :param product: object
+        :return: None
+        """
+        if self._added.pop(id(product), None) is not None:
+            return
+        for field in FIELDS:
+            self._changed(product, field, getattr(product, field))
+        self._removed.append(product)
+
+    def _locked(self):
+        store = self._store()
+        if self.closed or store is None:
+            raise ValueError("Snapshot is closed.")
+        return store, store._state_lock
+
+    def value_of(self, product, field: str):
+        """
+        This function returns a field of a product as it was when the view
+        was taken
+        :param product: object
+        :param field: str - 'quantity', 'active', 'price' or 'promotion'
+        :return: value of the field
+        """
+        store, lock = self._locked()
+        with lock:
+            return self._value(product, field, self._before)
+
+    @staticmethod
+    def _value(product, field: str, before):
+        entry = before.get(id(product))
+        if entry is not None and field in entry[1]:
+            return entry[1][field]
+        return getattr(product, field)
+
+    def _members(self):
+        """
+        This function returns the products the store had when the view was
+        taken, in store order, with the removed ones at the end, and a copy
+        of the values kept so far. Only the product list and what the view
+        tracked are copied with the store lock held, the products are read
+        after it is released, see _late_changes.
+        :return: tuple of (list of product objects, dict of
+        id(product) -> (product, {field: old value}))
+        """
+        store, lock = self._locked()
+        with lock:
+            products = list(store.product)
+            before = {key: (product, dict(fields))
+                      for key, (product, fields) in self._before.items()}
+            added = set(self._added)
+            removed = list(self._removed)
+        if added:
+            products = [item for item in products if id(item) not in added]
+        return products + removed, before
+
+    def _late_changes(self, before) -> dict:
+        """
+        This function returns the fields changed for the first time since
+        the values were copied by _members, with the value they had when
+        the view was taken. Products read without the store lock may show
+        these changes, the caller puts the old values back.
+        :param before: dict - values copied by _members
+        :return: dict of id(product) -> {field: old value}
+        """
+        store, lock = self._locked()
+        late = {}
+        with lock:
+            for key, (_, fields) in self._before.items():
+                known = before.get(key, (None, {}))[1]
+                if len(fields) > len(known):
+                    late[key] = {field: value for field, value
+                                 in fields.items() if field not in known}
+        return late
+
+    @staticmethod
+    def _frozen(product, before):
+        """
+        This function returns a copy of a product detached from any store,
+        holding the field values of the view
+        :param product: object
+        :param before: dict of id(product) -> (product, {field: old value})
+        :return: product object
+        """
+        frozen = copy.copy(product)
+        entry = before.get(id(product))
+        if entry is not None:
+            for field, value in entry[1].items():
+                setattr(frozen, f'_{field}', value)
+        return frozen
+
+    def _freeze(self, members, before) -> list:
+        """
+        This function returns copies of products holding the field values
+        of the view, see _frozen
+        :param members: list of product objects
+        :param before: dict - values copied by _members
+        :return: list of product objects
+        """
+        frozen = [self._frozen(item, before) for item in members]
+        late = self._late_changes(before)
+        if late:
+            for item, copied in zip(members, frozen):
+                for field, value in late.get(id(item), {}).items():
+                    setattr(copied, f'_{field}', value)
+        return frozen
+
+    @property
+    def product(self) -> list:
+        """
+        This function returns copies of all products as they were when the
+        view was taken, so a view can be saved like a store
+        :return: product_list: list
+        """
+        return self._freeze(*self._members())
+
+    def get_all_products(self) -> list:
+        """
+        This function returns copies of the products which were active when
+        the view was taken, in store order
+        :return: product_list: list
+        """
+        members, before = self._members()
+        # Skip the products known to have been inactive, the others may
+        # turn out to be when the late changes are put back
+        members = [item for item in members
+                   if before.get(id(item), (None, {}))[1].get('active', True)]
+        return [item for item in self._freeze(members, before)
+                if item.active]
+
+    def get_product(self, name: str):
+        """
+        This function returns a copy of the product with the given name as
+        it was when the view was taken, or None
+        :param name: str
+        :return: product object or None
+        """
+        store, lock = self._locked()
+        with lock:
+            for item in store._index.get(name, ()):
+                if id(item) not in self._added:
+                    return self._frozen(item, self._before)
+            for item in self._removed:
+                if item.name == name:
+                    return self._frozen(item, self._before)
+        return None
+
+    def get_total_quantity(self) -> int:
+        """
+        This function returns the total quantity in store when the view was
+        taken, in O(1)
+        :return: int
+        """
+        self._locked()
+        return self._total_quantity
+
+    def get_inventory_value(self) -> float:
+        """
+        This function returns the value of the stock in store when the view
+        was taken, the sum of price times quantity of every product
+        :return: float
+        """
+        members, before = self._members()
+        values = {id(item): (self._value(item, 'price', before),
+                             self._value(item, 'quantity', before))
+                  for item in members}
+        for key, fields in self._late_changes(before).items():
+            if key in values:
+                price, quantity = values[key]
+                values[key] = (fields.get('price', price),
+                               fields.get('quantity', quantity))
+        return sum(price * quantity for price, quantity in values.values())
@@ -0,0 +1,155 @@
+import math
+
+# Seconds a cart hold lasts unless a ttl is given
+HOLD_TTL = 15 * 60
+
+
+# Class to create a hierarchical timing wheel of deadlines
+class TimingWheel:
+    def __init__(self, tick: float = 1.0, slots: int = 64, levels: int = 4,
+                 start: float = 0.0) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        Level 0 has one slot per tick, every higher level has one slot per
+        turn of the level below. An entry goes to the lowest level whose
+        turn reaches its deadline and moves down a level each time its slot
+        comes up, so scheduling and cancelling are O(1) and every entry is
+        moved at most levels times. Deadlines are rounded up to whole ticks.
+        :param tick: float - optional -> seconds per level 0 slot
+        :param slots: int - optional -> slots per level
+        :param levels: int - optional
+        :param start: float - optional -> current time
+        """
+        if tick <= 0 or slots < 2 or levels < 1:
+            raise ValueError("Invalid timing wheel size.")
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._now = math.floor(start / tick)  # current tick
+        self._wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self._entries = {}  # key -> (slot dict, deadline tick, item)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def items(self) -> list:
+        """
+        This function returns every scheduled item, in no particular order
+        :return: list of (key, item) tuples
+        """
+        return [(key, entry[2]) for key, entry in self._entries.items()]
+
+    def schedule(self, key, item, deadline: float) -> None:
+        """
+        This function adds an item which is due at a deadline. An item
+        already due comes out of the next advance.
+        :param key: hashable - used to cancel the item
+        :param item: object
+        :param deadline: float - time the item is due
+        :return: None
+        """
+        self.cancel(key)
+        self._place(key, item, max(math.ceil(deadline / self.tick),
+                                   self._now + 1))
+
+    def _place(self, key, item, due: int) -> None:
+        """
+        This function puts an item in the slot of the lowest level whose
+        turn reaches its deadline tick
+        :param key: hashable
+        :param item: object
+        :param due: int - deadline tick, after the current tick
+        :return: None
+        """
+        delta = due - self._now
+        level = 0
+        span = self.slots
+        while delta >= span and level < self.levels - 1:
+            level += 1
+            span *= self.slots
+        slot = self._wheels[level][(due // (span // self.slots))
+                                   % self.slots]
+        slot[key] = item
+        self._entries[key] = (slot, due, item)
+
+    def cancel(self, key) -> bool:
+        """
+        This function drops a scheduled item
+        :param key: hashable
+        :return: bool - True if the item was scheduled
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        del entry[0][key]
+        return True
+
+    def advance(self, now: float) -> list:
+        """
+        This function moves the wheel to a time and returns the items which
+        became due, in deadline order
+        :param now: float
+        :return: list of (key, item) tuples
+        """
+        target = math.floor(now / self.tick)
+        expired = []
+        while self._now < target:
+            if not self._entries:
+                self._now = target
+                break
+            self._now += 1
+            # Bring the entries of the slots coming up down one level
+            span = 1
+            for level in range(1, self.levels):
+                span *= self.slots
+                if self._now % span:
+                    break
+                slot = self._wheels[level][(self._now // span) % self.slots]
+                moved = list(slot.items())
+                slot.clear()
+                for key, item in moved:
+                    due = self._entries[key][1]
+                    if due <= self._now:
+                        del self._entries[key]
+                        expired.append((key, item))
+                    else:
+                        self._place(key, item, due)
+            slot = self._wheels[0][self._now % self.slots]
+            for key, item in slot.items():
+                del self._entries[key]
+                expired.append((key, item))
+            slot.clear()
+        return expired
+
+
+# Class to create a hold of stock for a shopping cart
+class Hold:
+    def __init__(self, hold_id: int, lines, reserved,
+                 expires_at: float) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        Holds are created by Store.hold.
+        :param hold_id: int
+        :param lines: list of (product, quantity) tuples
+        :param reserved: dict of id(product) -> [product, units] held
+        :param expires_at: float - clock time the hold expires
+        """
+        self.hold_id = hold_id
+        self.lines = lines
+        self.reserved = reserved
+        self.expires_at = expires_at
+        self.state = 'held'  # 'held', 'ordered', 'released' or 'expired'
+
+    def __repr__(self) -> str:
+        return f'<Hold {self.hold_id} {self.state}: {len(self.lines)} lines>'
+
+    @property
+    def active(self) -> bool:
+        """
+        This function returns True while the stock is held
+        :return: bool
+        """
+        return self.state == 'held'
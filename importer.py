@@ -0,0 +1,236 @@
+import csv
+import json
+import os
+
+import promotions
+from products import Product
+from products import NonStockedProduct
+from products import LimitedProduct
+
+# Values of the "kind" column
+PRODUCT_KINDS = {
+    '': Product,
+    'product': Product,
+    'non_stocked': NonStockedProduct,
+    'limited': LimitedProduct,
+}
+
+# Values of the "promotion" column
+PROMOTION_TYPES = {
+    'second_half_price': promotions.SecondHalfPrice,
+    'third_one_free': promotions.ThirdOneFree,
+    'percent': promotions.PercentDiscount,
+}
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'no', 'n'}
+
+
+# Class to create the summary of a catalog import
+class ImportReport:
+    def __init__(self, max_errors: int = 100) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        Only the first max_errors bad rows are kept, the rest are counted,
+        so the report stays small for any feed size.
+        :param max_errors: int - optional
+        """
+        self.rows = 0
+        self.imported = 0
+        self.error_count = 0
+        self.errors = []  # (line number, message) of the first bad rows
+        self.max_errors = max_errors
+
+    def __repr__(self) -> str:
+        return f'<ImportReport rows={self.rows} imported={self.imported} ' \
+               f'errors={self.error_count}>'
+
+    def add_error(self, line_number: int, message: str) -> None:
+        """
+        This function records a bad row
+        :param line_number: int
+        :param message: str
+        :return: None
+        """
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line_number, message))
+
+
+def _detect_format(path) -> str:
+    """
+    This function guesses the feed format from the file extension
+    :param path: str or path-like
+    :return: 'csv' or 'jsonl'
+    """
+    extension = os.path.splitext(os.fspath(path))[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    raise ValueError(f"Cannot tell the format of {path}, pass feed_format.")
+
+
+def iter_rows(path, feed_format: str = None):
+    """
+    This function reads a CSV or JSON Lines feed one row at a time.
+    Rows which cannot be parsed are yielded as an exception instead of a
+    dict, so the caller can report them and go on.
+    :param path: str or path-like
+    :param feed_format: str - optional -> 'csv' or 'jsonl', by default
+    taken from the file extension
+    :return: generator of (line number, row dict or exception) tuples
+    """
+    feed_format = feed_format or _detect_format(path)
+    if feed_format == 'csv':
+        with open(path, newline='', encoding='utf-8') as feed:
+            reader = csv.DictReader(feed)
+            for row in reader:
+                if None in row or None in row.values():
+                    yield reader.line_num, ValueError(
+                        "Wrong number of columns.")
+                else:
+                    yield reader.line_num, row
+    elif feed_format == 'jsonl':
+        with open(path, encoding='utf-8') as feed:
+            for line_number, line in enumerate(feed, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as error:
+                    yield line_number, error
+                    continue
+                if not isinstance(row, dict):
+                    yield line_number, ValueError("Row is not an object.")
+                else:
+                    yield line_number, row
+    else:
+        raise ValueError(f"Unknown feed format {feed_format!r}.")
+
+
+def _field(row: dict, name: str, default=''):
+    """
+    This function returns a field of a row as stripped text, CSV rows
+    always hold text and JSON rows may not
+    :param row: dict
+    :param name: str
+    :param default: value for a missing or empty field
+    :return: str
+    """
+    value = row.get(name)
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value).strip() or default
+
+
+def _to_int(text: str, name: str) -> int:
+    try:
+        return int(text)
+    except ValueError:
+        raise ValueError(f"Invalid {name}: {text!r}.")
+
+
+def _to_float(text: str, name: str) -> float:
+    try:
+        value = float(text)
+    except ValueError:
+        raise ValueError(f"Invalid {name}: {text!r}.")
+    return int(value) if value.is_integer() else value
+
+
+def product_from_row(row: dict, promotion_cache: dict = None):
+    """
+    This function builds the product described by a feed row.
+    Columns: name, price, quantity, kind (product, non_stocked or limited),
+    maximum, active, promotion (second_half_price, third_one_free or
+    percent), promotion_name and percent.
+    :param row: dict
+    :param promotion_cache: dict - optional -> promotions built so far,
+    so products with the same promotion share one object
+    :return: product object
+    """
+    kind = _field(row, 'kind').lower()
+    if kind not in PRODUCT_KINDS:
+        raise ValueError(f"Unknown product kind: {kind!r}.")
+    name = _field(row, 'name')
+    price = _to_float(_field(row, 'price'), 'price')
+    active_text = _field(row, 'active', 'true').lower()
+    if active_text not in TRUE_VALUES | FALSE_VALUES:
+        raise ValueError(f"Invalid active: {active_text!r}.")
+    active = active_text in TRUE_VALUES
+
+    product_class = PRODUCT_KINDS[kind]
+    if product_class is NonStockedProduct:
+        product = NonStockedProduct(name, price, active=active)
+    else:
+        quantity = _to_int(_field(row, 'quantity'), 'quantity')
+        if product_class is LimitedProduct:
+            maximum = _to_int(_field(row, 'maximum', '1'), 'maximum')
+            if maximum < 1:
+                raise ValueError("Limited product maximum must be positive.")
+            product = LimitedProduct(name, price, quantity, maximum,
+                                     active=active)
+        else:
+            product = Product(name, price, quantity, active=active)
+
+    promotion_type = _field(row, 'promotion').lower()
+    if promotion_type:
+        if promotion_type not in PROMOTION_TYPES:
+            raise ValueError(f"Unknown promotion: {promotion_type!r}.")
+        promotion_name = _field(row, 'promotion_name') or promotion_type
+        percent = None
+        if promotion_type == 'percent':
+            percent = _to_float(_field(row, 'percent'), 'percent')
+        key = (promotion_type, promotion_name, percent)
+        if promotion_cache is None:
+            promotion_cache = {}
+        promotion = promotion_cache.get(key)
+        if promotion is None:
+            if percent is None:
+                promotion = PROMOTION_TYPES[promotion_type](promotion_name)
+            else:
+                promotion = promotions.PercentDiscount(promotion_name,
+                                                       percent)
+            promotion_cache[key] = promotion
+        product.promotion = promotion
+    return product
+
+
+def import_catalog(store, path, feed_format: str = None,
+                   batch_size: int = 1000,
+                   max_errors: int = 100) -> ImportReport:
+    """
+    This function streams a CSV or JSON Lines feed into a store. Rows are
+    read one at a time and added in batches, bad rows are reported and
+    skipped, so memory use does not depend on the size of the feed.
+    :param store: Store object
+    :param path: str or path-like
+    :param feed_format: str - optional -> 'csv' or 'jsonl'
+    :param batch_size: int - optional -> products added to the store at once
+    :param max_errors: int - optional -> bad rows kept in the report
+    :return: ImportReport
+    """
+    report = ImportReport(max_errors)
+    promotion_cache = {}
+    batch = []
+    for line_number, row in iter_rows(path, feed_format):
+        report.rows += 1
+        if isinstance(row, Exception):
+            report.add_error(line_number, str(row))
+            continue
+        try:
+            batch.append(product_from_row(row, promotion_cache))
+        except (ValueError, TypeError) as error:
+            report.add_error(line_number, str(error))
+            continue
+        if len(batch) >= batch_size:
+            store.add_products(batch)
+            report.imported += len(batch)
+            batch = []
+    if batch:
+        store.add_products(batch)
+        report.imported += len(batch)
+    return report
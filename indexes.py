@@ -0,0 +1,496 @@
+import re
+from bisect import bisect_left
+from bisect import insort
+from heapq import heappop
+from heapq import heappush
+from heapq import merge
+from itertools import chain
+from itertools import islice
+
+_HIGHEST = float('inf')
+_WORD = re.compile(r'\w+')
+
+# Entries per block of a SortedBlocks, a block is split at twice this size
+BLOCK_SIZE = 512
+
+
+def tokenize(text: str) -> list:
+    """
+    This function splits a product name or a search query into lower case
+    words
+    :param text: str
+    :return: list of str
+    """
+    return _WORD.findall(text.lower())
+
+
+# Class to create a sorted list kept in blocks, so adding or dropping one
+# entry moves the entries of one block instead of the whole list
+class SortedBlocks:
+    __slots__ = ('_block_size', '_blocks', '_maxes', '_len')
+
+    def __init__(self, entries=(), block_size: int = None) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        :param entries: iterable - optional -> entries in sorted order
+        :param block_size: int - optional -> BLOCK_SIZE by default
+        """
+        self._block_size = block_size or BLOCK_SIZE
+        self._build(list(entries))
+
+    def _build(self, entries: list) -> None:
+        """
+        This function replaces the content with sorted entries, in O(n)
+        :param entries: list - in sorted order
+        :return: None
+        """
+        size = self._block_size
+        if len(entries) <= size:
+            self._blocks = [entries] if entries else []
+        else:
+            self._blocks = [entries[start:start + size]
+                            for start in range(0, len(entries), size)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._len = len(entries)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self):
+        return chain.from_iterable(self._blocks)
+
+    def __reversed__(self):
+        return chain.from_iterable(reversed(block)
+                                   for block in reversed(self._blocks))
+
+    def add(self, entry) -> None:
+        """
+        This function adds an entry at its place, in O(log n + block size)
+        :param entry: object
+        :return: None
+        """
+        self._len += 1
+        if not self._blocks:
+            self._blocks.append([entry])
+            self._maxes.append(entry)
+            return
+        position = bisect_left(self._maxes, entry)
+        if position == len(self._maxes):
+            position -= 1
+        block = self._blocks[position]
+        insort(block, entry)
+        self._maxes[position] = block[-1]
+        size = self._block_size
+        if len(block) > 2 * size:
+            self._blocks[position:position + 1] = [block[:size],
+                                                   block[size:]]
+            self._maxes[position:position + 1] = [block[size - 1],
+                                                  block[-1]]
+
+    def update(self, entries) -> None:
+        """
+        This function adds many entries. Many entries at once are sorted
+        in with one sort of the whole list, which costs O(n) for the part
+        already in order.
+        :param entries: iterable
+        :return: None
+        """
+        entries = list(entries)
+        if len(entries) * 8 < self._len:
+            for entry in entries:
+                self.add(entry)
+        else:
+            entries.sort()
+            self._build(sorted(chain(self, entries)))
+
+    def remove(self, entry) -> None:
+        """
+        This function drops an entry, which must be in the list
+        :param entry: object
+        :return: None
+        """
+        position = bisect_left(self._maxes, entry)
+        block = self._blocks[position] if position < len(self._blocks) \
+            else ()
+        offset = bisect_left(block, entry)
+        if offset == len(block) or (block[offset] is not entry and
+                                    block[offset] != entry):
+            raise ValueError("Entry is not in the list.")
+        del block[offset]
+        self._len -= 1
+        if block:
+            self._maxes[position] = block[-1]
+        else:
+            del self._blocks[position]
+            del self._maxes[position]
+
+    def iter_from(self, entry):
+        """
+        This function yields the entries from the first one not below an
+        entry on, in order
+        :param entry: object
+        :return: generator
+        """
+        position = bisect_left(self._maxes, entry)
+        if position == len(self._blocks):
+            return
+        block = self._blocks[position]
+        yield from islice(block, bisect_left(block, entry), None)
+        for block in islice(self._blocks, position + 1, None):
+            yield from block
+
+    def between(self, low, high) -> list:
+        """
+        This function returns the entries with low <= entry <= high
+        :param low: object
+        :param high: object
+        :return: list
+        """
+        found = []
+        for entry in self.iter_from(low):
+            if entry > high:
+                break
+            found.append(entry)
+        return found
+
+    def first(self, count: int) -> list:
+        return list(islice(self, max(count, 0)))
+
+    def last(self, count: int) -> list:
+        return list(islice(reversed(self), max(count, 0)))
+
+
+# Class to create an index of products sorted by price
+class PriceIndex:
+    def __init__(self) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        Products are kept sorted by (price, id), so products with the same
+        price keep a fixed order.
+        """
+        self._sorted = SortedBlocks()  # (price, id(product), product)
+        self._entries = {}  # id(product) -> entry
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    def __contains__(self, product) -> bool:
+        return id(product) in self._entries
+
+    def __iter__(self):
+        return iter([entry[2] for entry in self._sorted])
+
+    def add(self, product) -> None:
+        """
+        This function adds a product, binary search finds its place
+        :param product: object
+        :return: None
+        """
+        if id(product) in self._entries:
+            return
+        entry = self._entries[id(product)] = (product.price, id(product),
+                                              product)
+        self._sorted.add(entry)
+
+    def add_many(self, products) -> None:
+        """
+        This function adds many products with one sort, see
+        SortedBlocks.update
+        :param products: iterable of product objects
+        :return: None
+        """
+        entries = []
+        for product in products:
+            if id(product) not in self._entries:
+                entry = self._entries[id(product)] = (product.price,
+                                                      id(product), product)
+                entries.append(entry)
+        self._sorted.update(entries)
+
+    def discard(self, product) -> None:
+        """
+        This function drops a product, if it is in the index
+        :param product: object
+        :return: None
+        """
+        entry = self._entries.pop(id(product), None)
+        if entry is not None:
+            self._sorted.remove(entry)
+
+    def update(self, product) -> None:
+        """
+        This function moves a product of the index to its new price
+        :param product: object
+        :return: None
+        """
+        if id(product) in self._entries:
+            self.discard(product)
+            self.add(product)
+
+    def between(self, low: float, high: float) -> list:
+        """
+        This function returns the products with low <= price <= high,
+        cheapest first, in O(log n + k)
+        :param low: float
+        :param high: float
+        :return: list of product objects
+        """
+        return [entry[2] for entry in
+                self._sorted.between((low,), (high, _HIGHEST))]
+
+    def cheapest(self, count: int) -> list:
+        """
+        This function returns the count cheapest products, cheapest first
+        :param count: int
+        :return: list of product objects
+        """
+        return [entry[2] for entry in self._sorted.first(count)]
+
+    def most_expensive(self, count: int) -> list:
+        """
+        This function returns the count most expensive products, most
+        expensive first
+        :param count: int
+        :return: list of product objects
+        """
+        return [entry[2] for entry in self._sorted.last(count)]
+
+
+# Class to create an indexed min-heap of products keyed by stock quantity
+class StockHeap:
+    def __init__(self) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        The heap remembers where every product sits, so a product whose
+        quantity changed moves to its new place in O(log n).
+        """
+        self._heap = []  # [(quantity, id(product)), product] entries
+        self._positions = {}  # id(product) -> position in the heap
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __contains__(self, product) -> bool:
+        return id(product) in self._positions
+
+    def _swap(self, first: int, second: int) -> None:
+        heap = self._heap
+        heap[first], heap[second] = heap[second], heap[first]
+        self._positions[id(heap[first][1])] = first
+        self._positions[id(heap[second][1])] = second
+
+    def _sift_up(self, position: int) -> None:
+        heap = self._heap
+        while position:
+            parent = (position - 1) // 2
+            if heap[position][0] >= heap[parent][0]:
+                break
+            self._swap(position, parent)
+            position = parent
+
+    def _sift_down(self, position: int) -> None:
+        heap = self._heap
+        size = len(heap)
+        while True:
+            smallest = position
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < size and heap[child][0] < heap[smallest][0]:
+                    smallest = child
+            if smallest == position:
+                return
+            self._swap(position, smallest)
+            position = smallest
+
+    def push(self, product) -> None:
+        """
+        This function adds a product to the heap
+        :param product: object
+        :return: None
+        """
+        if id(product) in self._positions:
+            return
+        self._heap.append([(product.quantity, id(product)), product])
+        self._positions[id(product)] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def discard(self, product) -> None:
+        """
+        This function drops a product from the heap, if it is there
+        :param product: object
+        :return: None
+        """
+        position = self._positions.get(id(product))
+        if position is None:
+            return
+        last = len(self._heap) - 1
+        if position != last:
+            self._swap(position, last)
+        self._heap.pop()
+        del self._positions[id(product)]
+        if position < len(self._heap):
+            self._sift_up(position)
+            self._sift_down(position)
+
+    def update(self, product) -> None:
+        """
+        This function moves a product of the heap to its new quantity
+        :param product: object
+        :return: None
+        """
+        position = self._positions.get(id(product))
+        if position is None:
+            return
+        old_key = self._heap[position][0]
+        new_key = (product.quantity, id(product))
+        self._heap[position][0] = new_key
+        if new_key < old_key:
+            self._sift_up(position)
+        else:
+            self._sift_down(position)
+
+    def smallest(self, count: int) -> list:
+        """
+        This function returns the count products with the lowest quantity,
+        lowest first, in O(count log count) without changing the heap
+        :param count: int
+        :return: list of product objects
+        """
+        heap = self._heap
+        found = []
+        frontier = [(heap[0][0], 0)] if heap and count > 0 else []
+        while frontier and len(found) < count:
+            _, position = heappop(frontier)
+            found.append(heap[position][1])
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(heap):
+                    heappush(frontier, (heap[child][0], child))
+        return found
+
+
+# Class to create an inverted index of products by the words of their names
+class SearchIndex:
+    def __init__(self) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        Every word maps to the products with that word in their name,
+        sorted by name, and the words are also kept sorted, so all words
+        starting with a prefix are next to each other. Both are
+        SortedBlocks, so adding a product never moves a whole list.
+        """
+        self._postings = {}  # word -> SortedBlocks of (name, id, product)
+        self._words = SortedBlocks()  # words of the postings
+        self._entries = {}  # id(product) -> (posting entry, name words)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, product) -> bool:
+        return id(product) in self._entries
+
+    def add(self, product) -> None:
+        """
+        This function adds a product under every word of its name
+        :param product: object
+        :return: None
+        """
+        if id(product) in self._entries:
+            return
+        entry = (product.name, id(product), product)
+        words = tuple(set(tokenize(product.name)))
+        self._entries[id(product)] = (entry, words)
+        for word in words:
+            posting = self._postings.get(word)
+            if posting is None:
+                posting = self._postings[word] = SortedBlocks()
+                self._words.add(word)
+            posting.add(entry)
+
+    def add_many(self, products) -> None:
+        """
+        This function adds many products, every posting and the words are
+        sorted once for all of them
+        :param products: iterable of product objects
+        :return: None
+        """
+        grouped = {}  # word -> new entries
+        for product in products:
+            if id(product) in self._entries:
+                continue
+            entry = (product.name, id(product), product)
+            words = tuple(set(tokenize(product.name)))
+            self._entries[id(product)] = (entry, words)
+            for word in words:
+                grouped.setdefault(word, []).append(entry)
+        new_words = []
+        for word, entries in grouped.items():
+            posting = self._postings.get(word)
+            if posting is None:
+                entries.sort()
+                self._postings[word] = SortedBlocks(entries)
+                new_words.append(word)
+            else:
+                posting.update(entries)
+        self._words.update(new_words)
+
+    def discard(self, product) -> None:
+        """
+        This function drops a product, if it is in the index
+        :param product: object
+        :return: None
+        """
+        found = self._entries.pop(id(product), None)
+        if found is None:
+            return
+        entry, words = found
+        for word in words:
+            posting = self._postings[word]
+            posting.remove(entry)
+            if not posting:
+                del self._postings[word]
+                self._words.remove(word)
+
+    def _starting_with(self, prefix: str) -> list:
+        """
+        This function returns the postings of the words which start with
+        the prefix, in O(log n) plus the number of such words
+        :param prefix: str
+        :return: list of sorted iterables of (name, id, product)
+        """
+        found = []
+        for word in self._words.iter_from(prefix):
+            if not word.startswith(prefix):
+                break
+            found.append(self._postings[word])
+        return found
+
+    def search(self, query: str) -> list:
+        """
+        This function returns the products matching every word of the
+        query. A query word matches a word of the name it starts, so
+        "mac air" finds "MacBook Air M2". Products are sorted by name: the
+        postings are kept sorted, so they are merged instead of sorted.
+        :param query: str
+        :return: list of product objects
+        """
+        # The longest word is likely the rarest, the products it finds are
+        # then checked against the other words without another lookup
+        prefixes = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not prefixes:
+            return []
+        postings = self._starting_with(prefixes[0])
+        others = prefixes[1:]
+        matches = []
+        last = None
+        for _, key, product in merge(*postings):
+            # A product with several words starting with the prefix comes
+            # once per word, one after the other
+            if key == last:
+                continue
+            last = key
+            if others:
+                words = self._entries[key][1]
+                if not all(any(word.startswith(prefix) for word in words)
+                           for prefix in others):
+                    continue
+            matches.append(product)
+        return matches
@@ -0,0 +1,350 @@
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+
+from snapshot import Snapshot
+from snapshot import save_snapshot
+
+# The file starts with a header holding the sequence number of the last
+# record before the file. Every record is a header followed by its payload:
+#   header: payload length, crc32 of payload, sequence number
+#   payload: line count, then per line the name length, units and name
+MAGIC = b'BBJL'
+FILE_HEADER = struct.Struct('<4sQ')
+RECORD_HEADER = struct.Struct('<IIQ')
+LINE_COUNT = struct.Struct('<I')
+LINE = struct.Struct('<Hq')
+
+logger = logging.getLogger(__name__)
+
+
+def _encode(decrements) -> bytes:
+    """
+    This function packs the stock taken by an order into a record payload
+    :param decrements: iterable of (name, units) tuples
+    :return: bytes
+    """
+    parts = [b'']
+    count = 0
+    for name, units in decrements:
+        encoded = name.encode('utf-8')
+        parts.append(LINE.pack(len(encoded), units))
+        parts.append(encoded)
+        count += 1
+    parts[0] = LINE_COUNT.pack(count)
+    return b''.join(parts)
+
+
+def _decode(payload: bytes) -> list:
+    """
+    This function unpacks a record payload
+    :param payload: bytes
+    :return: list of (name, units) tuples
+    """
+    (count,) = LINE_COUNT.unpack_from(payload, 0)
+    offset = LINE_COUNT.size
+    decrements = []
+    for _ in range(count):
+        length, units = LINE.unpack_from(payload, offset)
+        offset += LINE.size
+        decrements.append((payload[offset:offset + length].decode('utf-8'),
+                           units))
+        offset += length
+    return decrements
+
+
+def _read_base(data: bytes) -> int:
+    """
+    This function checks the file header of a journal and returns the
+    sequence number the journal starts after
+    :param data: bytes - content of the journal file
+    :return: int
+    """
+    if len(data) < FILE_HEADER.size:
+        raise ValueError("File is too short for an order journal.")
+    magic, base = FILE_HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("File is not an order journal.")
+    return base
+
+
+def read_journal(path):
+    """
+    This function yields the records of a journal file in order. Reading
+    stops at the first incomplete or damaged record, which is what a crash
+    in the middle of a write leaves behind.
+    :param path: str or path-like
+    :return: generator of (sequence, decrements, end offset) tuples
+    """
+    with open(path, 'rb') as journal_file:
+        data = journal_file.read()
+    _read_base(data)
+    offset = FILE_HEADER.size
+    while offset + RECORD_HEADER.size <= len(data):
+        length, checksum, sequence = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return
+        offset = start + length
+        yield sequence, _decode(payload), offset
+
+
+# Class to create an append-only journal of committed orders
+class OrderJournal:
+    def __init__(self, path, group_size: int = 64,
+                 group_interval: float = 0.01, wait: bool = False) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        Records are buffered and written with one fsync per group: when
+        group_size records are waiting, by the writer that fills the group
+        once it calls sync, or by a background thread when the oldest
+        waiting record is group_interval seconds old, so no record waits
+        longer than that. Without wait, sync returns before the record is
+        durable: a crash loses the orders of the last group_interval
+        seconds, although their stock was taken. With wait, sync blocks
+        until the group of the record is written. No fsync runs while the
+        journal lock is held. An existing journal is continued after its
+        last complete record. Close the journal to stop the thread.
+        :param path: str or path-like - mandatory
+        :param group_size: int - optional -> records per fsync
+        :param group_interval: float - optional -> longest wait in seconds
+        :param wait: bool - optional -> sync waits until the record is
+        durable
+        """
+        if group_size < 1:
+            raise ValueError("Group size must be positive.")
+        self.path = path
+        self.group_size = group_size
+        self.group_interval = group_interval
+        self.wait = wait
+        self.sequence = 0  # sequence number of the last record
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, 'rb') as journal_file:
+                self.sequence = _read_base(journal_file.read(
+                    FILE_HEADER.size))
+            end = FILE_HEADER.size
+            for self.sequence, _, end in read_journal(path):
+                pass
+            self._file = open(path, 'r+b')
+            self._file.truncate(end)  # drop a torn record left by a crash
+            self._file.seek(end)
+        else:
+            self._pending = []
+            self._file = open(path, 'wb')
+            self._write_header()
+        self.durable = self.sequence  # sequence of the last written record
+        self._lock = threading.Lock()  # guards the waiting records
+        self._waiting = threading.Condition(self._lock)  # wakes the flusher
+        self._written = threading.Condition(self._lock)  # wakes sync
+        self._writing = threading.Lock()  # one write to the file at a time
+        self._closed = False
+        self._pending = []
+        self._pending_since = None
+        self.syncs = 0  # number of group commits so far
+        self._flusher = threading.Thread(target=self._flush_in_time,
+                                         name='journal-flusher', daemon=True)
+        self._flusher.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def append(self, decrements) -> int:
+        """
+        This function adds the record of a committed order to the waiting
+        group, without writing anything, so it may be called under the
+        locks of the store. The record is durable once the group it
+        belongs to is flushed, call sync afterwards.
+        :param decrements: iterable of (name, units) tuples
+        :return: int - sequence number of the record
+        """
+        payload = _encode(decrements)
+        with self._lock:
+            self.sequence += 1
+            self._pending.append(RECORD_HEADER.pack(
+                len(payload), zlib.crc32(payload), self.sequence) + payload)
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+                self._waiting.notify()
+            return self.sequence
+
+    def sync(self, sequence: int) -> None:
+        """
+        This function is called by the writer of a record once it holds
+        no other locks. It flushes the waiting group if it is full and,
+        if the journal waits, blocks until the record is durable.
+        :param sequence: int - sequence number returned by append
+        :return: None
+        """
+        with self._lock:
+            if len(self._pending) >= self.group_size:
+                self._flush()
+            if self.wait:
+                self._written.wait_for(
+                    lambda: self.durable >= sequence or self._closed)
+
+    def _flush_in_time(self) -> None:
+        """
+        This function runs in the flusher thread. It flushes the waiting
+        records once the oldest of them is group_interval seconds old,
+        until the journal is closed.
+        :return: None
+        """
+        with self._waiting:
+            while not self._closed:
+                if self._pending_since is None:
+                    self._waiting.wait()
+                    continue
+                delay = self._pending_since + self.group_interval - \
+                    time.monotonic()
+                if delay > 0:
+                    self._waiting.wait(delay)
+                    continue
+                self._flush()
+
+    def flush(self) -> None:
+        """
+        This function writes and fsyncs every record appended so far,
+        including those another thread is writing
+        :return: None
+        """
+        with self._lock:
+            last = self.sequence
+            while self.durable < last:
+                if self._pending:
+                    self._flush()
+                else:
+                    self._written.wait()
+
+    def _flush(self) -> None:
+        """
+        This function writes the waiting records. The caller holds the
+        journal lock, which is let go during the write and fsync so
+        records can be appended meanwhile. Writes keep the order of their
+        records, as each one takes the write lock before the journal lock
+        is let go.
+        :return: None
+        """
+        if not self._pending:
+            return
+        records, last = self._pending, self.sequence
+        self._pending = []
+        self._pending_since = None
+        self._writing.acquire()
+        self._lock.release()
+        try:
+            self._file.write(b''.join(records))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        finally:
+            self._writing.release()
+            self._lock.acquire()
+        self.durable = max(self.durable, last)
+        self.syncs += 1
+        self._written.notify_all()
+
+    def _write_header(self) -> None:
+        """
+        This function starts the journal file over, after the last record
+        written to it
+        :return: None
+        """
+        self._file.seek(0)
+        self._file.truncate(0)
+        self._file.write(FILE_HEADER.pack(
+            MAGIC, self.sequence - len(self._pending)))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def truncate(self) -> None:
+        """
+        This function empties the journal file, sequence numbers go on.
+        Records still waiting for their group commit are kept.
+        :return: None
+        """
+        with self._lock, self._writing:
+            self._write_header()
+
+    def close(self) -> None:
+        """
+        This function flushes the waiting records and closes the file
+        :return: None
+        """
+        with self._lock:
+            if self._closed:
+                return
+            while self._pending:
+                self._flush()
+            self._closed = True
+            with self._writing:
+                self._file.close()
+            self._waiting.notify()
+            self._written.notify_all()
+        self._flusher.join()
+
+
+def apply_journal(store, path, after: int = 0) -> int:
+    """
+    This function takes the stock recorded in a journal from the products
+    of a store. Lines of products the store does not have are skipped
+    with a warning.
+    :param store: Store object
+    :param path: str or path-like
+    :param after: int - optional -> skip records up to this sequence number
+    :return: int - sequence number of the last record applied
+    """
+    last = after
+    for sequence, decrements, _ in read_journal(path):
+        if sequence <= after:
+            continue
+        for name, units in decrements:
+            product = store.get_product(name)
+            if product is None:
+                logger.warning("Journal record %d: product %r is not in "
+                               "store, %d units skipped.",
+                               sequence, name, units)
+                continue
+            product.quantity = product.quantity - units
+        last = sequence
+    return last
+
+
+def replay(snapshot_path, journal_path, **store_options):
+    """
+    This function rebuilds a store after a restart from its last snapshot
+    and the journal records written after it
+    :param snapshot_path: str or path-like
+    :param journal_path: str or path-like
+    :param store_options: keyword arguments for Store
+    :return: Store
+    """
+    with Snapshot(snapshot_path) as snapshot:
+        store = snapshot.to_store(**store_options)
+        after = snapshot.sequence
+    if os.path.exists(journal_path):
+        apply_journal(store, journal_path, after)
+    return store
+
+
+def compact(store, snapshot_path, journal) -> None:
+    """
+    This function folds the journal into a fresh snapshot of the store and
+    empties the journal. The snapshot records the last journal sequence
+    number, so a crash before the journal is emptied does not apply the
+    same orders twice. Call it while no orders are being placed.
+    :param store: Store object the journal belongs to
+    :param snapshot_path: str or path-like
+    :param journal: OrderJournal
+    :return: None
+    """
+    journal.flush()
+    temporary_path = f'{snapshot_path}.tmp'
+    save_snapshot(store, temporary_path, journal.sequence)
+    os.replace(temporary_path, snapshot_path)
+    journal.truncate()
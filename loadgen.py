@@ -0,0 +1,421 @@
+"""
+Synthetic shopper load against a store.
+
+Builds a catalog from the three product classes and the promotions, then
+runs many shoppers at once. Each shopper either browses the active
+products or orders a few products, picked by a Zipf law so a few SKUs
+get most of the traffic, like real shoppers do. Shoppers run as threads,
+asyncio tasks behind an OrderService, or processes, against a plain
+store, a store with lock stripes, or a sharded store. The report gives
+the throughput and HDR-style latency percentiles of every operation.
+
+Run from the repository root:
+    python loadgen.py --products 10000 --shoppers 8 --duration 5
+    python loadgen.py --mode asyncio --store striped --zipf 1.2
+"""
+import argparse
+import asyncio
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import random
+import sys
+import threading
+import time
+
+import promotions
+from metrics import LatencyHistogram
+from order_service import OrderService
+from products import Product
+from products import NonStockedProduct
+from products import LimitedProduct
+from sharding import ShardedStore
+from store import Store
+
+MODES = ('threads', 'asyncio', 'processes')
+STORE_KINDS = ('plain', 'striped', 'sharded')
+OPERATIONS = ('order', 'browse')
+
+
+# Class to create the settings of a shopper workload
+class Workload:
+    def __init__(self, zipf: float = 1.1, browse_share: float = 0.1,
+                 mean_lines: float = 2.5, max_lines: int = 10,
+                 quantity_weights=(70, 20, 10)) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        :param zipf: float - optional -> Zipf exponent of SKU popularity,
+        0 makes every SKU as popular
+        :param browse_share: float - optional -> share of operations which
+        list the active products instead of ordering
+        :param mean_lines: float - optional -> mean lines per order, the
+        number of lines follows a geometric law
+        :param max_lines: int - optional -> most lines per order
+        :param quantity_weights: tuple - optional -> weights of ordering
+        1, 2, 3... units of a line
+        """
+        if zipf < 0 or not 0 <= browse_share <= 1:
+            raise ValueError("Invalid workload.")
+        if mean_lines < 1 or max_lines < 1:
+            raise ValueError("Orders need at least one line.")
+        self.zipf = zipf
+        self.browse_share = browse_share
+        self.mean_lines = mean_lines
+        self.max_lines = max_lines
+        self.quantity_weights = tuple(quantity_weights)
+
+
+# Class to create a sampler of SKU positions following a Zipf law
+class ZipfSampler:
+    def __init__(self, size: int, exponent: float = 1.1,
+                 random_gen=None) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        Position k (from 0) is picked with a weight of 1 / (k + 1) **
+        exponent. The cumulative weights are computed once, every sample is
+        then a binary search.
+        :param size: int - mandatory -> number of SKUs
+        :param exponent: float - optional
+        :param random_gen: random.Random - optional
+        """
+        if size < 1:
+            raise ValueError("Catalog cannot be empty.")
+        self.size = size
+        self._positions = range(size)
+        self._cum_weights = list(itertools.accumulate(
+            1 / (rank ** exponent) for rank in range(1, size + 1)))
+        self._random = random_gen or random.Random()
+
+    def sample(self, count: int = 1) -> list:
+        """
+        This function returns count SKU positions
+        :param count: int - optional
+        :return: list of int
+        """
+        return self._random.choices(self._positions,
+                                    cum_weights=self._cum_weights, k=count)
+
+
+def build_catalog(size: int, mix=(8, 1, 1), promoted: float = 0.5,
+                  stock: int = 10 ** 9, seed: int = 0) -> list:
+    """
+    This function builds a catalog of products with random prices. The
+    products are shuffled, so the most popular SKUs are of every kind.
+    :param size: int - number of products
+    :param mix: tuple - optional -> weights of Product, NonStockedProduct
+    and LimitedProduct
+    :param promoted: float - optional -> share of products with one of
+    the three promotions
+    :param stock: int - optional -> starting quantity of stocked products
+    :param seed: int - optional
+    :return: list of product objects
+    """
+    random_gen = random.Random(seed)
+    promotion_list = [promotions.SecondHalfPrice("Second Half price!"),
+                      promotions.ThirdOneFree("Third One Free!"),
+                      promotions.PercentDiscount("30% off!", percent=30)]
+    kinds = random_gen.choices(
+        (Product, NonStockedProduct, LimitedProduct), weights=mix, k=size)
+    product_list = []
+    for number, kind in enumerate(kinds):
+        name = f"SKU-{number:08d}"
+        price = random_gen.randint(100, 200000) / 100
+        if kind is NonStockedProduct:
+            product = NonStockedProduct(name, price)
+        elif kind is LimitedProduct:
+            product = LimitedProduct(name, price, stock,
+                                     maximum=random_gen.randint(1, 3))
+        else:
+            product = Product(name, price, stock)
+        if random_gen.random() < promoted:
+            product.promotion = random_gen.choice(promotion_list)
+        product_list.append(product)
+    random_gen.shuffle(product_list)
+    return product_list
+
+
+def make_store(catalog, store_kind: str = 'plain', stripes: int = 64,
+               shards: int = 2):
+    """
+    This function puts a catalog in a store of the given kind
+    :param catalog: list of product objects
+    :param store_kind: str - optional -> one of STORE_KINDS
+    :param stripes: int - optional -> lock stripes of a striped store
+    :param shards: int - optional -> worker processes of a sharded store
+    :return: Store or ShardedStore
+    """
+    if store_kind == 'plain':
+        return Store(catalog)
+    if store_kind == 'striped':
+        return Store(catalog, lock_stripes=stripes)
+    if store_kind == 'sharded':
+        return ShardedStore(catalog, shards)
+    raise ValueError(f"Unknown store kind {store_kind!r}.")
+
+
+# Class to create the operations of one simulated shopper
+class Shopper:
+    def __init__(self, catalog, workload: Workload, seed: int) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        :param catalog: list of product objects
+        :param workload: Workload
+        :param seed: int - every shopper gets its own random sequence
+        """
+        self.catalog = catalog
+        self.workload = workload
+        self.random = random.Random(seed)
+        self.skus = ZipfSampler(len(catalog), workload.zipf, self.random)
+        self.histograms = {name: LatencyHistogram() for name in OPERATIONS}
+        self.rejected = 0
+
+    def next_operation(self):
+        """
+        This function draws the next operation of the shopper
+        :return: tuple of ('browse', None) or ('order', shopping list)
+        """
+        workload = self.workload
+        if self.random.random() < workload.browse_share:
+            return 'browse', None
+        # Geometric number of lines: one more line with 1 - 1 / mean odds
+        lines = 1
+        while lines < workload.max_lines and \
+                self.random.random() >= 1 / workload.mean_lines:
+            lines += 1
+        quantities = self.random.choices(
+            range(1, len(workload.quantity_weights) + 1),
+            weights=workload.quantity_weights, k=lines)
+        return 'order', [(self.catalog[position], quantity)
+                         for position, quantity in
+                         zip(self.skus.sample(lines), quantities)]
+
+    def run(self, store, operations: int, deadline: float) -> None:
+        """
+        This function runs operations until the count or the deadline is
+        reached, timing each one
+        :param store: Store or ShardedStore
+        :param operations: int - most operations, None for no limit
+        :param deadline: float - time.perf_counter() to stop at, or None
+        :return: None
+        """
+        done = 0
+        while (operations is None or done < operations) and \
+                (deadline is None or time.perf_counter() < deadline):
+            name, shopping_list = self.next_operation()
+            started = time.perf_counter()
+            if name == 'browse':
+                store.get_all_products()
+            else:
+                try:
+                    store.order(shopping_list)
+                except ValueError:
+                    self.rejected += 1
+            self.histograms[name].record(time.perf_counter() - started)
+            done += 1
+
+    async def run_async(self, service: OrderService, operations: int,
+                        deadline: float) -> None:
+        """
+        This function runs the operations of the shopper as an asyncio
+        task, orders go through the batching order service
+        :param service: OrderService
+        :param operations: int - most operations, None for no limit
+        :param deadline: float - time.perf_counter() to stop at, or None
+        :return: None
+        """
+        done = 0
+        while (operations is None or done < operations) and \
+                (deadline is None or time.perf_counter() < deadline):
+            name, shopping_list = self.next_operation()
+            started = time.perf_counter()
+            if name == 'browse':
+                service.store.get_all_products()
+                await asyncio.sleep(0)  # let the other shoppers run
+            else:
+                try:
+                    await service.order(shopping_list)
+                except ValueError:
+                    self.rejected += 1
+            self.histograms[name].record(time.perf_counter() - started)
+            done += 1
+
+
+def _run_threads(store, shoppers, operations, duration) -> None:
+    deadline = None if duration is None else time.perf_counter() + duration
+    threads = [threading.Thread(target=shopper.run,
+                                args=(store, operations, deadline))
+               for shopper in shoppers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+async def _run_tasks(store, shoppers, operations, duration) -> None:
+    deadline = None if duration is None else time.perf_counter() + duration
+    async with OrderService(store) as service:
+        await asyncio.gather(*(shopper.run_async(service, operations,
+                                                 deadline)
+                               for shopper in shoppers))
+
+
+def _run_process(settings) -> tuple:
+    """
+    This function runs in every worker process of the processes mode. It
+    builds its own copy of the catalog and store and runs one shopper.
+    :param settings: tuple of the arguments of run_load, the catalog seed
+    and the shopper seed
+    :return: tuple of (histograms, rejected, seconds the shopper ran)
+    """
+    products, store_kind, workload, operations, duration, catalog_seed, \
+        seed = settings
+    catalog = build_catalog(products, seed=catalog_seed)
+    store = make_store(catalog, store_kind)
+    shopper = Shopper(catalog, workload, seed)
+    started = time.perf_counter()
+    try:
+        shopper.run(store, operations,
+                    None if duration is None else started + duration)
+    finally:
+        elapsed = time.perf_counter() - started
+        if isinstance(store, ShardedStore):
+            store.close()
+    return shopper.histograms, shopper.rejected, elapsed
+
+
+def run_load(products: int = 10000, shoppers: int = 8,
+             mode: str = 'threads', store_kind: str = None,
+             workload: Workload = None, operations: int = None,
+             duration: float = None, seed: int = 0) -> dict:
+    """
+    This function runs a shopper load and returns its report. In processes
+    mode every process owns a copy of the store, so the run measures how
+    throughput scales with independent replicas.
+    :param products: int - optional -> catalog size
+    :param shoppers: int - optional -> shoppers running at once
+    :param mode: str - optional -> one of MODES
+    :param store_kind: str - optional -> one of STORE_KINDS, by default
+    'striped' in threads mode, a plain store is not safe for threads, and
+    'plain' otherwise
+    :param workload: Workload - optional
+    :param operations: int - optional -> operations per shopper
+    :param duration: float - optional -> seconds to run, by default 5 when
+    no operation count is given
+    :param seed: int - optional
+    :return: dict
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r}.")
+    if store_kind is None:
+        store_kind = 'striped' if mode == 'threads' else 'plain'
+    if store_kind not in STORE_KINDS:
+        raise ValueError(f"Unknown store kind {store_kind!r}.")
+    workload = workload or Workload()
+    if operations is None and duration is None:
+        duration = 5.0
+
+    histograms = {name: LatencyHistogram() for name in OPERATIONS}
+    rejected = 0
+    if mode == 'processes':
+        settings = [(products, store_kind, workload, operations, duration,
+                     seed, seed + number) for number in range(shoppers)]
+        # Pool workers are daemons, which cannot start the worker
+        # processes of a sharded store
+        with ProcessPoolExecutor(
+                shoppers, mp_context=multiprocessing.get_context()) as pool:
+            results = list(pool.map(_run_process, settings))
+        # Catalogs are built before the clock starts, time the slowest
+        elapsed = max(result[2] for result in results)
+        for shopper_histograms, shopper_rejected, _ in results:
+            for name in OPERATIONS:
+                histograms[name].merge(shopper_histograms[name])
+            rejected += shopper_rejected
+    else:
+        catalog = build_catalog(products, seed=seed)
+        store = make_store(catalog, store_kind)
+        shopper_list = [Shopper(catalog, workload, seed + number)
+                        for number in range(shoppers)]
+        started = time.perf_counter()
+        try:
+            if mode == 'threads':
+                _run_threads(store, shopper_list, operations, duration)
+            else:
+                asyncio.run(_run_tasks(store, shopper_list, operations,
+                                       duration))
+        finally:
+            elapsed = time.perf_counter() - started
+            if isinstance(store, ShardedStore):
+                store.close()
+        for shopper in shopper_list:
+            for name in OPERATIONS:
+                histograms[name].merge(shopper.histograms[name])
+            rejected += shopper.rejected
+
+    total = sum(histogram.count for histogram in histograms.values())
+    return {
+        'mode': mode,
+        'store': store_kind,
+        'products': products,
+        'shoppers': shoppers,
+        'seconds': elapsed,
+        'operations': total,
+        'operations_per_second': total / elapsed if elapsed else 0.0,
+        'orders': histograms['order'].count,
+        'rejected': rejected,
+        'latency': {name: histogram.summary()
+                    for name, histogram in histograms.items()},
+    }
+
+
+def print_report(report, output=sys.stdout) -> None:
+    """
+    This function writes the report of run_load
+    :param report: dict
+    :param output: text file object - optional
+    :return: None
+    """
+    output.write(
+        f"{report['shoppers']} shoppers, {report['mode']}, "
+        f"{report['store']} store of {report['products']} products\n"
+        f"Operations: {report['operations']} in "
+        f"{report['seconds']:.3f}s, "
+        f"{report['operations_per_second']:.0f}/s\n"
+        f"Orders:     {report['orders']} ({report['rejected']} rejected)\n")
+    for name, latency in report['latency'].items():
+        if not latency['count']:
+            continue
+        values = ', '.join(f'{key} {value * 1e6:.1f}us'
+                           for key, value in latency.items()
+                           if key not in ('count', 'min', 'mean'))
+        output.write(f"{name:<7} n={latency['count']} "
+                     f"mean {latency['mean'] * 1e6:.1f}us, {values}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--products', type=int, default=10000,
+                        help='catalog size, default 10000')
+    parser.add_argument('--shoppers', type=int, default=8,
+                        help='shoppers running at once, default 8')
+    parser.add_argument('--mode', choices=MODES, default='threads')
+    parser.add_argument('--store', choices=STORE_KINDS,
+                        help='default striped with threads, else plain')
+    parser.add_argument('--duration', type=float,
+                        help='seconds to run, default 5')
+    parser.add_argument('--operations', type=int,
+                        help='operations per shopper instead of a duration')
+    parser.add_argument('--zipf', type=float, default=1.1,
+                        help='Zipf exponent of SKU popularity, default 1.1')
+    parser.add_argument('--browse-share', type=float, default=0.1,
+                        help='share of operations listing the products')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    workload = Workload(zipf=args.zipf, browse_share=args.browse_share)
+    print_report(run_load(args.products, args.shoppers, args.mode,
+                          args.store, workload, args.operations,
+                          args.duration, args.seed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+import threading
+from contextlib import contextmanager
+
+
+# Class to create a fixed pool of locks shared out between products
+class LockStripes:
+    def __init__(self, stripes: int = 64) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        Every product maps to one of the locks, so a pool of one lock is a
+        single global lock.
+        :param stripes: int - optional -> number of locks in the pool
+        """
+        if stripes < 1:
+            raise ValueError("Number of lock stripes must be positive.")
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def stripe_of(self, product) -> int:
+        """
+        This function returns the number of the lock guarding a product
+        :param product: object
+        :return: int
+        """
+        # Object addresses are aligned, drop the low bits before hashing
+        return (id(product) >> 4) % len(self._locks)
+
+    @contextmanager
+    def hold(self, products):
+        """
+        This function holds the locks of all given products for the body
+        of a with statement. Locks are always taken in increasing stripe
+        order, so two callers can never wait on each other.
+        :param products: iterable of product objects
+        :return: context manager
+        """
+        stripes = sorted({self.stripe_of(product) for product in products})
+        taken = []
+        try:
+            for stripe in stripes:
+                self._locks[stripe].acquire()
+                taken.append(stripe)
+            yield
+        finally:
+            for stripe in reversed(taken):
+                self._locks[stripe].release()
@@ -1,9 +1,18 @@
+import argparse
+import json
+import sys
+import time
+
 import promotions
+from importer import import_catalog
 from products import Product
 from products import NonStockedProduct
 from products import LimitedProduct
 from store import Store
 
+# Products shown per page of a listing or search
+PAGE_SIZE = 10
+
 
 # This function displays the main menu
 def display_menu():
@@ -16,22 +25,68 @@ def display_menu():
     print('1. List all products in store\n'
           '2. Show total amount in store\n'
           '3. Make an order\n'
-          '4. Quit')
+          '4. Quit\n'
+          '5. Search products')
+
+
+# This function pages through the products matching a search
+def browse_products(store_obj, query=''):
+    """
+    This function gets a store object and a search query and prints the
+    matching products one page at a time. The user moves between pages
+    until an empty text is entered.
+    :param store_obj: Store Object
+    :param query: str - optional -> empty for all available products
+    :return: product_list: list of the products on the last page shown
+    """
+    page = 1
+    while True:
+        product_list, total = store_obj.search(query, page, PAGE_SIZE)
+        pages = max(1, -(-total // PAGE_SIZE))
+        print('------')
+        for item_no, item in enumerate(product_list, start=1):
+            held = store_obj.held_quantity(item)
+            if held:
+                print(f'{item_no}. {item}, Held: {held}, '
+                      f'Available: {store_obj.available_quantity(item)}')
+            else:
+                print(f'{item_no}. {item}')
+        print(f'Page {page} of {pages}, {total} products')
+        print('------')
+        if pages == 1:
+            return product_list
+        command = input('n: next page, p: previous page, '
+                        'empty text: done ').strip().lower()
+        if not command:
+            return product_list
+        if command == 'n' and page < pages:
+            page += 1
+        elif command == 'p' and page > 1:
+            page -= 1
 
 
 # This function prints the list of products
 def list_all_products(store_obj):
     """
     This function gets a store object and prints the list of available
-    products in the store.
+    products in the store, one page at a time.
     :param store_obj: Store Object
     :return: None
     """
-    product_list = store_obj.get_all_products()
-    print('------')
-    for item_no, item in enumerate(product_list, start=1):
-        print(f'{item_no}. {item}')
-    print('------')
+    browse_products(store_obj)
+
+
+# This function searches the products of the store
+def search_products(store_obj):
+    """
+    This function asks the user for a search text and prints the matching
+    products, one page at a time.
+    :param store_obj: Store Object
+    :return: None
+    """
+    query = input('Search for: ')
+    if query.strip():
+        browse_products(store_obj, query)
 
 
 # User input function to control the main menu
@@ -52,33 +107,51 @@ def get_user_choice():
 def make_order(store_obj):
     """
     This function gets a store object and asks user to input add products and
-    relevant quantity to the cart and ultimately place the order. Upon
-    successful purchase the total amount paid will be printed.
+    relevant quantity to the cart and ultimately place the order. Products
+    are found by searching, the product # is taken from the page of
+    results shown. The stock of every item added is held for the cart
+    until checkout. Upon successful purchase the total amount paid will be
+    printed.
     :param store_obj: Object
     :return: None
     """
-    list_all_products(store_obj)
     print('When you want to finish order, enter empty text.')
-    order_items = []
+    cart = []
     while True:
-        product_id = input('Which product # do you want? ')
-        product_quantity = input('What amount do you want? ')
-        if not product_id and not product_quantity:
+        query = input('Search for a product: ')
+        if not query.strip():
             print('********')
-            total_payment = store_obj.order(order_items)
-            print(f'Order made! Total payment: ${total_payment}')
+            result = store_obj.checkout(cart)
+            if result.ok:
+                print(f'Order made! Total payment: ${result.total_price}')
+            else:
+                print('Order was not made:')
+                for line in result.errors:
+                    print(f'{line.product.name} x {line.quantity}: '
+                          f'{line.error}')
+                for hold in cart:
+                    store_obj.release(hold)
             print()
             break
-        else:
-            try:
-                product_index = int(product_id) - 1
-                product = store_obj.get_all_products()[product_index]
-                quantity = int(product_quantity)
-                order_items.append((product, quantity))
-                print('Product added to list!')
-                print()
-            except (ValueError, IndexError):
-                print('Invalid input. Please try again.')
+        product_list = browse_products(store_obj, query)
+        product_id = input('Which product # do you want? ')
+        product_quantity = input('What amount do you want? ')
+        try:
+            product_index = int(product_id) - 1
+            if product_index < 0:
+                raise IndexError
+            product = product_list[product_index]
+            quantity = int(product_quantity)
+        except (ValueError, IndexError):
+            print('Invalid input. Please try again.')
+            continue
+        try:
+            cart.append(store_obj.hold([(product, quantity)]))
+        except ValueError as error:
+            print(f'Product was not added: {error}')
+            continue
+        print('Product added to list!')
+        print()
 
 
 # This function executes the main menu for shopping at store
@@ -101,15 +174,16 @@ def start(store_obj):
             make_order(store_obj)
         elif user_choice == 4:
             break
+        elif user_choice == 5:
+            search_products(store_obj)
 
 
-# Main program execution section
-def main():
+# This function builds the default store of the interactive menu
+def create_default_store():
     """
-    In this section, the main product list is defined
-    The new store object is defined
-    The start function is called
-    :return: None
+    In this section, the main product list is defined and the new store
+    object is returned
+    :return: Store object
     """
     # setup initial stock of inventory
     product_list = [Product("MacBook Air M2",
@@ -132,8 +206,172 @@ def main():
     product_list[1].promotion = third_one_free
     product_list[3].promotion = thirty_percent
 
-    best_buy = Store(product_list)  # Define a new store called 'best_buy'
-    start(best_buy)
+    return Store(product_list)
+
+
+# This function returns a percentile of sorted values
+def percentile(sorted_values, percent):
+    """
+    This function gets a sorted list and returns the value below which the
+    given percent of the values fall (nearest rank)
+    :param sorted_values: list
+    :param percent: float
+    :return: value or None for an empty list
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+# This function reads the orders of an orders file
+def read_orders(orders_file):
+    """
+    This function reads a JSON Lines orders file one order at a time.
+    Every line is a list of [product name, quantity] pairs, or an object
+    with such a list under "lines". A line which is not such an order is
+    yielded with an error instead of the order.
+    :param orders_file: text file object
+    :return: generator of (line number, list of (name, quantity) or None,
+    error or None) tuples
+    """
+    for line_number, line in enumerate(orders_file, start=1):
+        if not line.strip():
+            continue
+        try:
+            order = json.loads(line)
+        except ValueError as error:
+            yield line_number, None, f'Invalid JSON: {error}.'
+            continue
+        if isinstance(order, dict):
+            order = order.get('lines')
+        if not isinstance(order, list) or \
+                not all(isinstance(pair, list) and len(pair) == 2 and
+                        isinstance(pair[0], str) for pair in order):
+            yield line_number, None, \
+                'Expected a list of [product name, quantity] pairs.'
+            continue
+        yield line_number, [(name, quantity) for name, quantity in order], \
+            None
+
+
+# This function streams recorded orders through the store
+def replay_orders(store_obj, orders_file, output=sys.stdout,
+                  verbose=False, flush_every=1000):
+    """
+    This function places every order of an orders file and returns a
+    throughput summary. With verbose on, one result line per order is
+    written, buffered and flushed every flush_every orders.
+    :param store_obj: Store object
+    :param orders_file: text file object
+    :param output: text file object - optional
+    :param verbose: bool - optional
+    :param flush_every: int - optional
+    :return: dict
+    """
+    buffer = []
+    latencies = []
+    orders = 0
+    lines = 0
+    rejected = 0
+    started = time.perf_counter()
+    for line_number, order, error in read_orders(orders_file):
+        orders += 1
+        if order is not None:
+            order_started = time.perf_counter()
+            shopping_list = []
+            unknown = None
+            for name, quantity in order:
+                product = store_obj.get_product(name)
+                if product is None:
+                    unknown = name
+                    break
+                shopping_list.append((product, quantity))
+            if unknown is None:
+                result = store_obj.place_order(shopping_list)
+                error = None if result.ok else result.errors[0].error
+            else:
+                error = f'Unknown product {unknown!r}.'
+            latencies.append(time.perf_counter() - order_started)
+            lines += len(order)
+        if error is not None:
+            rejected += 1
+        if verbose:
+            if error is None:
+                buffer.append(f'{line_number}: ${result.total_price}\n')
+            else:
+                buffer.append(f'{line_number}: rejected, {error}\n')
+            if len(buffer) >= flush_every:
+                output.write(''.join(buffer))
+                buffer = []
+    elapsed = time.perf_counter() - started
+    if buffer:
+        output.write(''.join(buffer))
+
+    latencies.sort()
+    return {
+        'orders': orders,
+        'lines': lines,
+        'rejected': rejected,
+        'seconds': elapsed,
+        'orders_per_second': orders / elapsed if elapsed else 0.0,
+        'lines_per_second': lines / elapsed if elapsed else 0.0,
+        'p50_latency': percentile(latencies, 50),
+        'p99_latency': percentile(latencies, 99),
+    }
+
+
+# This function prints the summary of a batch replay
+def print_summary(summary, output=sys.stdout):
+    """
+    This function writes the throughput summary of replay_orders
+    :param summary: dict
+    :param output: text file object - optional
+    :return: None
+    """
+    p50 = (summary['p50_latency'] or 0) * 1e6
+    p99 = (summary['p99_latency'] or 0) * 1e6
+    output.write(
+        f"Orders:   {summary['orders']} "
+        f"({summary['rejected']} rejected) in {summary['seconds']:.3f}s\n"
+        f"Orders/s: {summary['orders_per_second']:.0f}\n"
+        f"Lines/s:  {summary['lines_per_second']:.0f}\n"
+        f"Latency:  p50 {p50:.1f}us, p99 {p99:.1f}us\n")
+
+
+# Main program execution section
+def main(argv=None):
+    """
+    In this section, the store object is created, from the default
+    product list or a catalog feed. Without an orders file the start
+    function is called, otherwise the orders are replayed in batch mode.
+    :param argv: list of command line arguments - optional
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description='Best Buy store.')
+    parser.add_argument('--catalog',
+                        help='CSV or JSONL catalog feed to load')
+    parser.add_argument('--orders',
+                        help='JSONL orders file to replay, no menu')
+    parser.add_argument('--verbose', action='store_true',
+                        help='print the result of every replayed order')
+    args = parser.parse_args(argv)
+
+    if args.catalog:
+        best_buy = Store([])
+        report = import_catalog(best_buy, args.catalog)
+        if report.error_count:
+            print(f'Skipped {report.error_count} bad catalog rows.',
+                  file=sys.stderr)
+    else:
+        best_buy = create_default_store()
+
+    if args.orders:
+        with open(args.orders, encoding='utf-8') as orders_file:
+            print_summary(replay_orders(best_buy, orders_file,
+                                        verbose=args.verbose))
+    else:
+        start(best_buy)
 
 
 # Press the green button in the gutter to run the script.
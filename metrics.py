@@ -0,0 +1,393 @@
+"""
+Opt-in instrumentation of the store hot paths.
+
+Nothing is measured until enable() is called: it wraps the hot functions
+in place and disable() puts the originals back, so a disabled store runs
+exactly the code it runs without this module.
+"""
+import functools
+import json
+import threading
+import time
+from bisect import bisect_left
+
+import promotions
+import products
+import store
+
+# Upper bounds in seconds of the latency histogram buckets
+BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+           1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0)
+
+_lock = threading.Lock()
+_timers = {}  # function label -> _Timer
+_counters = {}  # counter name -> int
+_originals = []  # (owner, attribute, original value) of wrapped functions
+
+
+# Class to create the statistics of one instrumented function
+class _Timer:
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)  # last one is +Inf
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+
+
+# Class to create a log-linear latency histogram, in the style of HDR
+# histograms: every power of two is split into 2 ** (SUB_BITS - 1) equal
+# buckets, so any recorded value is known within 1 / 2 ** (SUB_BITS - 1)
+class LatencyHistogram:
+    SUB_BITS = 7  # 64 buckets per power of two, under 1.6% error
+    RESOLUTION = 1e-9  # recorded values are whole nanoseconds
+
+    def __init__(self) -> None:
+        self.counts = {}  # bucket -> number of values
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def _bucket(cls, value: int) -> int:
+        """
+        This function returns the bucket of a value in nanoseconds
+        :param value: int
+        :return: int
+        """
+        shift = value.bit_length() - cls.SUB_BITS
+        if shift <= 0:
+            return value
+        return (shift << (cls.SUB_BITS - 1)) + (value >> shift)
+
+    @classmethod
+    def _highest(cls, bucket: int) -> int:
+        """
+        This function returns the highest value of a bucket
+        :param bucket: int
+        :return: int
+        """
+        half = 1 << (cls.SUB_BITS - 1)
+        if bucket < 2 * half:
+            return bucket
+        shift = bucket // half - 1
+        return ((bucket - shift * half + 1) << shift) - 1
+
+    def record(self, seconds: float) -> None:
+        """
+        This function adds a latency to the histogram
+        :param seconds: float
+        :return: None
+        """
+        value = max(int(seconds / self.RESOLUTION), 0)
+        bucket = self._bucket(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other) -> None:
+        """
+        This function adds the values of another histogram to this one
+        :param other: LatencyHistogram
+        :return: None
+        """
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min,
+                                                              value)
+                self.max = value if self.max is None else max(self.max,
+                                                              value)
+
+    def percentile(self, percent: float):
+        """
+        This function returns the latency below which the given percent of
+        the values fall, as the highest value of its bucket and never more
+        than the largest value recorded
+        :param percent: float
+        :return: float seconds, or None for an empty histogram
+        """
+        if not self.count:
+            return None
+        rank = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self._highest(bucket) * self.RESOLUTION,
+                           self.max)
+        return self.max
+
+    def summary(self, percents=(50, 90, 99, 99.9)) -> dict:
+        """
+        This function returns the count, mean, extremes and percentiles
+        :param percents: iterable of float - optional
+        :return: dict of seconds
+        """
+        data = {'count': self.count, 'min': self.min,
+                'mean': self.total / self.count if self.count else None}
+        for percent in percents:
+            data[f'p{percent:g}'] = self.percentile(percent)
+        data['max'] = self.max
+        return data
+
+
+def _observe(label: str, seconds: float) -> None:
+    with _lock:
+        timer = _timers.get(label)
+        if timer is None:
+            timer = _timers[label] = _Timer()
+        timer.observe(seconds)
+
+
+def increment(name: str, amount: int = 1) -> None:
+    """
+    This function adds to a counter
+    :param name: str
+    :param amount: int - optional
+    :return: None
+    """
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def _timed(label: str, function):
+    """
+    This function wraps a function so every call is counted and timed
+    :param label: str - name the statistics are reported under
+    :param function: function
+    :return: wrapped function
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _observe(label, time.perf_counter() - started)
+    return wrapper
+
+
+def _timed_buy(label: str, function):
+    """
+    This function wraps a buy method, timing it and counting rejected buys
+    :param label: str
+    :param function: function
+    :return: wrapped function
+    """
+    timed = _timed(label, function)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        try:
+            return timed(*args, **kwargs)
+        except ValueError:
+            increment('rejected_buys')
+            raise
+    return wrapper
+
+
+def _timed_place_order(function):
+    """
+    This function wraps Store.place_order, timing it and counting rejected
+    orders and order lines
+    :param function: function
+    :return: wrapped function
+    """
+    timed = _timed('Store.place_order', function)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        result = timed(*args, **kwargs)
+        if not result.ok:
+            increment('rejected_orders')
+            increment('rejected_lines', len(result.errors))
+        return result
+    return wrapper
+
+
+def _timed_pricing(label: str, function):
+    """
+    This function wraps a pricing method of a product, timing every call
+    under the label and the promotion type of the product, e.g.
+    "Product.get_price[ThirdOneFree]". Compiled pricing runs no promotion
+    method per call, so this is where the time of each promotion type
+    shows.
+    :param label: str
+    :param function: function
+    :return: wrapped function
+    """
+    @functools.wraps(function)
+    def wrapper(product, *args, **kwargs):
+        promotion = product.promotion
+        kind = 'none' if promotion is None else type(promotion).__name__
+        started = time.perf_counter()
+        try:
+            return function(product, *args, **kwargs)
+        finally:
+            _observe(f'{label}[{kind}]', time.perf_counter() - started)
+    return wrapper
+
+
+def _counting_quantity(quantity_property):
+    """
+    This function wraps the quantity property so products running out of
+    stock are counted
+    :param quantity_property: property
+    :return: property
+    """
+    def setter(product, quantity):
+        was_in_stock = product._quantity != 0
+        quantity_property.fset(product, quantity)
+        if was_in_stock and quantity == 0:
+            increment('stock_outs')
+    return property(quantity_property.fget, setter, None,
+                    quantity_property.__doc__)
+
+
+def _wrap(owner, attribute: str, wrapper) -> None:
+    original = owner.__dict__[attribute]
+    _originals.append((owner, attribute, original))
+    setattr(owner, attribute, wrapper(original))
+
+
+def _promotion_classes(attribute: str = 'apply_promotion'):
+    """
+    This function returns every loaded promotion class defining its own
+    version of a method
+    :param attribute: str - optional -> name of the method
+    :return: list of classes
+    """
+    found = []
+    pending = [promotions.Promotion]
+    while pending:
+        cls = pending.pop()
+        pending.extend(cls.__subclasses__())
+        if attribute in cls.__dict__ and \
+                not getattr(cls.__dict__[attribute], '__isabstractmethod__',
+                            False):
+            found.append(cls)
+    return found
+
+
+def is_enabled() -> bool:
+    """
+    This function returns True while the hot paths are instrumented
+    :return: bool
+    """
+    return bool(_originals)
+
+
+def enable() -> None:
+    """
+    This function starts measuring: Store.order, Store.place_order,
+    Store.quote, Store.get_all_products, Store.__contains__, every buy method,
+    every get_price and get_price_cents by promotion type, every
+    apply_promotion, apply_promotion_cents and promotion compile, and
+    stock-outs of products
+    :return: None
+    """
+    if is_enabled():
+        return
+    for name in ('order', 'quote', 'get_all_products', '__contains__'):
+        _wrap(store.Store, name,
+              functools.partial(_timed, f'Store.{name}'))
+    _wrap(store.Store, 'place_order', _timed_place_order)
+    for cls in (products.Product, products.NonStockedProduct,
+                products.LimitedProduct):
+        _wrap(cls, 'buy', functools.partial(_timed_buy,
+                                            f'{cls.__name__}.buy'))
+    for cls in (products.Product, products.LimitedProduct):
+        for attribute in ('get_price', 'get_price_cents'):
+            _wrap(cls, attribute, functools.partial(
+                _timed_pricing, f'{cls.__name__}.{attribute}'))
+    for attribute in ('apply_promotion', 'apply_promotion_cents',
+                      'compile'):
+        for cls in _promotion_classes(attribute):
+            _wrap(cls, attribute,
+                  functools.partial(_timed, f'{cls.__name__}.{attribute}'))
+    _wrap(products.Product, 'quantity', _counting_quantity)
+
+
+def disable() -> None:
+    """
+    This function stops measuring and restores the original functions.
+    Collected statistics are kept until reset().
+    :return: None
+    """
+    while _originals:
+        owner, attribute, original = _originals.pop()
+        setattr(owner, attribute, original)
+
+
+def reset() -> None:
+    """
+    This function clears all collected statistics
+    :return: None
+    """
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+def snapshot() -> dict:
+    """
+    This function returns a copy of the collected statistics
+    :return: dict with 'functions' and 'counters'
+    """
+    with _lock:
+        return {
+            'functions': {
+                label: {
+                    'count': timer.count,
+                    'total_seconds': timer.total,
+                    'buckets': dict(zip([*map(str, BUCKETS), '+Inf'],
+                                        timer.buckets)),
+                }
+                for label, timer in _timers.items()},
+            'counters': dict(_counters),
+        }
+
+
+def to_json() -> str:
+    """
+    This function exports the collected statistics as JSON
+    :return: str
+    """
+    return json.dumps(snapshot(), indent=2, sort_keys=True)
+
+
+def to_prometheus(prefix: str = 'bestbuy') -> str:
+    """
+    This function exports the collected statistics in the Prometheus text
+    exposition format
+    :param prefix: str - optional -> metric name prefix
+    :return: str
+    """
+    data = snapshot()
+    lines = [f'# TYPE {prefix}_call_seconds histogram']
+    for label, timer in sorted(data['functions'].items()):
+        cumulative = 0
+        for bound, count in timer['buckets'].items():
+            cumulative += count
+            lines.append(f'{prefix}_call_seconds_bucket{{function="{label}",'
+                         f'le="{bound}"}} {cumulative}')
+        lines.append(f'{prefix}_call_seconds_sum{{function="{label}"}} '
+                     f'{timer["total_seconds"]}')
+        lines.append(f'{prefix}_call_seconds_count{{function="{label}"}} '
+                     f'{timer["count"]}')
+    for name, value in sorted(data['counters'].items()):
+        lines.append(f'# TYPE {prefix}_{name}_total counter')
+        lines.append(f'{prefix}_{name}_total {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,84 @@
+"""
+Money as whole cents.
+
+Prices are stored as floats, so sums of many order totals drift. The cents
+path prices every order line as an int number of cents. Integer sums are
+exact and fast, so totals can be added up without any drift.
+
+Rounding rules: a price is converted to cents from its decimal text, so
+10.99 is exactly 1099 cents. A promotion that makes a fraction of a cent
+rounds it once per line, half up. The promotion classes say where they
+round.
+"""
+from decimal import Decimal
+from decimal import ROUND_HALF_UP
+from fractions import Fraction
+
+CENTS_PER_UNIT = 100
+_CENT = Decimal('0.01')
+
+
+def to_cents(amount) -> int:
+    """
+    This function converts an amount of money to whole cents, rounding
+    half a cent up
+    :param amount: int, float, str or Decimal
+    :return: int
+    """
+    if isinstance(amount, int):
+        return amount * CENTS_PER_UNIT
+    if not isinstance(amount, Decimal):
+        # str() gives the shortest text of a float, 10.99 and not
+        # 10.9900000000000002131628...
+        amount = Decimal(str(amount))
+    return int(amount.quantize(_CENT, rounding=ROUND_HALF_UP) *
+               CENTS_PER_UNIT)
+
+
+def to_decimal(cents: int) -> Decimal:
+    """
+    This function converts cents to an exact Decimal amount
+    :param cents: int
+    :return: Decimal
+    """
+    return Decimal(cents).scaleb(-2)
+
+
+def format_cents(cents: int) -> str:
+    """
+    This function returns cents as text with two decimals, e.g. '10.99'
+    :param cents: int
+    :return: str
+    """
+    sign = '-' if cents < 0 else ''
+    units, rest = divmod(abs(cents), CENTS_PER_UNIT)
+    return f'{sign}{units}.{rest:02d}'
+
+
+def divide(cents: int, numerator: int, denominator: int) -> int:
+    """
+    This function returns cents * numerator / denominator rounded half up
+    to whole cents, with integer arithmetic only
+    :param cents: int
+    :param numerator: int
+    :param denominator: int - positive
+    :return: int
+    """
+    product = cents * numerator
+    if product >= 0:
+        return (2 * product + denominator) // (2 * denominator)
+    return -((-2 * product + denominator) // (2 * denominator))
+
+
+def percent_of(cents: int, percent) -> int:
+    """
+    This function returns a percentage of an amount of cents, rounded half
+    up. The percent is taken from its decimal text, so 12.5 is exact.
+    :param cents: int
+    :param percent: int, float, str or Decimal
+    :return: int
+    """
+    if isinstance(percent, int):
+        return divide(cents, percent, 100)
+    ratio = Fraction(str(percent))
+    return divide(cents, ratio.numerator, ratio.denominator * 100)
@@ -0,0 +1,152 @@
+import asyncio
+
+
+# Class to create an asyncio front end which batches orders for a store
+class OrderService:
+    def __init__(self, store, window: float = 0.002,
+                 max_batch: int = 256) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        Orders submitted within the same short window are placed together
+        with Store.place_orders, which takes the stock of every product once
+        for the whole batch. Every caller still gets the result of its own
+        order.
+        :param store: Store object - mandatory
+        :param window: float - optional -> seconds to wait for more orders
+        after the first order of a batch arrives
+        :param max_batch: int - optional -> most orders in one batch
+        """
+        if window < 0:
+            raise ValueError("Batch window cannot be negative.")
+        if max_batch < 1:
+            raise ValueError("Batch size must be positive.")
+        self.store = store
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = None
+        self._worker = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.stop()
+
+    @property
+    def running(self) -> bool:
+        """
+        This function returns True while the service accepts orders
+        :return: bool
+        """
+        return self._worker is not None
+
+    async def start(self) -> None:
+        """
+        This function starts the batching task on the running event loop
+        :return: None
+        """
+        if self._worker is not None:
+            raise RuntimeError("Order service is already running.")
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        This function places the orders still queued and stops the service
+        :return: None
+        """
+        if self._worker is None:
+            return
+        worker, self._worker = self._worker, None
+        await self._queue.put(None)  # tells the worker to finish
+        await worker
+
+    async def place_order(self, shopping_list):
+        """
+        This function submits an order and waits for its result
+        :param shopping_list: list of (product, quantity) tuples
+        :return: OrderResult
+        """
+        if self._worker is None:
+            raise RuntimeError("Order service is not running.")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((list(shopping_list), future))
+        return await future
+
+    async def order(self, shopping_list) -> float:
+        """
+        This function submits an order and returns its total price, like
+        Store.order does. Raises ValueError if the order is rejected.
+        :param shopping_list: list of (product, quantity) tuples
+        :return: total_price: float
+        """
+        result = await self.place_order(shopping_list)
+        if not result.ok:
+            raise ValueError(result.errors[0].error)
+        return result.total_price
+
+    async def _next_batch(self):
+        """
+        This function waits for the first order of a batch and then
+        collects orders until the window closes or the batch is full
+        :return: tuple of (batch, stop) where stop is True when the service
+        was asked to stop
+        """
+        first = await self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - loop.time()
+            try:
+                if remaining > 0:
+                    item = await asyncio.wait_for(self._queue.get(),
+                                                  remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self) -> None:
+        """
+        This function is the batching task, it places batches of orders
+        until the service is stopped
+        :return: None
+        """
+        stop = False
+        while not stop:
+            batch, stop = await self._next_batch()
+            if stop:
+                # Place whatever was queued before the stop request
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not None:
+                        batch.append(item)
+            if batch:
+                self._place(batch)
+
+    def _place(self, batch) -> None:
+        """
+        This function places a batch of orders and resolves the future of
+        every caller with its own result
+        :param batch: list of (shopping_list, future) tuples
+        :return: None
+        """
+        try:
+            results = self.store.place_orders(
+                [shopping_list for shopping_list, _ in batch])
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
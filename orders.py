@@ -0,0 +1,79 @@
+# Class to create the result of one line of an order
+class OrderLine:
+    def __init__(self, product, quantity, price=None, error=None) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        :param product: product object of the line
+        :param quantity: requested quantity of the line
+        :param price: float - optional -> price of the line if it is valid,
+        int cents for orders priced in cents
+        :param error: str - optional -> why the line was rejected
+        """
+        self.product = product
+        self.quantity = quantity
+        self.price = price
+        self.error = error
+
+    def __repr__(self) -> str:
+        name = getattr(self.product, 'name', self.product)
+        if self.error:
+            return f'<OrderLine {self.quantity} x {name}: {self.error}>'
+        return f'<OrderLine {self.quantity} x {name}: {self.price}>'
+
+    @property
+    def ok(self) -> bool:
+        """
+        This function returns True if the line was accepted
+        :return: bool
+        """
+        return self.error is None
+
+
+# Class to create the result of a whole order
+class OrderResult:
+    def __init__(self, lines) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        :param lines: list of OrderLine objects
+        """
+        self.lines = lines
+
+    def __repr__(self) -> str:
+        if self.ok:
+            return f'<OrderResult {len(self.lines)} lines: ' \
+                   f'{self.total_price}>'
+        return f'<OrderResult {len(self.lines)} lines: rejected>'
+
+    @property
+    def ok(self) -> bool:
+        """
+        This function returns True if every line of the order was accepted
+        :return: bool
+        """
+        for line in self.lines:
+            if line.error is not None:
+                return False
+        return True
+
+    @property
+    def errors(self) -> list:
+        """
+        This function returns the rejected lines of the order
+        :return: list of OrderLine objects
+        """
+        return [line for line in self.lines if line.error is not None]
+
+    @property
+    def total_price(self) -> float:
+        """
+        This function returns the total price of the order, or None if the
+        order was rejected. Orders priced in cents add up to exact int
+        cents.
+        :return: total_price: float, or int with cents
+        """
+        if not self.ok:
+            return None
+        total_price: float = 0
+        for line in self.lines:
+            total_price += line.price
+        return total_price
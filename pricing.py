@@ -0,0 +1,107 @@
+import numpy as np
+
+import promotions
+from columnar import KIND_LIMITED
+from columnar import ProductView
+
+# Pricing rule codes, one per supported promotion class
+RULE_NONE = 0
+RULE_SECOND_HALF_PRICE = 1
+RULE_THIRD_ONE_FREE = 2
+RULE_PERCENT_DISCOUNT = 3
+RULE_OTHER = 4  # unknown promotion class, priced by apply_promotion
+
+
+def _promotion_rules(store):
+    """
+    This function maps every promotion id of a columnar store to its
+    pricing rule and percent parameter. Index 0 is for rows without a
+    promotion, promotion id i is at index i + 1.
+    :param store: ColumnarStore
+    :return: tuple of (rules, percents) numpy arrays
+    """
+    rules = np.empty(len(store.promotions) + 1, dtype=np.int8)
+    percents = np.zeros(len(store.promotions) + 1, dtype=np.float64)
+    rules[0] = RULE_NONE
+    for promotion_id, promotion in enumerate(store.promotions, start=1):
+        if type(promotion) is promotions.SecondHalfPrice:
+            rules[promotion_id] = RULE_SECOND_HALF_PRICE
+        elif type(promotion) is promotions.ThirdOneFree:
+            rules[promotion_id] = RULE_THIRD_ONE_FREE
+        elif type(promotion) is promotions.PercentDiscount:
+            rules[promotion_id] = RULE_PERCENT_DISCOUNT
+            percents[promotion_id] = promotion.percent
+        else:
+            rules[promotion_id] = RULE_OTHER
+    return rules, percents
+
+
+def price_lines(store, rows, quantities):
+    """
+    This function prices many order lines at once without changing the
+    stock. Every line gets the price Product.buy would charge for it.
+    Lines are grouped by pricing rule and each group is priced with the
+    closed form of its promotion, so the results match apply_promotion.
+    :param store: ColumnarStore
+    :param rows: array of product rows in the store
+    :param quantities: array of int quantities, one per row
+    :return: numpy array of line prices
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    quantities = np.asarray(quantities)
+    if quantities.dtype.kind not in 'iu':
+        raise TypeError("Invalid quantity type. Expected int.")
+    quantities = quantities.astype(np.int64)
+    if rows.shape != quantities.shape:
+        raise ValueError("Rows and quantities must have the same length.")
+
+    prices = store.prices[rows]
+    rules, percents = _promotion_rules(store)
+    promotion_index = store.promotion_ids[rows] + 1
+    line_rules = rules[promotion_index]
+    # LimitedProduct always sells its maximum and ignores promotions
+    limited = store.kinds[rows] == KIND_LIMITED
+    line_rules[limited] = RULE_NONE
+    quantities = np.where(limited, store.maximums[rows], quantities)
+
+    totals = np.empty(len(rows), dtype=np.float64)
+
+    group = line_rules == RULE_NONE
+    totals[group] = prices[group] * quantities[group]
+
+    group = line_rules == RULE_SECOND_HALF_PRICE
+    amount = quantities[group]
+    totals[group] = prices[group] * ((amount % 2) + (amount // 2) * 1.5)
+
+    group = line_rules == RULE_THIRD_ONE_FREE
+    amount = quantities[group]
+    totals[group] = prices[group] * ((amount % 3) + (amount // 3) * 2)
+
+    group = line_rules == RULE_PERCENT_DISCOUNT
+    promo_percentage = percents[promotion_index[group]] / 100
+    totals[group] = prices[group] - (prices[group] * promo_percentage)
+
+    for line in np.flatnonzero(line_rules == RULE_OTHER):
+        product = ProductView(store, int(rows[line]))
+        totals[line] = product.promotion.apply_promotion(
+            product, int(quantities[line]))
+    return totals
+
+
+def price_carts(store, cart_ids, rows, quantities, cart_count=None):
+    """
+    This function prices the lines of many carts at once and returns the
+    total price of every cart.
+    :param store: ColumnarStore
+    :param cart_ids: array of cart numbers, one per line, from 0
+    :param rows: array of product rows in the store
+    :param quantities: array of int quantities
+    :param cart_count: int - optional -> number of carts, by default the
+    highest cart number + 1
+    :return: numpy array of cart totals
+    """
+    cart_ids = np.asarray(cart_ids, dtype=np.int64)
+    totals = price_lines(store, rows, quantities)
+    if cart_count is None:
+        cart_count = int(cart_ids.max()) + 1 if len(cart_ids) else 0
+    return np.bincount(cart_ids, weights=totals, minlength=cart_count)
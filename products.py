@@ -1,5 +1,12 @@
+import weakref
+from functools import lru_cache
+
+import money
 import promotions
 
+# Quantities whose total price each product remembers
+PRICE_CACHE_SIZE = 128
+
 
 # Class to create different product instances
 class Product:
@@ -20,9 +27,15 @@ class Product:
 
         if quantity < 0:
             raise ValueError("Product quantity cannot be negative.")
+        # Stores tracking this product's state, held weakly so a store
+        # nobody uses any more is not kept alive by its products
+        self._observers = weakref.WeakSet()
+        # (promotion version, compiled and memoized pricing), built on demand
+        self._pricer = None
+        self._cents_pricer = None  # the same in whole cents
         try:
             self.name = name
-            self.price = price
+            self._price = price
             self._quantity = quantity
             self._promotion = None
             self._active = active
@@ -94,9 +107,43 @@ class Product:
         """
         if not isinstance(quantity, int):
             raise TypeError("Invalid quantity type. Expected int.")
+        old_quantity = self._quantity
         self._quantity = quantity
+        self._notify('quantity', old_quantity, quantity)
         if self._quantity == 0:
-            self._active = False  # Change active value
+            self.active = False  # Change active value
+
+    @property
+    def price(self) -> float:
+        """
+        This function returns the price of certain product
+        :return: price: float
+        """
+        return self._price
+
+    @price.setter
+    def price(self, price: float) -> None:
+        """
+        This function sets new price of certain product
+        :param price: float
+        :return: None
+        """
+        if price < 0:
+            raise ValueError("Product price cannot be negative.")
+        old_price = self._price
+        self._price = price
+        self._pricer = None
+        self._cents_pricer = None
+        if old_price != price:
+            self._notify('price', old_price, price)
+
+    @property
+    def price_cents(self) -> int:
+        """
+        This function returns the price of certain product in whole cents
+        :return: int
+        """
+        return money.to_cents(self.price)
 
     @property
     def promotion(self):
@@ -114,7 +161,20 @@ class Product:
         Args:
             promotion (float): The promotion value to set for the product.
         """
+        old_promotion = self._promotion
         self._promotion = promotion
+        self._promotion_changed(old_promotion)
+
+    @property
+    def promotion_version(self) -> int:
+        """
+        This function returns the version of the promotion of certain
+        product, prices computed with another version are stale
+        :return: int, or None without a promotion
+        """
+        if isinstance(self._promotion, promotions.Promotion):
+            return self._promotion.version
+        return None
 
     @property
     def active(self) -> bool:
@@ -130,31 +190,153 @@ class Product:
         This function sets the active value of certain product to True
         :return: None
         """
+        old_value = self._active
         self._active = value
+        if old_value != value:
+            self._notify('active', old_value, value)
 
     def deactivate(self) -> None:
         """
         This function sets the active value of certain product to False
         :return: None
         """
-        self._active = False
+        self.active = False
+
+    def __getstate__(self) -> dict:
+        """
+        This function returns the state used to pickle or copy a product.
+        The stores tracking the product are left out, a copy starts out in
+        no store.
+        :return: dict
+        """
+        state = self.__dict__.copy()
+        del state['_observers']
+        state['_pricer'] = None
+        state['_cents_pricer'] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        This function restores a pickled or copied product, tracked by no
+        store
+        :param state: dict
+        :return: None
+        """
+        self.__dict__.update(state)
+        self._observers = weakref.WeakSet()
+
+    def _notify(self, field: str, old_value, new_value) -> None:
+        """
+        This function tells every store holding this product that one of
+        its fields has changed, so the store can update its indexes
+        :param field: str - name of the changed field
+        :param old_value: value before the change
+        :param new_value: value after the change
+        :return: None
+        """
+        for observer in self._observers:
+            observer._product_changed(self, field, old_value, new_value)
+
+    def get_price(self, quantity: int) -> float:
+        """
+        This function returns the total price of buying a quantity of
+        certain product, without changing its stock.
+        :param quantity: int
+        :return: total_price: float
+        """
+        version = self.promotion_version
+        pricer = self._pricer
+        if pricer is None or pricer[0] != version:
+            pricer = self._pricer = (version, lru_cache(
+                maxsize=PRICE_CACHE_SIZE)(self._build_pricer()))
+        return pricer[1](quantity)
+
+    def _build_pricer(self):
+        """
+        This function compiles the promotion of certain product into one
+        pricing function. Products without a promotion pay the unit price.
+        :return: function - quantity -> total price
+        """
+        if isinstance(self.promotion, promotions.Promotion):
+            return self.promotion.compile(self)
+        price = self.price
+        return lambda quantity: price * quantity
+
+    def get_price_cents(self, quantity: int) -> int:
+        """
+        This function returns the total price of buying a quantity of
+        certain product in whole cents, see the money module for the
+        rounding rules.
+        :param quantity: int
+        :return: total_price: int
+        """
+        version = self.promotion_version
+        pricer = self._cents_pricer
+        if pricer is None or pricer[0] != version:
+            pricer = self._cents_pricer = (version, lru_cache(
+                maxsize=PRICE_CACHE_SIZE)(self._build_cents_pricer()))
+        return pricer[1](quantity)
+
+    def _build_cents_pricer(self):
+        """
+        This function returns the pricing function in whole cents of
+        certain product
+        :return: function - quantity -> total price in cents
+        """
+        promotion = self.promotion
+        if isinstance(promotion, promotions.Promotion):
+            return lambda quantity: promotion.apply_promotion_cents(
+                self, quantity)
+        price = self.price_cents
+        return lambda quantity: price * quantity
+
+    def refresh_pricing(self) -> None:
+        """
+        This function drops the memoized pricing of certain product, so
+        the next price is computed from the promotion again. The promotion
+        setter does it, and setting an attribute of the promotion is
+        noticed by its version. Call it after changing a promotion in any
+        other way, e.g. a list it holds.
+        :return: None
+        """
+        self._promotion_changed(self._promotion)
+
+    def _promotion_changed(self, old_promotion) -> None:
+        """
+        This function drops the compiled pricing and tells the stores
+        holding this product that its promotion changed
+        :param old_promotion: Promotion object - promotion before the change
+        :return: None
+        """
+        self._pricer = None
+        self._cents_pricer = None
+        self._notify('promotion', old_promotion, self._promotion)
 
-    def buy(self, quantity: int) -> float:
+    def stock_needed(self, quantity: int) -> int:
+        """
+        This function returns how many units buying a quantity of certain
+        product takes from its stock.
+        :param quantity: int
+        :return: int
+        """
+        return quantity
+
+    def buy(self, quantity: int, cents: bool = False) -> float:
         """
         This function gets a quantity of certain product and
         returns the total price.
         :param quantity: int
-        :return: total_price: float
+        :param cents: bool - optional -> return the price in whole cents
+        :return: total_price: float, or int with cents
         """
         if not isinstance(quantity, int):
             raise TypeError("Invalid quantity type. Expected int.")
         try:
             if self.quantity >= quantity:
-                if isinstance(self.promotion, promotions.Promotion):
-                    total_price = self.promotion.apply_promotion(self,
-                                                                 quantity)
+                if cents:
+                    total_price = self.get_price_cents(quantity)
                 else:
-                    total_price = self.price * quantity
+                    total_price = self.get_price(quantity)
                 self.quantity = self.quantity - quantity
                 return total_price
             else:
@@ -176,23 +358,32 @@ class NonStockedProduct(Product):
         This function returns the item name and price
         :return: str
         """
-        super().__str__()
-        return f'{self.name}, Price: {self.price}, ' \
-               f'Promotion: {self.promotion.discount_name}'
+        if isinstance(self.promotion, promotions.Promotion):
+            return f'{self.name}, Price: {self.price}, ' \
+                   f'Promotion: {self.promotion.discount_name}'
+        else:
+            return f'{self.name}, Price: {self.price}'
+
+    def stock_needed(self, quantity: int) -> int:
+        """
+        This function returns ZERO, the product is never taken from stock
+        :param quantity: int
+        :return: int
+        """
+        return 0
 
-    def buy(self, quantity: int) -> float:
+    def buy(self, quantity: int, cents: bool = False) -> float:
         """
         This function gets a quantity of certain product and
         returns the total price.
         :param quantity: int
-        :return: total_price: float
+        :param cents: bool - optional -> return the price in whole cents
+        :return: total_price: float, or int with cents
         """
         try:
-            if isinstance(self.promotion, promotions.Promotion):
-                total_price = self.promotion.apply_promotion(self, quantity)
-            else:
-                total_price = self.price * quantity
-            return total_price
+            if cents:
+                return self.get_price_cents(quantity)
+            return self.get_price(quantity)
         except TypeError:
             print('Error: Unexpected parameter type: quantity')
 
@@ -203,18 +394,49 @@ class LimitedProduct(Product):
         super().__init__(name, price, quantity, active)
         self.maximum = maximum
 
-    def buy(self, quantity: int = 1) -> float:
+    def get_price(self, quantity: int = 1) -> float:
+        """
+        This function returns the total price of buying the product,
+        which is always sold by its maximum quantity and never promoted.
+        :param quantity: int
+        :return: total_price: float
+        """
+        return self.price * self.maximum
+
+    def get_price_cents(self, quantity: int = 1) -> int:
+        """
+        This function returns the total price of buying the product in
+        whole cents, see get_price.
+        :param quantity: int
+        :return: total_price: int
+        """
+        return self.price_cents * self.maximum
+
+    def stock_needed(self, quantity: int = 1) -> int:
+        """
+        This function returns the maximum quantity, which is what every
+        purchase of the product takes from stock
+        :param quantity: int
+        :return: int
+        """
+        return self.maximum
+
+    def buy(self, quantity: int = 1, cents: bool = False) -> float:
         """
         This function gets a quantity of certain product and
         returns the total price.
         :param: quantity: int
-        :return: total_price: float
+        :param cents: bool - optional -> return the price in whole cents
+        :return: total_price: float, or int with cents
         """
         quantity = self.maximum
         try:
             if self.quantity >= quantity:
                 self.quantity = self.quantity - quantity
-                total_price = self.price * quantity
+                if cents:
+                    total_price = self.get_price_cents(quantity)
+                else:
+                    total_price = self.get_price(quantity)
                 return total_price
             else:
                 # Message for quantity more than available stock
@@ -1,11 +1,69 @@
+import itertools
 from abc import ABC, abstractmethod
+from fractions import Fraction
+
+import money
+
+# Versions of all promotions come from one counter, so a version is never
+# given out twice
+_versions = itertools.count(1)
 
 
 class Promotion(ABC):
+    _version = 0
+
+    def __setattr__(self, name, value):
+        """
+        Set an attribute of the promotion and bump its version, so prices
+        computed with the promotion before the change are not used again.
+        """
+        super().__setattr__(name, value)
+        super().__setattr__('_version', next(_versions))
+
+    @property
+    def version(self) -> int:
+        """
+        Return the version of the promotion, which grows every time an
+        attribute of the promotion is set. Versions are unique across all
+        promotions.
+        """
+        return self._version
+
     @abstractmethod
     def apply_promotion(self, product, quantity) -> float:
         pass
 
+    def compile(self, product):
+        """
+        Compile the promotion for one product into a pricing function.
+
+        The function gets a quantity and returns the same total price as
+        apply_promotion(product, quantity). Subclasses with a closed form
+        bind the product price once, so pricing is a single expression.
+
+        Args:
+            product (Product): The product to compile the promotion for.
+
+        Returns:
+            function: quantity -> total price.
+        """
+        return lambda quantity: self.apply_promotion(product, quantity)
+
+    def apply_promotion_cents(self, product, quantity) -> int:
+        """
+        Apply the promotion and return the total price in whole cents, see
+        the money module. By default the float price is rounded to cents,
+        subclasses price in cents directly.
+
+        Args:
+            product (Product): The product to apply the promotion to.
+            quantity (int): The quantity of the product.
+
+        Returns:
+            int: The total price in cents.
+        """
+        return money.to_cents(self.apply_promotion(product, quantity))
+
 
 class SecondHalfPrice(Promotion):
     def __init__(self, discount_name: str):
@@ -22,6 +80,27 @@ class SecondHalfPrice(Promotion):
             total_price = product.price * promo_coefficient
             return total_price
 
+    def compile(self, product):
+        """
+        Compile the promotion for one product, see Promotion.compile.
+        Every pair of items costs 1.5 times the price.
+        """
+        price = product.price
+        # Same arithmetic as apply_promotion, odd quantities add 1
+        return lambda quantity: price * ((quantity % 2) +
+                                         (quantity // 2) * 1.5)
+
+    def apply_promotion_cents(self, product, quantity) -> int:
+        """
+        Apply the promotion in whole cents, see
+        Promotion.apply_promotion_cents. The half price items of the line
+        are rounded together, half up.
+        """
+        price = product.price_cents
+        halves = quantity // 2
+        # The half price items of the line are rounded once, half up
+        return price * (quantity - halves) + money.divide(price, halves, 2)
+
 
 class ThirdOneFree(Promotion):
     """
@@ -88,6 +167,21 @@ class ThirdOneFree(Promotion):
             total_price = product.price * promo_coefficient
             return total_price
 
+    def compile(self, product):
+        """
+        Compile the promotion for one product, see Promotion.compile.
+        """
+        price = product.price
+        return lambda quantity: price * ((quantity % 3) +
+                                         ((quantity // 3) * 2))
+
+    def apply_promotion_cents(self, product, quantity) -> int:
+        """
+        Apply the promotion in whole cents, see
+        Promotion.apply_promotion_cents. Free items need no rounding.
+        """
+        return product.price_cents * ((quantity % 3) + ((quantity // 3) * 2))
+
 
 class PercentDiscount(Promotion):
     """
@@ -144,3 +238,99 @@ class PercentDiscount(Promotion):
         promo_percentage = self.percent / 100
         total_price = product.price - (product.price * promo_percentage)
         return total_price
+
+    def compile(self, product):
+        """
+        Compile the promotion for one product, see Promotion.compile.
+        The discounted price does not depend on the quantity, so it is
+        computed once.
+        """
+        total_price = self.apply_promotion(product, 1)
+        return lambda quantity: total_price
+
+    def apply_promotion_cents(self, product, quantity) -> int:
+        """
+        Apply the percentage discount in whole cents, see
+        Promotion.apply_promotion_cents. The discounted price is rounded
+        half up, so 5 cents at 30% off is 4 cents. The percent is taken
+        from its decimal text, like money.percent_of.
+        """
+        ratio = Fraction(str(self.percent))
+        whole = ratio.denominator * 100
+        return money.divide(product.price_cents, whole - ratio.numerator,
+                            whole)
+
+
+class PromotionStack(Promotion):
+    """
+    Several promotions on one product, the shopper gets the best price.
+
+    Each promotion of the stack prices the quantity on its own and the
+    lowest total wins.
+
+    Args:
+        promotions (list): The promotions of the stack.
+        discount_name (str): The name of the stack. By default the names
+        of its promotions joined with " / ".
+
+    Attributes:
+        promotions (tuple): The promotions of the stack.
+        discount_name (str): The name of the stack.
+    """
+    def __init__(self, promotions, discount_name: str = None):
+        """
+        Initialize the PromotionStack promotion.
+
+        Args:
+            promotions (list): The promotions of the stack.
+            discount_name (str): The name of the stack.
+        """
+        if not promotions:
+            raise ValueError("A promotion stack needs a promotion.")
+        self.promotions = tuple(promotions)
+        self.discount_name = discount_name or ' / '.join(
+            promotion.discount_name for promotion in self.promotions)
+
+    def apply_promotion(self, product, quantity) -> float:
+        """
+        Return the lowest total price any promotion of the stack gives.
+
+        Args:
+            product (Product): The product to apply the promotion to.
+            quantity (int): The quantity of the product.
+
+        Returns:
+            float: The best total price.
+        """
+        return min(promotion.apply_promotion(product, quantity)
+                   for promotion in self.promotions)
+
+    @property
+    def version(self) -> int:
+        """
+        Return the version of the stack, which grows every time an
+        attribute of the stack or of any of its promotions is set. It is
+        the newest of their versions, which no earlier state of the stack
+        can have had.
+        """
+        return max(self._version, max(promotion.version
+                                      for promotion in self.promotions))
+
+    def apply_promotion_cents(self, product, quantity) -> int:
+        """
+        Return the lowest total price in whole cents any promotion of the
+        stack gives.
+        """
+        return min(promotion.apply_promotion_cents(product, quantity)
+                   for promotion in self.promotions)
+
+    def compile(self, product):
+        """
+        Compile every promotion of the stack and return a function giving
+        the lowest of their prices.
+        """
+        pricers = [promotion.compile(product)
+                   for promotion in self.promotions]
+        if len(pricers) == 1:
+            return pricers[0]
+        return lambda quantity: min(pricer(quantity) for pricer in pricers)
@@ -0,0 +1,552 @@
+import copy
+import multiprocessing
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+
+from orders import OrderLine
+from orders import OrderResult
+from store import Store
+
+
+def shard_of(name: str, shards: int) -> int:
+    """
+    This function returns the shard owning the product with the given name.
+    The hash is stable across processes and runs.
+    :param name: str
+    :param shards: int
+    :return: int
+    """
+    return zlib.crc32(name.encode('utf-8')) % shards
+
+
+def _name_of(product) -> str:
+    """
+    This function returns the name of a product, or the name itself
+    :param product: product object or str
+    :return: str
+    """
+    if isinstance(product, str):
+        return product
+    return product.name
+
+
+# Commands a shard worker understands, all run against the shard's Store
+def _reserve(store, shopping_list, taken=None):
+    """
+    This function validates and prices the part of an order owned by one
+    shard, without changing any stock
+    :param store: Store
+    :param shopping_list: list of (name, quantity) tuples
+    :param taken: dict - optional -> id(product) -> [product, units]
+    reserved by earlier parts, which are not available
+    :return: tuple of (lines, reserved) where lines are (price, error) per
+    line and reserved is the stock the part takes, or None if any line of
+    the part failed
+    """
+    missing = OrderLine(None, 0, error="Product is not in store.")
+    products = [store.get_product(name) for name, _ in shopping_list]
+    known = [(product, quantity) for product, (_, quantity)
+             in zip(products, shopping_list) if product is not None]
+    result, reserved = store._reserve(known, taken)
+    known_lines = iter(result.lines)
+    lines = []
+    for product in products:
+        line = missing if product is None else next(known_lines)
+        lines.append((line.price, line.error))
+    if not result.ok or len(known) < len(products):
+        return lines, None
+    return lines, reserved
+
+
+def _quote(store, shopping_list) -> list:
+    return _reserve(store, shopping_list)[0]
+
+
+def _prepare(store, parts):
+    """
+    This function validates the parts of a batch of orders owned by one
+    shard one after the other, each against the stock left by the parts
+    before it that were valid, without changing any stock
+    :param store: Store
+    :param parts: list of shopping lists of (name, quantity) tuples
+    :return: tuple of (lines, reserved) with one entry per part, see
+    _reserve
+    """
+    taken = {}  # id(product) -> [product, units] of valid parts
+    lines = []
+    reserved = []
+    for part in parts:
+        part_lines, part_reserved = _reserve(store, part, taken)
+        lines.append(part_lines)
+        reserved.append(part_reserved)
+        for key, (product, units) in (part_reserved or {}).items():
+            taken.setdefault(key, [product, 0])[1] += units
+    return lines, reserved
+
+
+def _take(store, reserved, decisions) -> None:
+    """
+    This function takes the stock of the prepared parts the parent
+    accepted, once for the whole batch
+    :param store: Store
+    :param reserved: list of reserved stock per part, see _prepare
+    :param decisions: list of bool, one per part
+    :return: None
+    """
+    taken = {}
+    for part_reserved, accepted in zip(reserved, decisions):
+        if accepted and part_reserved is not None:
+            for key, (product, units) in part_reserved.items():
+                taken.setdefault(key, [product, 0])[1] += units
+    store._run_alerts(store._commit(taken))
+
+
+def _contains(store, name) -> bool:
+    return name in store
+
+
+def _drain(store) -> list:
+    """
+    This function removes every product from the shard and returns them
+    :param store: Store
+    :return: list of product objects
+    """
+    products = list(store.product)
+    for product in products:
+        store.remove_product(product)
+    return products
+
+
+def _add(store, products) -> None:
+    for product in products:
+        store.add_product(product)
+
+
+def _remove(store, names) -> None:
+    for name in names:
+        store.remove_product(store.get_product(name))
+
+
+_COMMANDS = {
+    'quote': _quote,
+    'contains': _contains,
+    'drain': _drain,
+    'add': _add,
+    'remove': _remove,
+    'total_quantity': lambda store: store.get_total_quantity(),
+    'products': lambda store: list(store.active_products),
+    'all_products': lambda store: list(store.product),
+    'count': lambda store: len(store.product),
+}
+
+
+def _serve(connection, products) -> None:
+    """
+    This function runs in every worker process. It owns a plain Store and
+    answers commands from the parent until told to stop.
+    :param connection: end of a multiprocessing Pipe
+    :param products: list of product objects of the shard
+    :return: None
+    """
+    store = Store(products)
+    prepared = None  # stock of the order parts waiting for the decision
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        command, args = message
+        # The decision on prepared order parts gets no reply. The parent
+        # holds the pipe from prepare to decision, so nothing can change
+        # the reserved stock in between.
+        if command == 'commit':
+            if prepared is not None:
+                _take(store, prepared, *args)
+            prepared = None
+            continue
+        if command == 'abort':
+            prepared = None
+            continue
+        try:
+            if command == 'prepare':
+                parts, final = args
+                lines, prepared = _prepare(store, parts)
+                if final:
+                    # The only shard of every order decides by itself
+                    _take(store, prepared, [True] * len(parts))
+                    prepared = None
+                reply = lines
+            else:
+                reply = _COMMANDS[command](store, *args)
+            connection.send((True, reply))
+        except Exception as error:
+            prepared = None
+            connection.send((False, error))
+    connection.close()
+
+
+def _check_shards(shards) -> None:
+    """
+    This function checks a number of shards
+    :param shards: int
+    :return: None
+    """
+    if not isinstance(shards, int) or shards < 1:
+        raise ValueError("Number of shards must be positive.")
+
+
+# Class to create stores partitioned by SKU across worker processes
+class ShardedStore:
+    def __init__(self, product, shards: int = None,
+                 context=None) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        Products are hash partitioned by name, every shard is a worker
+        process owning a plain Store. Products live in the workers, the
+        objects handed out by the sharded store are copies.
+        :param product: list of product objects - mandatory
+        :param shards: int - optional -> number of worker processes,
+        by default the number of CPUs
+        :param context: multiprocessing context - optional
+        """
+        if shards is None:
+            shards = os.cpu_count() or 1
+        _check_shards(shards)
+        self.shards = shards
+        self._context = context or multiprocessing.get_context()
+        self._locks = []  # one request at a time per pipe
+        self._workers = []
+        self._start(list(product))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __add__(self, other_store):
+        """
+            Merge the products of this store with another Store or
+            ShardedStore into a new sharded store, rebalanced over the
+            shards of this one.
+            Args:
+                other_store (Store | ShardedStore): The other store.
+            Returns:
+                ShardedStore: A new store with the products of both.
+        """
+        merged = Store(self.product).merge(other_store)
+        return ShardedStore(merged.product, self.shards, self._context)
+
+    def _start(self, products) -> None:
+        """
+        This function partitions the products and starts one worker
+        process per shard
+        :param products: list of product objects
+        :return: None
+        """
+        parts = [[] for _ in range(self.shards)]
+        for product in products:
+            # Copies leave behind the stores tracking the product here
+            parts[shard_of(product.name, self.shards)].append(
+                copy.copy(product))
+        for part in parts:
+            parent_end, worker_end = self._context.Pipe()
+            process = self._context.Process(target=_serve,
+                                            args=(worker_end, part),
+                                            daemon=True)
+            process.start()
+            worker_end.close()
+            self._workers.append((process, parent_end))
+        self._locks = [threading.Lock() for _ in parts]
+
+    @contextmanager
+    def _hold(self, shards):
+        """
+        This function holds the pipe locks of the given shards for the
+        body of a with statement. Locks are always taken in increasing
+        shard order, so two callers can never wait on each other, and
+        requests to other shards go on meanwhile.
+        :param shards: iterable of int
+        :return: context manager
+        """
+        locks = [self._locks[shard] for shard in sorted(set(shards))]
+        taken = []
+        try:
+            for lock in locks:
+                lock.acquire()
+                taken.append(lock)
+            yield
+        finally:
+            for lock in reversed(taken):
+                lock.release()
+
+    def _call(self, requests) -> dict:
+        """
+        This function sends commands to several shards at once and waits
+        for all replies, so the shards work in parallel
+        :param requests: dict of shard -> (command, args)
+        :return: dict of shard -> reply
+        """
+        with self._hold(requests):
+            return self._exchange(requests)
+
+    def _exchange(self, requests) -> dict:
+        """
+        This function does the work of _call, the caller holds the locks
+        :param requests: dict of shard -> (command, args)
+        :return: dict of shard -> reply
+        """
+        if not self._workers:
+            raise RuntimeError("Sharded store is closed.")
+        for shard, request in requests.items():
+            self._workers[shard][1].send(request)
+        replies = {}
+        for shard in requests:
+            replies[shard] = self._workers[shard][1].recv()
+        for ok, reply in replies.values():
+            if not ok:
+                raise reply
+        return {shard: reply for shard, (_, reply) in replies.items()}
+
+    def _gather(self, command) -> list:
+        """
+        This function runs a command on every shard and joins the lists
+        they return
+        :param command: str
+        :return: list
+        """
+        replies = self._call({shard: (command, ())
+                              for shard in range(self.shards)})
+        gathered = []
+        for shard in range(self.shards):
+            gathered.extend(replies[shard])
+        return gathered
+
+    def close(self) -> None:
+        """
+        This function stops all worker processes
+        :return: None
+        """
+        with self._hold(range(len(self._locks))):
+            for process, connection in self._workers:
+                connection.send(None)
+                connection.close()
+            for process, _ in self._workers:
+                process.join()
+            self._workers = []
+
+    def add_product(self, product) -> None:
+        """
+        This function sends a product to the shard owning its name
+        :param product: object
+        :return: None
+        """
+        self._call({shard_of(product.name, self.shards):
+                    ('add', ([product],))})
+
+    def remove_product(self, product) -> None:
+        """
+        This function removes a product, given by object or name
+        :param product: object or str
+        :return: None
+        """
+        name = _name_of(product)
+        self._call({shard_of(name, self.shards): ('remove', ([name],))})
+
+    def get_total_quantity(self) -> int:
+        """
+        This function returns the total quantity of all items in store
+        :return: total_quantity: int
+        """
+        return sum(self._call({shard: ('total_quantity', ())
+                               for shard in range(self.shards)}).values())
+
+    def get_all_products(self) -> list:
+        """
+        This function returns copies of the active products of all shards
+        :return: product_list: list
+        """
+        return self._gather('products')
+
+    @property
+    def product(self) -> list:
+        """
+        This function returns copies of all products of all shards, like
+        the product list of a Store
+        :return: list
+        """
+        return self._gather('all_products')
+
+    def __len__(self) -> int:
+        return sum(self._call({shard: ('count', ())
+                               for shard in range(self.shards)}).values())
+
+    def rebalance(self, shards: int = None) -> None:
+        """
+        This function moves all products onto a new number of shards
+        :param shards: int - optional -> new number of shards, by default
+        the current one
+        :return: None
+        """
+        if shards is None:
+            shards = self.shards
+        _check_shards(shards)
+        products = self._gather('drain')
+        self.close()
+        self.shards = shards
+        self._start(products)
+
+    def __contains__(self, product) -> bool:
+        """
+        This function checks if an active product with the given name is
+        in store, like Store does
+        :param product: object or str
+        :return: bool
+        """
+        name = _name_of(product)
+        shard = shard_of(name, self.shards)
+        return self._call({shard: ('contains', (name,))})[shard]
+
+    def _split(self, shopping_list) -> dict:
+        """
+        This function splits an order into the parts owned by each shard
+        :param shopping_list: list of (product or name, quantity) tuples
+        :return: dict of shard -> list of positions in the order
+        """
+        parts = {}
+        for position, (product, quantity) in enumerate(shopping_list):
+            shard = shard_of(_name_of(product), self.shards)
+            parts.setdefault(shard, []).append(position)
+        return parts
+
+    @staticmethod
+    def _result(shopping_list, parts, replies) -> OrderResult:
+        """
+        This function puts the lines the shards sent back in order
+        :param shopping_list: list of (product or name, quantity) tuples
+        :param parts: dict of shard -> list of positions in the order
+        :param replies: dict of shard -> list of (price, error) tuples
+        :return: OrderResult
+        """
+        lines = [None] * len(shopping_list)
+        for shard, positions in parts.items():
+            for position, (price, error) in zip(positions, replies[shard]):
+                product, quantity = shopping_list[position]
+                lines[position] = OrderLine(product, quantity, price, error)
+        return OrderResult(lines)
+
+    @staticmethod
+    def _part(shopping_list, positions) -> list:
+        """
+        This function returns the lines of an order at the given positions
+        as they are sent to a shard
+        :param shopping_list: list of (product or name, quantity) tuples
+        :param positions: list of int
+        :return: list of (name, quantity) tuples
+        """
+        return [(_name_of(shopping_list[position][0]),
+                 shopping_list[position][1]) for position in positions]
+
+    def quote(self, shopping_list) -> OrderResult:
+        """
+        This function prices a shopping list without taking any stock,
+        like Store.quote does
+        :param shopping_list: list of (product or name, quantity) tuples
+        :return: OrderResult
+        """
+        shopping_list = list(shopping_list)
+        parts = self._split(shopping_list)
+        replies = self._call({
+            shard: ('quote', (self._part(shopping_list, positions),))
+            for shard, positions in parts.items()})
+        return self._result(shopping_list, parts, replies)
+
+    def place_order(self, shopping_list) -> OrderResult:
+        """
+        This function places an order as one unit, see place_orders
+        :param shopping_list: list of (product or name, quantity) tuples
+        :return: OrderResult
+        """
+        return self.place_orders([shopping_list])[0]
+
+    def place_orders(self, shopping_lists) -> list:
+        """
+        This function splits a batch of orders by shard and places them
+        with a two phase commit in one round trip per shard. Every shard
+        gets its parts of all orders in one message, validates them one
+        after the other and keeps the stock reserved. Then every shard is
+        told in one message which parts to take: those of the orders all
+        shards found valid. So every order is all or nothing and no stock
+        is ever given back. A shard that is the only shard of each of its
+        orders takes the stock right away. The stock a part reserves stays
+        reserved for the later parts of the batch on that shard even if
+        another shard rejects the order, so a batch may reject an order
+        that alone would have gone through, but it never oversells.
+        Only the pipes of the shards the batch touches are locked.
+        :param shopping_lists: list of shopping lists of (product or name,
+        quantity) tuples
+        :return: list of OrderResult, one per order
+        """
+        shopping_lists = [list(shopping_list)
+                          for shopping_list in shopping_lists]
+        orders = [self._split(shopping_list)
+                  for shopping_list in shopping_lists]
+        batch = {}  # shard -> list of numbers of the orders it has parts of
+        for number, parts in enumerate(orders):
+            for shard in parts:
+                batch.setdefault(shard, []).append(number)
+        final = {shard: all(len(orders[number]) == 1 for number in numbers)
+                 for shard, numbers in batch.items()}
+        requests = {
+            shard: ('prepare', ([self._part(shopping_lists[number],
+                                             orders[number][shard])
+                                 for number in numbers], final[shard]))
+            for shard, numbers in batch.items()}
+        with self._hold(batch):
+            try:
+                replies = self._exchange(requests)
+            except Exception:
+                self._decide(batch, 'abort')
+                raise
+            lines = [{} for _ in orders]  # shard -> lines, per order
+            for shard, numbers in batch.items():
+                for number, part_lines in zip(numbers, replies[shard]):
+                    lines[number][shard] = part_lines
+            results = [self._result(shopping_list, parts, order_lines)
+                       for shopping_list, parts, order_lines
+                       in zip(shopping_lists, orders, lines)]
+            self._decide({shard: numbers for shard, numbers in batch.items()
+                          if not final[shard]}, 'commit', results)
+        return results
+
+    def _decide(self, batch, decision: str, results=()) -> None:
+        """
+        This function tells the shards of a batch which prepared parts to
+        take. The caller holds the locks.
+        :param batch: dict of shard -> list of numbers of its orders
+        :param decision: str - 'commit' or 'abort'
+        :param results: list of OrderResult - optional -> results of the
+        orders, a commit takes the parts of the valid ones
+        :return: None
+        """
+        if not self._workers:
+            return
+        for shard, numbers in batch.items():
+            if decision == 'commit':
+                message = ('commit', ([results[number].ok
+                                       for number in numbers],))
+            else:
+                message = ('abort', ())
+            self._workers[shard][1].send(message)
+
+    def order(self, shopping_list) -> float:
+        """
+        This function places an order like Store.order does
+        :param shopping_list: list of (product or name, quantity) tuples
+        :return: total_price: float
+        """
+        result = self.place_order(shopping_list)
+        if not result.ok:
+            raise ValueError(result.errors[0].error)
+        return result.total_price
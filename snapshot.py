@@ -0,0 +1,298 @@
+import mmap
+import os
+import struct
+
+import promotions
+from products import Product
+from products import NonStockedProduct
+from products import LimitedProduct
+from store import Store
+
+# File layout, all little endian:
+#   header
+#   promotion records, fixed width
+#   product records, fixed width
+#   string table, UTF-8 names referenced by (offset, length)
+MAGIC = b'BBSN'
+VERSION = 2
+HEADER = struct.Struct('<4sHHQQQQ')  # magic, version, flags, products,
+#                                      promotions, string table size,
+#                                      last order journal sequence
+PROMOTION_RECORD = struct.Struct('<B3xIId')  # type, name offset,
+#                                              name length, percent
+PRODUCT_RECORD = struct.Struct('<dqqIIiBB2x')  # price, quantity, maximum,
+#                                                name offset, name length,
+#                                                promotion, kind, active
+
+# Product kinds
+KIND_STOCKED = 0
+KIND_NON_STOCKED = 1
+KIND_LIMITED = 2
+
+# Promotion types
+PROMOTION_SECOND_HALF_PRICE = 0
+PROMOTION_THIRD_ONE_FREE = 1
+PROMOTION_PERCENT_DISCOUNT = 2
+NO_PROMOTION = -1
+
+
+class SnapshotError(ValueError):
+    """
+    Raised when a file is not a valid inventory snapshot, or a store holds
+    something the snapshot format cannot represent.
+    """
+
+
+def _product_kind(product) -> int:
+    """
+    This function returns the snapshot kind of a product object
+    :param product: object
+    :return: int
+    """
+    if isinstance(product, NonStockedProduct):
+        return KIND_NON_STOCKED
+    if isinstance(product, LimitedProduct):
+        return KIND_LIMITED
+    return KIND_STOCKED
+
+
+def _promotion_type(promotion) -> int:
+    """
+    This function returns the snapshot type of a promotion object
+    :param promotion: Promotion object
+    :return: int
+    """
+    if type(promotion) is promotions.SecondHalfPrice:
+        return PROMOTION_SECOND_HALF_PRICE
+    if type(promotion) is promotions.ThirdOneFree:
+        return PROMOTION_THIRD_ONE_FREE
+    if type(promotion) is promotions.PercentDiscount:
+        return PROMOTION_PERCENT_DISCOUNT
+    raise SnapshotError(f"Cannot save promotion {promotion!r}.")
+
+
+def save_snapshot(store, path, sequence: int = 0) -> None:
+    """
+    This function writes all products of a store to a binary snapshot file.
+    Promotions shared by several products are written once.
+    :param store: Store object, or any object with a product list
+    :param path: str or path-like
+    :param sequence: int - optional -> sequence number of the last order
+    journal record included in the snapshot
+    :return: None
+    """
+    strings = bytearray()
+
+    def add_string(text):
+        encoded = text.encode('utf-8')
+        offset = len(strings)
+        strings.extend(encoded)
+        return offset, len(encoded)
+
+    promotion_ids = {}  # id(promotion) -> promotion record number
+    promotion_records = []
+    product_records = []
+    for product in store.product:
+        promotion = product.promotion
+        promotion_id = NO_PROMOTION
+        if promotion is not None:
+            promotion_id = promotion_ids.get(id(promotion))
+            if promotion_id is None:
+                promotion_id = len(promotion_records)
+                promotion_ids[id(promotion)] = promotion_id
+                promotion_records.append(PROMOTION_RECORD.pack(
+                    _promotion_type(promotion),
+                    *add_string(promotion.discount_name),
+                    getattr(promotion, 'percent', 0)))
+        kind = _product_kind(product)
+        product_records.append(PRODUCT_RECORD.pack(
+            product.price, product.quantity,
+            product.maximum if kind == KIND_LIMITED else 0,
+            *add_string(product.name), promotion_id, kind,
+            bool(product.active)))
+
+    with open(path, 'wb') as snapshot_file:
+        snapshot_file.write(HEADER.pack(MAGIC, VERSION, 0,
+                                        len(product_records),
+                                        len(promotion_records),
+                                        len(strings), sequence))
+        snapshot_file.write(b''.join(promotion_records))
+        snapshot_file.write(b''.join(product_records))
+        snapshot_file.write(strings)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+
+
+# Class to open a snapshot file and build its products on demand
+class Snapshot:
+    def __init__(self, path) -> None:
+        """
+        Initializer function to be used upon creating any new instance.
+        The file is memory-mapped, nothing is parsed until a product is
+        accessed.
+        :param path: str or path-like - mandatory
+        """
+        with open(path, 'rb') as snapshot_file:
+            self._map = mmap.mmap(snapshot_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        try:
+            magic, version, _, self._count, promotion_count, string_size, \
+                self.sequence = HEADER.unpack_from(self._map, 0)
+        except struct.error:
+            self._map.close()
+            raise SnapshotError("File is too short for a snapshot.")
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise SnapshotError(f"File is not a version {VERSION} snapshot.")
+        self._promotions_at = HEADER.size
+        self._products_at = self._promotions_at + \
+            promotion_count * PROMOTION_RECORD.size
+        self._strings_at = self._products_at + \
+            self._count * PRODUCT_RECORD.size
+        if len(self._map) != self._strings_at + string_size:
+            self._map.close()
+            raise SnapshotError("Snapshot file is truncated.")
+        self._promotion_count = promotion_count
+        self._promotions = {}  # promotion record -> Promotion object
+        self._products = {}  # product record -> Product object
+        self._names = None  # name -> product record, built on demand
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, position: int):
+        """
+        This function returns the product of a record, building it the
+        first time it is accessed
+        :param position: int
+        :return: product object
+        """
+        if position < 0:
+            position += self._count
+        if not 0 <= position < self._count:
+            raise IndexError("Snapshot record out of range.")
+        product = self._products.get(position)
+        if product is None:
+            product = self._build_product(position)
+            self._products[position] = product
+        return product
+
+    def __iter__(self):
+        for position in range(self._count):
+            yield self[position]
+
+    def close(self) -> None:
+        """
+        This function unmaps the snapshot file
+        :return: None
+        """
+        self._map.close()
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings_at + offset
+        return self._map[start:start + length].decode('utf-8')
+
+    def _promotion(self, promotion_id: int):
+        """
+        This function returns the promotion object of a promotion record,
+        every record is built once and shared by its products
+        :param promotion_id: int
+        :return: Promotion object or None
+        """
+        if promotion_id == NO_PROMOTION:
+            return None
+        promotion = self._promotions.get(promotion_id)
+        if promotion is None:
+            promotion_type, name_offset, name_length, percent = \
+                PROMOTION_RECORD.unpack_from(
+                    self._map, self._promotions_at +
+                    promotion_id * PROMOTION_RECORD.size)
+            name = self._string(name_offset, name_length)
+            if promotion_type == PROMOTION_SECOND_HALF_PRICE:
+                promotion = promotions.SecondHalfPrice(name)
+            elif promotion_type == PROMOTION_THIRD_ONE_FREE:
+                promotion = promotions.ThirdOneFree(name)
+            elif promotion_type == PROMOTION_PERCENT_DISCOUNT:
+                if percent.is_integer():
+                    percent = int(percent)
+                promotion = promotions.PercentDiscount(name, percent)
+            else:
+                raise SnapshotError(f"Unknown promotion type "
+                                    f"{promotion_type}.")
+            self._promotions[promotion_id] = promotion
+        return promotion
+
+    def _build_product(self, position: int):
+        """
+        This function builds the product object of a product record
+        :param position: int
+        :return: product object
+        """
+        price, quantity, maximum, name_offset, name_length, promotion_id, \
+            kind, active = PRODUCT_RECORD.unpack_from(
+                self._map, self._products_at +
+                position * PRODUCT_RECORD.size)
+        if price.is_integer():
+            price = int(price)
+        name = self._string(name_offset, name_length)
+        if kind == KIND_NON_STOCKED:
+            product = NonStockedProduct(name, price, active=bool(active))
+        elif kind == KIND_LIMITED:
+            product = LimitedProduct(name, price, quantity, maximum,
+                                     active=bool(active))
+        else:
+            product = Product(name, price, quantity, active=bool(active))
+        product.promotion = self._promotion(promotion_id)
+        return product
+
+    def find(self, name: str):
+        """
+        This function returns the product with the given name, or None.
+        The first call reads every name once to build a lookup table.
+        :param name: str
+        :return: product object or None
+        """
+        if self._names is None:
+            self._names = {}
+            for position, record in enumerate(PRODUCT_RECORD.iter_unpack(
+                    self._map[self._products_at:self._strings_at])):
+                self._names.setdefault(self._string(record[3], record[4]),
+                                       position)
+        position = self._names.get(name)
+        if position is None:
+            return None
+        return self[position]
+
+    def get_total_quantity(self) -> int:
+        """
+        This function returns the total quantity of all products as saved,
+        read straight from the records without building any product
+        :return: int
+        """
+        return sum(record[1] for record in PRODUCT_RECORD.iter_unpack(
+            self._map[self._products_at:self._strings_at]))
+
+    def to_store(self, **store_options) -> Store:
+        """
+        This function builds every product and returns them in a Store
+        :param store_options: keyword arguments for Store
+        :return: Store
+        """
+        return Store(list(self), **store_options)
+
+
+def load_store(path, **store_options) -> Store:
+    """
+    This function loads a snapshot file into a new Store
+    :param path: str or path-like
+    :param store_options: keyword arguments for Store
+    :return: Store
+    """
+    with Snapshot(path) as snapshot:
+        return snapshot.to_store(**store_options)
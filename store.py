@@ -1,26 +1,133 @@
+import copy
+import itertools
+import logging
+import threading
+import time
+import weakref
+from contextlib import nullcontext
+
+from frozen import FrozenStore
+from holds import HOLD_TTL
+from holds import Hold
+from holds import TimingWheel
+from indexes import PriceIndex
+from indexes import SearchIndex
+from indexes import StockHeap
+from locking import LockStripes
+from orders import OrderLine
+from orders import OrderResult
+from products import NonStockedProduct
+
+logger = logging.getLogger(__name__)
+
+# Policies settling price and promotion when merged products differ
+MERGE_POLICIES = ('self', 'other', 'lowest_price', 'highest_price')
+
+
+def _check_policy(conflict) -> None:
+    """
+    This function checks a merge conflict policy
+    :param conflict: str or function
+    :return: None
+    """
+    if not callable(conflict) and conflict not in MERGE_POLICIES:
+        raise ValueError(f"Unknown merge policy {conflict!r}.")
+
+
+def _merge_product(target, incoming, conflict) -> None:
+    """
+    This function folds a product into another product with the same
+    name: the stock is summed, and price and promotion are settled by the
+    conflict policy
+    :param target: product object which is changed
+    :param incoming: product object which is merged into the target
+    :param conflict: str - one of MERGE_POLICIES, or a function getting
+    (target, incoming) and returning the product to take price and
+    promotion from
+    :return: None
+    """
+    if callable(conflict):
+        source = conflict(target, incoming)
+    elif conflict == 'self':
+        source = target
+    elif conflict == 'other':
+        source = incoming
+    elif conflict == 'lowest_price':
+        source = incoming if incoming.price < target.price else target
+    else:
+        source = incoming if incoming.price > target.price else target
+    if source is not target:
+        target.price = source.price
+        target.promotion = source.promotion
+    active = target.active or incoming.active
+    target.quantity = target.quantity + incoming.quantity
+    target.active = active
+
+
 # Class to create different store instances
 class Store:
-    def __init__(self, product):
+    def __init__(self, product, lock_stripes: int = 0,
+                 clock=time.monotonic):
         """
         Initializer function to be used upon creating any new instance.
         :param product: list of product objects - Mandatory
+        :param lock_stripes: int - optional -> 0 (default) for a store used
+        by one thread. Otherwise orders lock the products they touch with
+        a pool of this many locks, so many threads can order at once; 1
+        makes it a single global lock.
+        :param clock: function - optional -> returns the time in seconds
+        cart holds expire by
         """
-        self.product = product
+        if lock_stripes:
+            self._locks = LockStripes(lock_stripes)
+            self._state_lock = threading.Lock()  # guards store indexes
+        else:
+            self._locks = None
+            self._state_lock = nullcontext()
+        self.product = []
+        self._index = {}  # product name / SKU -> list of products
+        self._active = {}  # id(product) -> product, for active products
+        self._active_version = 0
+        self._active_view = ()
+        self._active_view_version = 0
+        self._total_quantity = 0  # running sum of all product quantities
+        self._price_index = PriceIndex()  # active products by price
+        self._search_index = SearchIndex()  # active products by name words
+        self._stock_heap = StockHeap()  # stocked products by quantity
+        self._stock_alerts = []  # (threshold, callback) pairs
+        self._commit_alerts = threading.local()  # alerts of running commits
+        self.journal = None  # OrderJournal recording committed orders
+        self._journaled = threading.local()  # last record of each thread
+        self._snapshots = weakref.WeakSet()  # live FrozenStore views
+        self.clock = clock
+        self._held = {}  # id(product) -> [product, units] held by carts
+        self._holds = TimingWheel(start=clock())  # live holds by expiry
+        self._hold_ids = itertools.count(1)
+        self.add_products(product)
 
     def __contains__(self, product_name):
         """
             Check if a product with the given name exists in the store.
             Args:
-                product_name (str): The name of the product to check.
+                product_name (str | Product): The name of the product to
+                check, or a product object whose name is looked up.
             Returns:
-                bool: True if a product with the given name exists in the
-                store, False otherwise.
+                bool: True if an active product with the given name exists
+                in the store, False otherwise.
         """
-        return product_name in self.get_all_products()
+        if not isinstance(product_name, str):
+            product_name = product_name.name
+        for item in self._index.get(product_name, ()):
+            if item.active:
+                return True
+        return False
 
     def __add__(self, other_store):
         """
             Merge the products of two stores and create a new store.
+            Products are keyed by name / SKU, products with the same name
+            become one product holding the sum of their stock, with the
+            price and promotion of the first one.
             Args:
                 other_store (Store): The other store whose products should be
                 merged with the current store.
@@ -28,11 +135,62 @@ class Store:
                 Store: A new store containing the merged products from both
                 stores.
         """
-        new_store = Store([])
-        all_items = list(self.product) + list(other_store.product)
-        for item in all_items:
-            new_store.add_product(item)
-        return new_store
+        return self.merge(other_store)
+
+    def merge(self, other_store, conflict='self'):
+        """
+        This function merges the products of two stores into a new store
+        in O(n + m). Products found in only one store are shared with it,
+        products with the same name are merged into a new copy, so neither
+        store changes.
+        :param other_store: Store object, or any object with a product list
+        :param conflict: str or function - optional -> policy settling
+        price and promotion of merged products, see MERGE_POLICIES
+        :return: Store
+        """
+        _check_policy(conflict)
+        merged = {}  # name -> product
+        copies = set()  # ids of products copied by this merge
+        for item in list(self.product) + list(other_store.product):
+            target = merged.get(item.name)
+            if target is None:
+                merged[item.name] = item
+            elif target is not item:
+                if id(target) not in copies:
+                    target = copy.copy(target)
+                    merged[item.name] = target
+                    copies.add(id(target))
+                _merge_product(target, item, conflict)
+        return Store(list(merged.values()), len(self._locks or ()))
+
+    def merge_from(self, other_store, conflict='self') -> None:
+        """
+        This function merges the products of another store into this one
+        in O(m). Products with a name this store already has are folded
+        into the product of this store, the others are added.
+        :param other_store: Store object, or any object with a product list
+        :param conflict: str or function - optional -> policy settling
+        price and promotion of merged products, see MERGE_POLICIES
+        :return: None
+        """
+        _check_policy(conflict)
+        for item in list(other_store.product):
+            same_name = self._index.get(item.name)
+            if not same_name:
+                self.add_product(item)
+            elif same_name[0] is not item:
+                _merge_product(same_name[0], item, conflict)
+
+    def _has_item(self, product) -> bool:
+        """
+        This function checks if this exact product object is in the store
+        :param product: object
+        :return: bool
+        """
+        for item in self._index.get(product.name, ()):
+            if item is product:
+                return True
+        return False
 
     def add_product(self, product) -> None:
         """
@@ -40,16 +198,311 @@ class Store:
         :param product: object
         :return: None
         """
+        with self._state_lock:
+            self._add(product)
+            if product.active:
+                self._set_active(product, True)
+
+    def add_products(self, products) -> None:
+        """
+        This function gets several product objects and adds them to the
+        product list. The active ones go into the price and search indexes
+        together, with one sort instead of one insert each.
+        :param products: iterable of product objects
+        :return: None
+        """
+        with self._state_lock:
+            active = []
+            try:
+                for product in products:
+                    self._add(product)
+                    if product.active:
+                        active.append(product)
+            finally:
+                self._activate(active)
+
+    def _add(self, product) -> None:
+        """
+        This function adds a product to everything but the indexes of
+        active products. The caller holds the state lock.
+        :param product: object
+        :return: None
+        """
+        if self._has_item(product):
+            raise ValueError("Product is already in store.")
         self.product.append(product)
+        for snapshot in self._snapshots:
+            snapshot._product_added(product)
+        self._index.setdefault(product.name, []).append(product)
+        product._observers.add(self)
+        self._total_quantity += product.quantity
+        if not isinstance(product, NonStockedProduct):
+            self._stock_heap.push(product)
+
+    def _activate(self, products) -> None:
+        """
+        This function adds many products to the set of active products,
+        see _set_active
+        :param products: list of product objects
+        :return: None
+        """
+        products = [item for item in products if id(item) not in self._active]
+        if not products:
+            return
+        for item in products:
+            self._active[id(item)] = item
+        self._price_index.add_many(products)
+        self._search_index.add_many(products)
+        self._active_version += 1
 
     def remove_product(self, product) -> None:
         """
         This function gets a product object and remove it
-        from the product list
+        from the product list. Holds of carts with the product in them are
+        released.
+        :param product: object
+        :return: None
+        """
+        with self._state_lock:
+            # Remove by identity, Product.__eq__ only compares prices
+            for position, item in enumerate(self.product):
+                if item is product:
+                    del self.product[position]
+                    break
+            else:
+                raise ValueError("Product is not in store.")
+            for snapshot in self._snapshots:
+                snapshot._product_removed(product)
+            product._observers.discard(self)
+            self._set_active(product, False)
+            released = []
+            if id(product) in self._held:
+                for hold_id, hold in self._holds.items():
+                    if id(product) in hold.reserved:
+                        hold.state = 'released'
+                        self._holds.cancel(hold_id)
+                        released.append(hold)
+            self._stock_heap.discard(product)
+            self._total_quantity -= product.quantity
+            same_name = [item for item in self._index[product.name]
+                         if item is not product]
+            if same_name:
+                self._index[product.name] = same_name
+            else:
+                del self._index[product.name]
+        for hold in released:
+            self._hold_units(hold.reserved, -1)
+
+    def _product_changed(self, product, field: str, old_value,
+                         new_value) -> None:
+        """
+        This function is called by a product of this store whenever one of
+        its fields changes, and keeps the store indexes up to date
         :param product: object
+        :param field: str - name of the changed field
+        :param old_value: value before the change
+        :param new_value: value after the change
         :return: None
         """
-        self.product.remove(product)
+        with self._state_lock:
+            for snapshot in self._snapshots:
+                snapshot._changed(product, field, old_value)
+            if field == 'quantity':
+                self._total_quantity += new_value - old_value
+                self._stock_heap.update(product)
+                alerts = [callback for threshold, callback
+                          in self._stock_alerts
+                          if new_value <= threshold < old_value]
+            elif field == 'active':
+                self._set_active(product, new_value)
+            elif field == 'price':
+                self._price_index.update(product)
+        # Callbacks run outside the lock, they may use the store. During a
+        # commit they are handed to the caller, which runs them once all
+        # stock of the order is taken and its locks are released.
+        if field == 'quantity' and alerts:
+            alerts = [(callback, product, new_value) for callback in alerts]
+            waiting = getattr(self._commit_alerts, 'alerts', None)
+            if waiting is None:
+                self._run_alerts(alerts)
+            else:
+                waiting.extend(alerts)
+
+    @staticmethod
+    def _run_alerts(alerts) -> None:
+        """
+        This function calls stock alert callbacks. A callback which raises
+        is logged and does not stop the others.
+        :param alerts: list of (callback, product, quantity) tuples
+        :return: None
+        """
+        for callback, product, quantity in alerts:
+            try:
+                callback(product, quantity)
+            except Exception:
+                logger.exception("Stock alert %r failed for %r.",
+                                 callback, product.name)
+
+    def add_stock_alert(self, threshold: int, callback) -> None:
+        """
+        This function registers a callback which is called with
+        (product, quantity) every time the quantity of a product of the
+        store drops from above the threshold to the threshold or below
+        :param threshold: int
+        :param callback: function
+        :return: None
+        """
+        with self._state_lock:
+            self._stock_alerts.append((threshold, callback))
+
+    def remove_stock_alert(self, callback) -> None:
+        """
+        This function unregisters every alert using the callback
+        :param callback: function
+        :return: None
+        """
+        with self._state_lock:
+            self._stock_alerts = [(threshold, registered)
+                                  for threshold, registered
+                                  in self._stock_alerts
+                                  if registered is not callback]
+
+    def lowest_stock(self, count: int) -> list:
+        """
+        This function returns the count stocked products with the lowest
+        quantity, lowest first. Sold out products are included, whether
+        active or not.
+        :param count: int
+        :return: product_list: list
+        """
+        with self._state_lock:
+            return self._stock_heap.smallest(count)
+
+    def _set_active(self, product, active: bool) -> None:
+        """
+        This function adds a product to, or drops it from, the set of
+        active products and bumps the active version if the set changed
+        :param product: object
+        :param active: bool
+        :return: None
+        """
+        if active:
+            if id(product) in self._active:
+                return
+            self._active[id(product)] = product
+            self._price_index.add(product)
+            self._search_index.add(product)
+        elif self._active.pop(id(product), None) is None:
+            return
+        else:
+            self._price_index.discard(product)
+            self._search_index.discard(product)
+        self._active_version += 1
+
+    def snapshot(self) -> FrozenStore:
+        """
+        This function returns a point-in-time view of the store. Orders can
+        go on while the view is read, it keeps showing the products,
+        quantities, prices and active states of the moment it was taken.
+        Taking it is O(1), afterwards every change costs the view one
+        entry. Close the view, or use it as a context manager, when done.
+        :return: FrozenStore
+        """
+        with self._state_lock:
+            snapshot = FrozenStore(self)
+            self._snapshots.add(snapshot)
+        return snapshot
+
+    @property
+    def active_version(self) -> int:
+        """
+        This function returns a counter which changes every time the set of
+        active products changes, so callers can tell if a view is stale
+        :return: int
+        """
+        return self._active_version
+
+    @property
+    def active_products(self) -> tuple:
+        """
+        This function returns a read-only view of the active products, in
+        store order, so a product deactivated and activated again keeps
+        its place. The same tuple is returned until the set of active
+        products changes
+        :return: tuple
+        """
+        if self._active_view_version != self._active_version:
+            with self._state_lock:
+                active = self._active
+                self._active_view = tuple(item for item in self.product
+                                          if id(item) in active)
+                self._active_view_version = self._active_version
+        return self._active_view
+
+    def get_product(self, name: str):
+        """
+        This function gets a product name / SKU and returns the matching
+        product object in O(1), or None if there is no such product
+        :param name: str
+        :return: product: object
+        """
+        same_name = self._index.get(name)
+        if same_name:
+            return same_name[0]
+        return None
+
+    def search(self, query: str, page: int = 1, per_page: int = 10):
+        """
+        This function returns one page of the active products whose name
+        matches a search query. Every word of the query must start a word
+        of the name, so "pix" finds "Google Pixel 7". Matches are sorted by
+        name. An empty query pages through all active products in store
+        order.
+        :param query: str
+        :param page: int - optional -> page number, starting at 1
+        :param per_page: int - optional -> products per page
+        :return: tuple of (list of product objects, total number of matches)
+        """
+        if page < 1 or per_page < 1:
+            raise ValueError("Page and page size must be positive.")
+        if query.strip():
+            with self._state_lock:
+                matches = self._search_index.search(query)
+        else:
+            matches = self.active_products
+        start = (page - 1) * per_page
+        return list(matches[start:start + per_page]), len(matches)
+
+    def products_in_price_range(self, low: float, high: float) -> list:
+        """
+        This function returns the active products with a price between
+        low and high, both included, cheapest first
+        :param low: float
+        :param high: float
+        :return: product_list: list
+        """
+        with self._state_lock:
+            return self._price_index.between(low, high)
+
+    def cheapest(self, count: int) -> list:
+        """
+        This function returns the count cheapest active products,
+        cheapest first
+        :param count: int
+        :return: product_list: list
+        """
+        with self._state_lock:
+            return self._price_index.cheapest(count)
+
+    def most_expensive(self, count: int) -> list:
+        """
+        This function returns the count most expensive active products,
+        most expensive first
+        :param count: int
+        :return: product_list: list
+        """
+        with self._state_lock:
+            return self._price_index.most_expensive(count)
 
     def get_total_quantity(self) -> int:
         """
@@ -57,32 +510,421 @@ class Store:
         available items in store
         :return: total_quantity: int
         """
+        return self._total_quantity
+
+    def check_consistency(self) -> bool:
+        """
+        This function recomputes the store aggregates and indexes from
+        scratch and checks they match the incrementally maintained ones
+        :return: bool
+        """
         total_quantity: int = 0
+        active = []
         for item in self.product:
             total_quantity += item.quantity
-        return total_quantity
+            if item.active:
+                active.append(item)
+        if total_quantity != self._total_quantity:
+            return False
+        if len(active) != len(self._active) or \
+                len(active) != len(self._search_index):
+            return False
+        by_price = sorted(active, key=lambda item: (item.price, id(item)))
+        stocked = [item for item in self.product
+                   if not isinstance(item, NonStockedProduct)]
+        if len(self._stock_heap) != len(stocked) or \
+                [item.quantity for item in
+                 self._stock_heap.smallest(len(stocked))] != \
+                sorted(item.quantity for item in stocked):
+            return False
+        indexed = list(self._price_index)
+        if len(indexed) != len(by_price) or \
+                any(a is not b for a, b in zip(indexed, by_price)):
+            return False
+        for item in active:
+            if self._active.get(id(item)) is not item or \
+                    item not in self._search_index:
+                return False
+            if not self._has_item(item):
+                return False
+        return sum(len(same_name) for same_name in self._index.values()) \
+            == len(self.product)
 
     def get_all_products(self) -> list:
         """
         This function returns a list of active products in store
         :return: product_list: list
         """
-        product_list = []
-        for item in self.product:
-            if item.active:  # filter out the inactive products
-                product_list.append(item)
-        return product_list
+        return list(self.active_products)
 
-    @staticmethod
-    def order(shopping_list) -> float:
+    def order(self, shopping_list, cents: bool = False) -> float:
         """
         This function gets a list of products as a shopping list and returns
         the total price each product item in the shopping list is a tuple of
-        product object and shopping quantity
+        product object and shopping quantity. The order is all or nothing,
+        if any line fails no stock is taken and ValueError is raised.
         :param shopping_list: list
-        :return: total_price: float
+        :param cents: bool - optional -> price in whole cents, see the
+        money module
+        :return: total_price: float, or int with cents
+        """
+        result = self.place_order(shopping_list, cents)
+        if not result.ok:
+            raise ValueError(result.errors[0].error)
+        return result.total_price
+
+    def quote(self, shopping_list, cents: bool = False) -> OrderResult:
+        """
+        This function prices a shopping list without taking any stock.
+        The lines are validated like an order, against the stock there is
+        right now, so the result tells whether the order would be accepted.
+        Products cache their line prices until their price or promotion
+        changes.
+        :param shopping_list: list of (product, quantity) tuples
+        :param cents: bool - optional -> price in whole cents
+        :return: OrderResult
+        """
+        if self._holds:
+            self.expire_holds()
+        return self._reserve(shopping_list, cents=cents)[0]
+
+    def place_order(self, shopping_list, cents: bool = False) -> OrderResult:
+        """
+        This function places a whole order as one unit. Every line is first
+        validated and its stock reserved, and only if all lines are valid
+        the stock is taken. Otherwise nothing changes and the result tells
+        which lines failed. In a store with lock stripes the products of
+        the order stay locked from validation until the stock is taken.
+        :param shopping_list: list of (product, quantity) tuples
+        :param cents: bool - optional -> price the lines in whole cents
+        :return: OrderResult
+        """
+        if self._holds:
+            self.expire_holds()
+        alerts = ()
+        if self._locks is None:
+            result, reserved = self._reserve(shopping_list, cents=cents)
+            if result.ok:
+                alerts = self._commit(reserved)
+                self._journal(reserved)
+        else:
+            shopping_list = list(shopping_list)
+            with self._locks.hold(item[0] for item in shopping_list):
+                result, reserved = self._reserve(shopping_list, cents=cents)
+                if result.ok:
+                    alerts = self._commit(reserved)
+                    self._journal(reserved)
+        # Alerts run once the locks are released, they may use the store,
+        # and the journal is not written under them either
+        self._sync_journal()
+        self._run_alerts(alerts)
+        return result
+
+    def place_orders(self, shopping_lists, cents: bool = False) -> list:
+        """
+        This function places a batch of orders. Orders are validated one
+        after the other, each as one unit and against the stock left by
+        the accepted orders before it, and the stock of every product is
+        then taken once for the whole batch.
+        :param shopping_lists: list of shopping lists
+        :param cents: bool - optional -> price the lines in whole cents,
+        so the totals of the batch add up exactly
+        :return: list of OrderResult, one per order
+        """
+        if self._holds:
+            self.expire_holds()
+        shopping_lists = [list(shopping_list)
+                          for shopping_list in shopping_lists]
+        if self._locks is None:
+            results, alerts = self._place_batch(shopping_lists, cents)
+        else:
+            with self._locks.hold(item[0] for shopping_list in shopping_lists
+                                  for item in shopping_list):
+                results, alerts = self._place_batch(shopping_lists, cents)
+        self._sync_journal()
+        self._run_alerts(alerts)
+        return results
+
+    def _place_batch(self, shopping_lists, cents: bool = False) -> list:
+        """
+        This function reserves and commits a batch of orders, see
+        place_orders. The caller holds the needed locks.
+        :param shopping_lists: list of shopping lists
+        :param cents: bool - optional -> price the lines in whole cents
+        :return: tuple of (list of OrderResult, stock alerts to run, see
+        _commit)
+        """
+        results = []
+        accepted = []
+        taken = {}  # id(product) -> [product, units] of accepted orders
+        for shopping_list in shopping_lists:
+            result, reserved = self._reserve(shopping_list, taken, cents)
+            results.append(result)
+            if result.ok:
+                accepted.append(reserved)
+                for key, (product, units) in reserved.items():
+                    taken.setdefault(key, [product, 0])[1] += units
+        alerts = self._commit(taken)
+        for reserved in accepted:
+            self._journal(reserved)
+        return results, alerts
+
+    def _reserve(self, shopping_list, taken=None, cents: bool = False):
+        """
+        This function validates and prices every line of an order and adds
+        up how many units each product needs, without changing any stock
+        :param shopping_list: list of (product, quantity) tuples
+        :param taken: dict - optional -> id(product) -> [product, units]
+        already reserved by other orders, which are not available. Units
+        held by carts are never available.
+        :param cents: bool - optional -> price the lines in whole cents
+        :return: tuple of OrderResult and dict of
+        id(product) -> [product, units]
+        """
+        lines = []
+        reserved = {}
+        taken = taken or {}
+        for product, quantity in shopping_list:
+            line = OrderLine(product, quantity)
+            lines.append(line)
+            if not isinstance(quantity, int) or isinstance(quantity, bool):
+                line.error = "Invalid quantity type. Expected int."
+                continue
+            if quantity <= 0:
+                line.error = "Quantity must be positive."
+                continue
+            if not self._has_item(product):
+                line.error = "Product is not in store."
+                continue
+            if not product.active:
+                line.error = "Product is not active."
+                continue
+            reservation = reserved.setdefault(id(product), [product, 0])
+            units = product.stock_needed(quantity)
+            available = product.quantity
+            if id(product) in self._held:
+                available -= self._held[id(product)][1]
+            if id(product) in taken:
+                available -= taken[id(product)][1]
+            if reservation[1] + units > available:
+                line.error = "Insufficient quantity."
+                continue
+            reservation[1] += units
+            line.price = self._line_price(product, quantity, cents)
+        return OrderResult(lines), reserved
+
+    def hold(self, shopping_list, ttl: float = HOLD_TTL) -> Hold:
+        """
+        This function holds the stock of a shopping list for a cart. The
+        lines are validated like an order and their units are taken out of
+        the available stock, but not out of the product quantity, until
+        the hold is checked out, released or expires after ttl seconds.
+        :param shopping_list: list of (product, quantity) tuples
+        :param ttl: float - optional -> seconds the stock is held
+        :return: Hold
+        """
+        if self._holds:
+            self.expire_holds()
+        shopping_list = list(shopping_list)
+        if self._locks is None:
+            result, reserved = self._reserve(shopping_list)
+            if result.ok:
+                self._hold_units(reserved, 1)
+        else:
+            with self._locks.hold(item[0] for item in shopping_list):
+                result, reserved = self._reserve(shopping_list)
+                if result.ok:
+                    self._hold_units(reserved, 1)
+        if not result.ok:
+            raise ValueError(result.errors[0].error)
+        with self._state_lock:
+            hold = Hold(next(self._hold_ids), shopping_list, reserved,
+                        self.clock() + ttl)
+            self._holds.schedule(hold.hold_id, hold, hold.expires_at)
+        return hold
+
+    def _hold_units(self, reserved, sign: int) -> None:
+        """
+        This function adds units to, or with sign -1 takes them from, the
+        units held by carts
+        :param reserved: dict of id(product) -> [product, units]
+        :param sign: int - 1 or -1
+        :return: None
+        """
+        with self._state_lock:
+            for key, (product, units) in reserved.items():
+                entry = self._held.get(key)
+                if entry is None:
+                    if sign < 0 or not units:
+                        continue
+                    entry = self._held[key] = [product, 0]
+                entry[1] += sign * units
+                if entry[1] <= 0:
+                    del self._held[key]
+
+    def release(self, hold: Hold) -> None:
+        """
+        This function gives the stock of a hold back, if it is still held
+        :param hold: Hold
+        :return: None
+        """
+        with self._state_lock:
+            if not hold.active:
+                return
+            hold.state = 'released'
+            self._holds.cancel(hold.hold_id)
+        self._hold_units(hold.reserved, -1)
+
+    def expire_holds(self) -> list:
+        """
+        This function releases the holds whose time is up. Orders, quotes
+        and holds call it, so stock of abandoned carts comes back without
+        any timer per hold.
+        :return: list of the expired Hold objects
+        """
+        with self._state_lock:
+            expired = [hold for _, hold in self._holds.advance(self.clock())]
+            for hold in expired:
+                hold.state = 'expired'
+        for hold in expired:
+            self._hold_units(hold.reserved, -1)
+        return expired
+
+    def checkout(self, holds, cents: bool = False) -> OrderResult:
+        """
+        This function turns the holds of a cart into one order. The held
+        units are used by the order; lines of holds which expired or were
+        released are ordered against the free stock. If the order is
+        rejected the holds stay as they were.
+        :param holds: list of Hold objects
+        :param cents: bool - optional -> price the lines in whole cents
+        :return: OrderResult
+        """
+        if self._holds:
+            self.expire_holds()
+        holds = list(holds)
+        shopping_list = [line for hold in holds for line in hold.lines]
+        if self._locks is None:
+            result, alerts = self._checkout(holds, shopping_list, cents)
+        else:
+            with self._locks.hold(item[0] for item in shopping_list):
+                result, alerts = self._checkout(holds, shopping_list, cents)
+        self._sync_journal()
+        self._run_alerts(alerts)
+        return result
+
+    def _checkout(self, holds, shopping_list, cents: bool):
+        """
+        This function places the order of a checkout, see checkout. The
+        caller holds the needed locks.
+        :param holds: list of Hold objects
+        :param shopping_list: list of (product, quantity) tuples
+        :param cents: bool
+        :return: tuple of (OrderResult, stock alerts to run, see _commit)
+        """
+        with self._state_lock:
+            live = [hold for hold in holds if hold.active]
+            for hold in live:
+                hold.state = 'ordered'
+                self._holds.cancel(hold.hold_id)
+        for hold in live:
+            self._hold_units(hold.reserved, -1)
+        result, reserved = self._reserve(shopping_list, cents=cents)
+        if result.ok:
+            alerts = self._commit(reserved)
+            self._journal(reserved)
+            return result, alerts
+        with self._state_lock:
+            for hold in live:
+                hold.state = 'held'
+                self._holds.schedule(hold.hold_id, hold, hold.expires_at)
+        for hold in live:
+            self._hold_units(hold.reserved, 1)
+        return result, ()
+
+    def held_quantity(self, product) -> int:
+        """
+        This function returns how many units of a product carts hold
+        :param product: object
+        :return: int
+        """
+        entry = self._held.get(id(product))
+        return entry[1] if entry is not None else 0
+
+    def available_quantity(self, product) -> int:
+        """
+        This function returns how many units of a product can be ordered,
+        its quantity less the units held by carts
+        :param product: object
+        :return: int
+        """
+        if self._holds:
+            self.expire_holds()
+        return max(product.quantity - self.held_quantity(product), 0)
+
+    @staticmethod
+    def _line_price(product, quantity: int, cents: bool = False):
+        """
+        This function returns the price of an order line. Products memoize
+        their prices by quantity and promotion version, so the store keeps
+        no cache of its own.
+        :param product: object
+        :param quantity: int
+        :param cents: bool - optional -> price in whole cents
+        :return: float, or int with cents
+        """
+        if cents:
+            return product.get_price_cents(quantity)
+        return product.get_price(quantity)
+
+    def _journal(self, reserved) -> None:
+        """
+        This function adds the stock an accepted order took to the order
+        journal, if the store has one, once the stock is taken. Nothing is
+        written yet, the caller calls _sync_journal once it has released
+        its locks.
+        :param reserved: dict of id(product) -> [product, units]
+        :return: None
+        """
+        if self.journal is not None:
+            self._journaled.sequence = self.journal.append(
+                (product.name, units)
+                for product, units in reserved.values() if units)
+
+    def _sync_journal(self) -> None:
+        """
+        This function hands the last journal record of this thread to the
+        journal, which writes a full group and, if it waits, returns once
+        the record is durable. Call it with no locks held.
+        :return: None
+        """
+        sequence = getattr(self._journaled, 'sequence', None)
+        if sequence is not None:
+            self._journaled.sequence = None
+            self.journal.sync(sequence)
+
+    def _commit(self, reserved) -> list:
+        """
+        This function takes the reserved units from stock. If taking the
+        stock of any product fails, the products already changed are put
+        back the way they were and the error is raised again. The stock
+        alerts the change sets off are returned, the caller runs them with
+        _run_alerts once it has released its locks.
+        :param reserved: dict of id(product) -> [product, units]
+        :return: list of (callback, product, quantity) tuples
         """
-        total_price: float = 0
-        for item in shopping_list:
-            total_price += item[0].buy(item[1])
-        return total_price
+        done = []
+        self._commit_alerts.alerts = alerts = []
+        try:
+            for product, units in reserved.values():
+                if units:
+                    done.append((product, product.quantity, product.active))
+                    product.quantity = product.quantity - units
+        except Exception:
+            for product, quantity, active in reversed(done):
+                product.quantity = quantity
+                product.active = active
+            raise
+        finally:
+            self._commit_alerts.alerts = None
+        return alerts
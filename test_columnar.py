@@ -0,0 +1,64 @@
+import pytest
+import promotions
+from products import Product
+from products import NonStockedProduct
+from products import LimitedProduct
+from columnar import ColumnarStore
+
+
+def make_products():
+    product_list = [Product("MacBook Air M2", price=1450, quantity=100),
+                    Product("Bose QuietComfort Earbuds",
+                            price=250, quantity=500),
+                    Product("Google Pixel 7", price=500, quantity=250),
+                    NonStockedProduct("Windows License", price=125),
+                    LimitedProduct("Shipping", price=10, quantity=250,
+                                   maximum=1)
+                    ]
+    product_list[0].promotion = promotions.SecondHalfPrice("Second Half!")
+    product_list[3].promotion = promotions.PercentDiscount("30% off!",
+                                                           percent=30)
+    return product_list
+
+
+def test_columnar_store_matches_store_interface():
+    store = ColumnarStore(make_products())
+
+    assert len(store) == 5
+    assert store.get_total_quantity() == 1100
+    assert [item.name for item in store.get_all_products()] == \
+        ["MacBook Air M2", "Bose QuietComfort Earbuds", "Google Pixel 7",
+         "Windows License", "Shipping"]
+    assert "Google Pixel 7" in store
+
+    macbook = store.get_product("MacBook Air M2")
+    shipping = store.get_product("Shipping")
+    windows = store.get_product("Windows License")
+    total = store.order([(macbook, 2), (shipping, 5), (windows, 1)])
+    assert total == 1450 * 1.5 + 10 + 125 * 0.7
+    assert macbook.quantity == 98
+    assert shipping.quantity == 249
+    assert store.get_total_quantity() == 1097
+    assert str(macbook) == 'MacBook Air M2, Price: 1450.0, ' \
+                           'Quantity: 98, Promotion: Second Half!'
+
+    with pytest.raises(ValueError):
+        store.order([(store.get_product("Google Pixel 7"), 251)])
+
+
+def test_columnar_bulk_operations():
+    store = ColumnarStore(make_products(), capacity=2)
+    pixel = store.get_product("Google Pixel 7")
+    pixel.buy(250)
+    assert pixel.active is False
+
+    store.get_product("Bose QuietComfort Earbuds").quantity = 0
+    store.get_product("Bose QuietComfort Earbuds").active = True
+    assert store.deactivate_out_of_stock() == 1
+    assert "Bose QuietComfort Earbuds" not in store
+
+    store.restock(["Google Pixel 7", "Google Pixel 7", "Shipping"],
+                  [5, 5, 1])
+    assert pixel.quantity == 10 and pixel.active is True
+    assert store.inventory_value() == 1450 * 100 + 500 * 10 + 10 * 251
+
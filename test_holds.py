@@ -0,0 +1,101 @@
+import random
+
+import pytest
+from holds import TimingWheel
+from products import Product
+from store import Store
+
+
+# Class to create a clock the tests move by hand
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_timing_wheel_expires_in_deadline_order():
+    wheel = TimingWheel(tick=1.0, slots=4, levels=3)
+    random_gen = random.Random(0)
+    deadlines = {key: random_gen.randint(1, 200) for key in range(300)}
+    for key, deadline in deadlines.items():
+        wheel.schedule(key, deadlines[key], deadline)
+    assert wheel.cancel(7) and not wheel.cancel(7)
+    del deadlines[7]
+
+    expired = []
+    for now in range(0, 210, 3):
+        for key, deadline in wheel.advance(now):
+            assert now - 3 < deadline <= now
+            expired.append(key)
+    assert sorted(expired) == sorted(deadlines)
+    assert len(wheel) == 0
+
+
+def test_holds_reserve_stock_until_checkout_or_expiry():
+    clock = FakeClock()
+    macbook = Product("MacBook Air M2", price=1450, quantity=5)
+    pixel = Product("Google Pixel 7", price=500, quantity=3)
+    store = Store([macbook, pixel], clock=clock)
+
+    cart = [store.hold([(macbook, 2)], ttl=60),
+            store.hold([(pixel, 3)], ttl=60)]
+    assert store.held_quantity(macbook) == 2
+    assert store.available_quantity(macbook) == 3
+    assert macbook.quantity == 5
+    with pytest.raises(ValueError):
+        store.hold([(pixel, 1)])  # all held by the cart
+    assert store.place_order([(macbook, 4)]).errors[0].error == \
+        "Insufficient quantity."
+
+    result = store.checkout(cart)
+    assert result.ok and result.total_price == 2 * 1450 + 3 * 500
+    assert macbook.quantity == 3 and pixel.quantity == 0
+    assert store.held_quantity(macbook) == 0
+    assert [hold.state for hold in cart] == ['ordered', 'ordered']
+
+    abandoned = store.hold([(macbook, 3)], ttl=60)
+    clock.now = 59
+    assert store.available_quantity(macbook) == 0
+    clock.now = 61
+    assert store.available_quantity(macbook) == 3
+    assert abandoned.state == 'expired'
+    # An expired hold is ordered against the free stock
+    assert store.checkout([abandoned]).ok
+    assert macbook.quantity == 0
+
+    earbuds = Product("Bose QuietComfort Earbuds", price=250, quantity=4)
+    store.add_product(earbuds)
+    kept = store.hold([(earbuds, 1)])
+    released = store.hold([(earbuds, 2)])
+    store.release(released)
+    assert released.state == 'released'
+    assert store.available_quantity(earbuds) == 3
+    earbuds.deactivate()
+    assert not store.checkout([kept]).ok
+    assert kept.state == 'held'  # a rejected checkout keeps the holds
+    assert store.held_quantity(earbuds) == 1
+    assert store.check_consistency()
+
+
+def test_removing_a_product_releases_its_holds():
+    clock = FakeClock()
+    macbook = Product("MacBook Air M2", price=1450, quantity=5)
+    pixel = Product("Google Pixel 7", price=500, quantity=3)
+    store = Store([macbook, pixel], clock=clock)
+    cart = store.hold([(macbook, 2), (pixel, 1)], ttl=60)
+    other = store.hold([(pixel, 2)], ttl=60)
+
+    store.remove_product(macbook)
+    assert cart.state == 'released' and other.state == 'held'
+    assert store.held_quantity(macbook) == 0
+    assert store.held_quantity(pixel) == 2
+    assert not store.checkout([cart]).ok
+
+    # The product comes back with no stale holds on it
+    store.add_product(macbook)
+    assert store.available_quantity(macbook) == 5
+    clock.now = 120
+    assert store.expire_holds() == [other]
+    assert store.held_quantity(pixel) == 0
@@ -0,0 +1,53 @@
+import json
+from products import NonStockedProduct
+from products import LimitedProduct
+from store import Store
+from importer import import_catalog
+
+
+def test_import_csv_feed(tmp_path):
+    path = tmp_path / "feed.csv"
+    path.write_text(
+        "name,price,quantity,kind,maximum,active,promotion,"
+        "promotion_name,percent\n"
+        "MacBook Air M2,1450,100,,,,second_half_price,Second Half!,\n"
+        "Google Pixel 7,500,250,product,,no,second_half_price,"
+        "Second Half!,\n"
+        "Windows License,125,,non_stocked,,,percent,30% off!,30\n"
+        "Shipping,10,250,limited,1,,,,\n"
+        "Broken,abc,1,,,,,,\n"
+        "Too,many,columns,,,,,,,,\n"
+        "Negative,10,-5,,,,,,\n")
+    store = Store([])
+    report = import_catalog(store, path, batch_size=2)
+
+    assert (report.rows, report.imported, report.error_count) == (7, 4, 3)
+    assert [line for line, _ in report.errors] == [6, 7, 8]
+    assert store.get_total_quantity() == 600
+    assert store.get_product("Google Pixel 7").active is False
+    assert store.get_product("MacBook Air M2").promotion is \
+        store.get_product("Google Pixel 7").promotion
+    assert isinstance(store.get_product("Windows License"),
+                      NonStockedProduct)
+    assert store.get_product("Windows License").promotion.percent == 30
+    assert isinstance(store.get_product("Shipping"), LimitedProduct)
+
+
+def test_import_jsonl_feed_keeps_few_errors(tmp_path):
+    path = tmp_path / "feed.jsonl"
+    with open(path, "w") as feed:
+        for number in range(50):
+            feed.write(json.dumps({"name": f"Item {number}", "price": 2.5,
+                                   "quantity": number}) + "\n")
+        feed.write("\n{not json\n")
+        for number in range(10):
+            feed.write(json.dumps({"name": f"Bad {number}",
+                                   "kind": "rental"}) + "\n")
+    store = Store([])
+    report = import_catalog(store, path, max_errors=3)
+
+    assert report.imported == 50
+    assert report.error_count == 11
+    assert report.errors[0][0] == 52
+    assert len(report.errors) == 3
+    assert store.get_total_quantity() == sum(range(50))
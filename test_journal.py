@@ -0,0 +1,174 @@
+import threading
+import time
+import pytest
+import journal
+from products import Product
+from products import NonStockedProduct
+from store import Store
+from snapshot import save_snapshot
+from journal import OrderJournal
+from journal import apply_journal
+from journal import compact
+from journal import read_journal
+from journal import replay
+
+
+def make_store():
+    return Store([Product("MacBook Air M2", price=1450, quantity=100),
+                  Product("Google Pixel 7", price=500, quantity=3),
+                  NonStockedProduct("Windows License", price=125)])
+
+
+def test_replay_rebuilds_quantities(tmp_path):
+    snapshot_path = tmp_path / "inventory.snap"
+    journal_path = tmp_path / "orders.journal"
+    store = make_store()
+    save_snapshot(store, snapshot_path)
+
+    store.journal = OrderJournal(journal_path, group_size=4,
+                                 group_interval=60)
+    for _ in range(3):
+        store.order([(store.get_product("MacBook Air M2"), 2),
+                     (store.get_product("Google Pixel 7"), 1),
+                     (store.get_product("Windows License"), 1)])
+    store.place_orders([[(store.get_product("MacBook Air M2"), 1)],
+                        [(store.get_product("Google Pixel 7"), 1)]])
+    # The rejected order is not journaled
+    assert store.journal.sequence == 4
+    assert store.journal.syncs == 1
+    store.journal.close()
+
+    restored = replay(snapshot_path, journal_path)
+    assert restored.get_product("MacBook Air M2").quantity == 93
+    assert restored.get_product("Google Pixel 7").quantity == 0
+    assert restored.get_product("Google Pixel 7").active is False
+    assert restored.get_total_quantity() == store.get_total_quantity()
+
+
+def test_torn_record_is_ignored(tmp_path):
+    snapshot_path = tmp_path / "inventory.snap"
+    journal_path = tmp_path / "orders.journal"
+    store = make_store()
+    save_snapshot(store, snapshot_path)
+    with OrderJournal(journal_path, group_size=1) as journal:
+        journal.append([("MacBook Air M2", 5)])
+        journal.append([("MacBook Air M2", 7)])
+    with open(journal_path, 'r+b') as journal_file:
+        journal_file.truncate(journal_path.stat().st_size - 3)
+
+    assert replay(snapshot_path, journal_path).get_product(
+        "MacBook Air M2").quantity == 95
+    # Reopening drops the torn record and goes on after the last good one
+    with OrderJournal(journal_path) as journal:
+        assert journal.sequence == 1
+        assert journal.append([("Google Pixel 7", 1)]) == 2
+    assert [record[0] for record in read_journal(journal_path)] == [1, 2]
+
+
+def test_compact_folds_journal_into_snapshot(tmp_path):
+    snapshot_path = tmp_path / "inventory.snap"
+    journal_path = tmp_path / "orders.journal"
+    store = make_store()
+    save_snapshot(store, snapshot_path)
+    store.journal = OrderJournal(journal_path)
+    store.order([(store.get_product("MacBook Air M2"), 10)])
+
+    compact(store, snapshot_path, store.journal)
+    assert list(read_journal(journal_path)) == []
+    store.order([(store.get_product("MacBook Air M2"), 1)])
+    store.journal.close()
+
+    restored = replay(snapshot_path, journal_path)
+    assert restored.get_product("MacBook Air M2").quantity == 89
+    with OrderJournal(journal_path) as journal:
+        assert journal.sequence == 2
+
+
+def test_crash_during_compaction_does_not_replay_twice(tmp_path):
+    snapshot_path = tmp_path / "inventory.snap"
+    journal_path = tmp_path / "orders.journal"
+    store = make_store()
+    store.journal = OrderJournal(journal_path)
+    store.order([(store.get_product("MacBook Air M2"), 10)])
+    store.journal.close()
+    # Snapshot written, crash before the journal was emptied
+    save_snapshot(store, snapshot_path, store.journal.sequence)
+
+    restored = replay(snapshot_path, journal_path)
+    assert restored.get_product("MacBook Air M2").quantity == 90
+
+
+def test_group_is_flushed_after_interval(tmp_path):
+    journal_path = tmp_path / "orders.journal"
+    with OrderJournal(journal_path, group_size=100,
+                      group_interval=0.01) as journal:
+        journal.append([("MacBook Air M2", 1)])
+        deadline = time.monotonic() + 5
+        while journal.syncs == 0 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert journal.syncs == 1
+        assert [record[0] for record in read_journal(journal_path)] == [1]
+
+
+def test_waiting_journal_returns_durable_orders(tmp_path):
+    journal_path = tmp_path / "orders.journal"
+    store = make_store()
+    store.journal = OrderJournal(journal_path, group_size=100,
+                                 group_interval=0.01, wait=True)
+    store.order([(store.get_product("MacBook Air M2"), 2)])
+    # Written before the order returned, without closing the journal
+    assert store.journal.durable == 1
+    assert [record[0] for record in read_journal(journal_path)] == [1]
+    store.journal.close()
+
+
+def test_full_group_is_written_after_the_store_locks(tmp_path, monkeypatch):
+    store = Store([Product("MacBook Air M2", price=1450, quantity=100)],
+                  lock_stripes=1)
+    store.journal = OrderJournal(tmp_path / "orders.journal", group_size=2,
+                                 group_interval=60)
+    macbook = store.get_product("MacBook Air M2")
+    fsync = journal.os.fsync
+    orders = []
+
+    def slow_fsync(descriptor):
+        # Another order of the same product goes through during the fsync
+        if not orders:
+            orders.append(threading.Thread(
+                target=store.order, args=([(macbook, 1)],)))
+            orders[0].start()
+            orders[0].join(5)
+        fsync(descriptor)
+
+    monkeypatch.setattr(journal.os, 'fsync', slow_fsync)
+    store.order([(macbook, 1)])
+    store.order([(macbook, 1)])
+    assert not orders[0].is_alive()
+    assert macbook.quantity == 97
+    store.journal.close()
+    assert [record[0] for record in read_journal(
+        tmp_path / "orders.journal")] == [1, 2, 3]
+
+
+def test_failed_commit_is_not_journaled(tmp_path, monkeypatch):
+    store = make_store()
+    store.journal = OrderJournal(tmp_path / "orders.journal")
+
+    def fail(reserved):
+        raise RuntimeError("Disk full.")
+
+    monkeypatch.setattr(store, '_commit', fail)
+    with pytest.raises(RuntimeError):
+        store.order([(store.get_product("MacBook Air M2"), 1)])
+    assert store.journal.sequence == 0
+    store.journal.close()
+
+
+def test_apply_journal_skips_unknown_products(tmp_path, caplog):
+    journal_path = tmp_path / "orders.journal"
+    with OrderJournal(journal_path) as journal:
+        journal.append([("Discontinued", 4), ("MacBook Air M2", 5)])
+    store = make_store()
+    assert apply_journal(store, journal_path) == 1
+    assert store.get_product("MacBook Air M2").quantity == 95
+    assert "Discontinued" in caplog.text
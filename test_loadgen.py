@@ -0,0 +1,65 @@
+import random
+
+from loadgen import MODES
+from loadgen import STORE_KINDS
+from loadgen import Workload
+from loadgen import ZipfSampler
+from loadgen import build_catalog
+from loadgen import run_load
+from metrics import LatencyHistogram
+from products import LimitedProduct
+from products import NonStockedProduct
+
+
+def test_latency_histogram_percentiles():
+    histogram = LatencyHistogram()
+    values = [number * 1e-6 for number in range(1, 10001)]  # 1us to 10ms
+    random.Random(0).shuffle(values)
+    for value in values:
+        histogram.record(value)
+    assert histogram.count == 10000
+    for percent in (50, 90, 99, 99.9):
+        exact = percent * 100 * 1e-6
+        assert exact <= histogram.percentile(percent) <= exact * 1.016
+    assert histogram.percentile(100) == histogram.max == 0.01
+
+    other = LatencyHistogram()
+    other.record(1.0)
+    histogram.merge(other)
+    assert histogram.max == 1.0 and histogram.count == 10001
+    assert LatencyHistogram().percentile(50) is None
+
+
+def test_catalog_mix_and_zipf_skew():
+    catalog = build_catalog(1000, seed=1)
+    kinds = {type(product) for product in catalog}
+    assert NonStockedProduct in kinds and LimitedProduct in kinds
+    assert len({product.name for product in catalog}) == 1000
+
+    sampler = ZipfSampler(1000, 1.1, random.Random(0))
+    picks = sampler.sample(20000)
+    top = sum(1 for position in picks if position < 10)
+    assert top > 20000 * 0.3  # the top 1% of SKUs get a third of traffic
+
+
+def test_run_load_every_mode_and_store():
+    workload = Workload(browse_share=0.2)
+    for mode in MODES:
+        for store_kind in STORE_KINDS:
+            report = run_load(products=200, shoppers=3, mode=mode,
+                              store_kind=store_kind, workload=workload,
+                              operations=50)
+            assert report['store'] == store_kind
+            assert report['operations'] == 150
+            assert report['orders'] + \
+                report['latency']['browse']['count'] == 150
+            assert report['rejected'] == 0
+            order = report['latency']['order']
+            assert order['p50'] <= order['p99'] <= order['max']
+
+
+def test_run_load_threads_default_to_a_striped_store():
+    assert run_load(products=50, shoppers=2, operations=5)['store'] == \
+        'striped'
+    assert run_load(products=50, shoppers=2, mode='asyncio',
+                    operations=5)['store'] == 'plain'
@@ -0,0 +1,58 @@
+import io
+from main import create_default_store
+from main import make_order
+from main import percentile
+from main import replay_orders
+
+
+def test_replay_orders_summary():
+    store = create_default_store()
+    orders = io.StringIO('[["MacBook Air M2", 2], ["Shipping", 1]]\n'
+                         '\n'
+                         '{"lines": [["Google Pixel 7", 300]]}\n'
+                         '[["Unknown", 1]]\n')
+    output = io.StringIO()
+    summary = replay_orders(store, orders, output, verbose=True,
+                            flush_every=2)
+
+    assert summary['orders'] == 3
+    assert summary['lines'] == 4
+    assert summary['rejected'] == 2
+    assert summary['p50_latency'] <= summary['p99_latency']
+    assert output.getvalue().splitlines() == [
+        "1: $2185.0",
+        "3: rejected, Insufficient quantity.",
+        "4: rejected, Unknown product 'Unknown'."]
+    assert store.get_product("MacBook Air M2").quantity == 98
+
+
+def test_replay_orders_rejects_malformed_lines():
+    store = create_default_store()
+    orders = io.StringIO('{bad\n'
+                         '[["Shipping"]]\n'
+                         '[["Shipping", 1]]\n')
+    output = io.StringIO()
+    summary = replay_orders(store, orders, output, verbose=True)
+
+    assert summary['orders'] == 3
+    assert summary['rejected'] == 2
+    assert summary['lines'] == 1
+    assert [line.split(',')[0] for line in output.getvalue().splitlines()] \
+        == ["1: rejected", "2: rejected", "3: $10"]
+    assert store.get_product("Shipping").quantity == 249
+
+
+def test_percentile_nearest_rank():
+    assert percentile([], 50) is None
+    assert percentile([1, 2, 3, 4], 50) == 2
+    assert percentile(list(range(1, 101)), 99) == 99
+    assert percentile([5], 99) == 5
+
+
+def test_make_order_finds_products_by_search(monkeypatch, capsys):
+    store = create_default_store()
+    answers = iter(['pixel', '1', '2', 'ship', '1', '1', ''])
+    monkeypatch.setattr('builtins.input', lambda prompt='': next(answers))
+    make_order(store)
+    assert 'Order made! Total payment: $1010' in capsys.readouterr().out
+    assert store.get_product("Google Pixel 7").quantity == 248
@@ -0,0 +1,77 @@
+import pytest
+import metrics
+import promotions
+from products import Product
+from store import Store
+
+
+@pytest.fixture
+def instrumented():
+    metrics.reset()
+    metrics.enable()
+    yield
+    metrics.disable()
+    metrics.reset()
+
+
+def test_metrics_count_hot_paths(instrumented):
+    macbook = Product("MacBook Air M2", price=1450, quantity=3)
+    macbook.promotion = promotions.ThirdOneFree("Third One Free!")
+    store = Store([macbook])
+
+    store.order([(macbook, 2)])
+    assert store.place_order([(macbook, 5)]).ok is False
+    macbook.buy(1)
+    with pytest.raises(ValueError):
+        macbook.buy(1)
+    assert "MacBook Air M2" not in store
+
+    data = metrics.snapshot()
+    assert data['functions']['Store.order']['count'] == 1
+    assert data['functions']['Store.place_order']['count'] == 2
+    assert data['functions']['Product.buy']['count'] == 2
+    assert data['functions']['Product.get_price[ThirdOneFree]']['count'] \
+        == 2
+    # Both quantities are priced by one compiled pricing function
+    assert data['functions']['ThirdOneFree.compile']['count'] == 1
+    assert data['functions']['Store.__contains__']['count'] == 1
+    assert data['counters'] == {'rejected_orders': 1, 'rejected_lines': 1,
+                                'rejected_buys': 1, 'stock_outs': 1}
+
+    text = metrics.to_prometheus()
+    assert 'bestbuy_call_seconds_count{function="Store.order"} 1' in text
+    assert 'bestbuy_stock_outs_total 1' in text
+    assert '"rejected_buys": 1' in metrics.to_json()
+
+
+def test_disabled_metrics_restore_originals():
+    original_buy = Product.__dict__['buy']
+    original_quantity = Product.__dict__['quantity']
+    metrics.enable()
+    assert metrics.is_enabled()
+    assert Product.__dict__['buy'] is not original_buy
+    metrics.disable()
+    assert Product.__dict__['buy'] is original_buy
+    assert Product.__dict__['quantity'] is original_quantity
+    metrics.reset()
+
+    Product("Example Product", 10.99, 5).buy(1)
+    assert metrics.snapshot() == {'functions': {}, 'counters': {}}
+
+
+def test_metrics_time_pricing_by_promotion_type(instrumented):
+    macbook = Product("MacBook Air M2", price=1450, quantity=300)
+    macbook.promotion = promotions.SecondHalfPrice("Second Half!")
+    pixel = Product("Google Pixel 7", price=500, quantity=300)
+    store = Store([macbook, pixel])
+    for _ in range(100):
+        store.order([(macbook, 2), (pixel, 1)])
+    store.order([(macbook, 2)], cents=True)
+
+    functions = metrics.snapshot()['functions']
+    assert functions['Product.get_price[SecondHalfPrice]']['count'] == 100
+    assert functions['Product.get_price[none]']['count'] == 100
+    assert functions['Product.get_price_cents[SecondHalfPrice]'][
+        'count'] == 1
+    assert functions['SecondHalfPrice.apply_promotion_cents'][
+        'count'] == 1
@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+import money
+import promotions
+from products import Product
+from products import LimitedProduct
+from products import NonStockedProduct
+from store import Store
+
+
+def test_conversions_and_rounding():
+    assert money.to_cents(10.99) == 1099
+    assert money.to_cents(3) == 300
+    assert money.to_cents('0.005') == 1
+    assert money.to_cents(Decimal('2.344')) == 234
+    assert money.to_decimal(1099) == Decimal('10.99')
+    assert money.format_cents(-5) == '-0.05'
+    assert money.divide(5, 1, 2) == 3  # half a cent rounds up
+    assert money.divide(-5, 1, 2) == -3
+    assert money.percent_of(999, 12.5) == 125
+
+
+def test_promotions_in_cents():
+    product = Product("Example Product", 10.99, 100)
+    assert product.price_cents == 1099
+    assert product.get_price_cents(3) == 3297
+
+    product.promotion = promotions.SecondHalfPrice("Second Half!")
+    assert product.get_price_cents(3) == 1099 * 2 + 550
+    product.promotion = promotions.ThirdOneFree("Third One Free!")
+    assert product.get_price_cents(3) == 2198
+    product.promotion = promotions.PercentDiscount("30% off!", percent=30)
+    assert product.get_price_cents(3) == 1099 - 330
+    product.promotion = promotions.PromotionStack([
+        promotions.SecondHalfPrice("Second Half!"),
+        promotions.ThirdOneFree("Third One Free!")])
+    assert product.get_price_cents(3) == 2198
+
+    # The discounted price is rounded half up, not the discount
+    nickel = Product("Sticker", 0.05, 10)
+    nickel.promotion = promotions.PercentDiscount("30% off!", percent=30)
+    assert nickel.get_price_cents(1) == 4  # 3.5 cents
+    product.promotion = promotions.PercentDiscount("50% off!", percent=50)
+    assert product.get_price_cents(1) == 550  # 549.5 cents
+    product.promotion = promotions.PercentDiscount("12.5% off!",
+                                                   percent=12.5)
+    assert product.get_price_cents(1) == 962  # 961.625 cents
+    product.promotion = promotions.PromotionStack([
+        promotions.SecondHalfPrice("Second Half!"),
+        promotions.ThirdOneFree("Third One Free!")])
+
+    assert product.buy(3, cents=True) == 2198
+    assert product.quantity == 97
+    assert NonStockedProduct("Windows License", 125).buy(2, cents=True) \
+        == 25000
+    assert LimitedProduct("Shipping", 10, 250, maximum=1).buy(
+        1, cents=True) == 1000
+
+
+def test_cents_orders_add_up_exactly():
+    product = Product("Example Product", 0.1, 10 ** 6)
+    store = Store([product])
+    results = store.place_orders([[(product, 1)]] * 1000, cents=True)
+    assert sum(result.total_price for result in results) == 10000
+    assert store.order([(product, 3)], cents=True) == 30
+    assert store.quote([(product, 3)]).total_price == 0.1 * 3
+    assert product.quantity == 10 ** 6 - 1003
@@ -0,0 +1,47 @@
+import asyncio
+import pytest
+from products import Product
+from store import Store
+from order_service import OrderService
+
+
+class CountingProduct(Product):
+    # Counts how many times the stock of the product is written
+    writes = 0
+
+    @Product.quantity.setter
+    def quantity(self, quantity):
+        CountingProduct.writes += 1
+        Product.quantity.fset(self, quantity)
+
+
+def test_service_coalesces_orders_and_resolves_each_caller():
+    CountingProduct.writes = 0
+    macbook = CountingProduct("MacBook Air M2", price=1450, quantity=10)
+    pixel = Product("Google Pixel 7", price=500, quantity=250)
+    store = Store([macbook, pixel])
+
+    async def shop():
+        async with OrderService(store, window=0.05) as service:
+            orders = [service.order([(macbook, 1), (pixel, 2)])
+                      for _ in range(10)]
+            orders.append(service.order([(macbook, 1)]))
+            return await asyncio.gather(*orders, return_exceptions=True)
+
+    totals = asyncio.run(shop())
+    assert totals[:10] == [1450 + 1000] * 10
+    assert isinstance(totals[10], ValueError)
+    assert macbook.quantity == 0 and pixel.quantity == 230
+    # All ten accepted orders took the MacBook stock in one write
+    assert CountingProduct.writes == 1
+    assert store.check_consistency()
+
+
+def test_service_must_be_running():
+    store = Store([Product("MacBook Air M2", price=1450, quantity=10)])
+
+    async def shop():
+        await OrderService(store).order([])
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(shop())
@@ -0,0 +1,55 @@
+import random
+import pytest
+import promotions
+from products import Product
+from products import NonStockedProduct
+from products import LimitedProduct
+from columnar import ColumnarStore
+from pricing import price_lines
+from pricing import price_carts
+
+
+def test_batch_pricing_matches_apply_promotion():
+    class FlatFee(promotions.Promotion):
+        discount_name = "Flat fee"
+
+        def apply_promotion(self, product, quantity) -> float:
+            return product.price + quantity
+
+    promotion_list = [None,
+                      promotions.SecondHalfPrice("Second Half!"),
+                      promotions.ThirdOneFree("Third One Free!"),
+                      promotions.PercentDiscount("30% off!", percent=30),
+                      promotions.PercentDiscount("12.5% off!", percent=12.5),
+                      FlatFee()]
+    random_gen = random.Random(7)
+    product_list = []
+    for number in range(60):
+        price = round(random_gen.uniform(0.01, 2000), 2)
+        if number % 10 == 0:
+            product = LimitedProduct(f"Limited {number}", price, 10 ** 6,
+                                     maximum=random_gen.randint(1, 3))
+        elif number % 10 == 1:
+            product = NonStockedProduct(f"Service {number}", price)
+        else:
+            product = Product(f"Item {number}", price, 10 ** 6)
+        product.promotion = promotion_list[number % len(promotion_list)]
+        product_list.append(product)
+    store = ColumnarStore(product_list)
+
+    rows = [random_gen.randrange(60) for _ in range(3000)]
+    quantities = [random_gen.randint(1, 50) for _ in range(3000)]
+    expected = [product_list[row].buy(quantity)
+                for row, quantity in zip(rows, quantities)]
+    total_quantity = store.get_total_quantity()
+    assert price_lines(store, rows, quantities).tolist() == expected
+    # Pricing never changes the stock
+    assert store.get_total_quantity() == total_quantity
+
+    carts = [line % 7 for line in range(3000)]
+    cart_totals = price_carts(store, carts, rows, quantities)
+    for cart in range(7):
+        assert cart_totals[cart] == pytest.approx(sum(expected[cart::7]))
+
+    with pytest.raises(TypeError):
+        price_lines(store, [0], [1.5])
@@ -1,5 +1,7 @@
 import pytest
+import promotions
 from products import Product
+from products import NonStockedProduct
 
 
 def test_create_product():
@@ -87,3 +89,64 @@ def test_buy_too_much():
 
     with pytest.raises(ValueError):
         product.buy(6)
+
+
+def test_compiled_promotions_match_apply_promotion():
+    product = Product("Example Product", 10.99, 100)
+    for promotion in (promotions.SecondHalfPrice("Second Half!"),
+                      promotions.ThirdOneFree("Third One Free!"),
+                      promotions.PercentDiscount("30% off!", percent=30)):
+        product.promotion = promotion
+        for quantity in range(12):
+            assert product.get_price(quantity) == \
+                promotion.apply_promotion(product, quantity)
+
+
+def test_stacked_promotions_give_the_best_price():
+    product = Product("Example Product", 100, 100)
+    product.promotion = promotions.PromotionStack([
+        promotions.SecondHalfPrice("Second Half!"),
+        promotions.ThirdOneFree("Third One Free!")])
+    assert product.promotion.discount_name == \
+        "Second Half! / Third One Free!"
+    assert product.get_price(2) == 150  # second half price wins
+    assert product.get_price(3) == 200  # third one free wins
+    assert product.get_price(1) == 100
+    with pytest.raises(ValueError):
+        promotions.PromotionStack([])
+
+
+def test_memoized_price_follows_changes():
+    product = Product("Example Product", 100, 100)
+    assert product.get_price(3) == 300
+    product.price = 10
+    assert product.get_price(3) == 30
+    product.promotion = promotions.ThirdOneFree("Third One Free!")
+    assert product.get_price(3) == 20
+
+    discount = promotions.PercentDiscount("10% off!", percent=10)
+    product.promotion = discount
+    assert product.get_price(3) == 9
+    discount.percent = 50  # changed in place, the version goes up
+    assert product.get_price(3) == 5
+    assert product.get_price_cents(3) == 500
+
+    stack = promotions.PromotionStack([discount])
+    product.promotion = stack
+    discount.percent = 20
+    assert product.get_price(3) == 8
+
+    # Swapping the promotions of a stack never gives an old version back
+    stack = promotions.PromotionStack([
+        promotions.PercentDiscount("50% off!", percent=50)])
+    product.promotion = stack
+    assert product.get_price(2) == 5
+    stack.promotions = (promotions.SecondHalfPrice("Second Half!"),)
+    assert product.get_price(2) == 15
+
+
+def test_non_stocked_product_without_promotion_prints():
+    product = NonStockedProduct("Windows License", price=125)
+    assert str(product) == 'Windows License, Price: 125'
+    product.promotion = promotions.PercentDiscount("30% off!", percent=30)
+    assert str(product) == 'Windows License, Price: 125, Promotion: 30% off!'
@@ -0,0 +1,123 @@
+import threading
+import pytest
+from products import Product
+from products import NonStockedProduct
+from store import Store
+from sharding import ShardedStore
+
+
+def make_products():
+    return [Product(f"Item {number}", price=10, quantity=5)
+            for number in range(20)] + \
+        [NonStockedProduct("Windows License", price=125)]
+
+
+def test_sharded_store_routes_and_gathers():
+    with ShardedStore(make_products(), shards=3) as store:
+        assert len(store) == 21
+        assert store.get_total_quantity() == 100
+        assert len(store.get_all_products()) == 21
+
+        total = store.order([("Item 1", 2), ("Item 7", 5),
+                             ("Windows License", 1)])
+        assert total == 20 + 50 + 125 * 1
+        assert store.get_total_quantity() == 93
+        # Item 7 sold out and is no longer listed
+        assert len(store.get_all_products()) == 20
+
+
+def test_sharded_order_is_all_or_nothing():
+    with ShardedStore(make_products(), shards=3) as store:
+        result = store.place_order([("Item 1", 2), ("Item 2", 5),
+                                    ("Item 3", 6), ("Unknown", 1)])
+        assert not result.ok
+        assert [line.error for line in result.errors] == \
+            ["Insufficient quantity.", "Product is not in store."]
+        assert store.get_total_quantity() == 100
+        assert len(store.get_all_products()) == 21
+
+
+def test_sharded_store_rebalances():
+    with ShardedStore(make_products(), shards=2) as store:
+        store.order([("Item 4", 5)])
+        store.rebalance(4)
+        assert store.shards == 4
+        assert len(store) == 21
+        assert store.get_total_quantity() == 95
+
+        extra = Store([Product("Google Pixel 7", price=500, quantity=250)])
+        with store + extra as merged:
+            assert merged.shards == 4
+            assert merged.get_total_quantity() == 345
+            assert len(merged) == 22
+
+
+def test_sharded_store_rejects_zero_shards():
+    with pytest.raises(ValueError):
+        ShardedStore(make_products(), shards=0)
+    with ShardedStore(make_products(), shards=2) as store:
+        with pytest.raises(ValueError):
+            store.rebalance(0)
+        assert store.shards == 2
+
+
+def test_sharded_quote_contains_and_batch():
+    with ShardedStore(make_products(), shards=3) as store:
+        assert "Item 3" in store
+        assert "Unknown" not in store
+        quote = store.quote([("Item 1", 2), ("Windows License", 2)])
+        assert quote.ok and quote.total_price == 20 + 250
+        assert store.get_total_quantity() == 100
+
+        results = store.place_orders([[("Item 1", 3), ("Item 2", 1)],
+                                      [("Item 1", 3)],
+                                      [("Item 1", 2), ("Item 5", 5)]])
+        assert [result.ok for result in results] == [True, False, True]
+        assert store.get_total_quantity() == 100 - 4 - 7
+        assert "Item 1" not in store
+        assert "Item 5" not in store
+
+
+def test_sharded_batch_is_one_round_trip_per_shard(monkeypatch):
+    with ShardedStore(make_products(), shards=3) as store:
+        exchanges = []
+        exchange = store._exchange
+
+        def counting_exchange(requests):
+            exchanges.append(sorted(requests))
+            return exchange(requests)
+
+        monkeypatch.setattr(store, '_exchange', counting_exchange)
+        shopping_lists = [[(f"Item {number}", 1), ("Windows License", 1)]
+                          for number in range(20)]
+        shopping_lists.append([("Item 0", 5)])
+        results = store.place_orders(shopping_lists)
+        assert exchanges == [[0, 1, 2]]
+        assert [result.ok for result in results] == [True] * 20 + [False]
+        monkeypatch.undo()
+        assert store.get_total_quantity() == 100 - 20
+
+
+def test_sharded_orders_from_many_threads():
+    with ShardedStore(make_products(), shards=4) as store:
+        def place(number):
+            for _ in range(5):
+                store.order([(f"Item {number}", 1)])
+
+        threads = [threading.Thread(target=place, args=(number,))
+                   for number in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert store.get_total_quantity() == 0
+        assert len(store.get_all_products()) == 1
+
+
+def test_sharded_merge_keeps_one_product_per_name():
+    with ShardedStore(make_products(), shards=3) as store:
+        extra = Store([Product("Item 1", price=10, quantity=7)])
+        with store + extra as merged:
+            assert len(merged) == 21
+            assert merged.get_total_quantity() == 107
+            assert merged.order([("Item 1", 12)]) == 120
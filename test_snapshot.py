@@ -0,0 +1,65 @@
+import pytest
+import promotions
+from products import Product
+from products import NonStockedProduct
+from products import LimitedProduct
+from store import Store
+from snapshot import Snapshot
+from snapshot import SnapshotError
+from snapshot import save_snapshot
+from snapshot import load_store
+
+
+def make_store():
+    second_half_price = promotions.SecondHalfPrice("Second Half price!")
+    product_list = [Product("MacBook Air M2", price=1450, quantity=100),
+                    Product("Bose QuietComfort Earbuds",
+                            price=250.5, quantity=500, active=False),
+                    NonStockedProduct("Windows License", price=125),
+                    LimitedProduct("Shipping", price=10, quantity=250,
+                                   maximum=2)
+                    ]
+    product_list[0].promotion = second_half_price
+    product_list[1].promotion = second_half_price
+    product_list[2].promotion = promotions.PercentDiscount("30% off!",
+                                                           percent=30)
+    return Store(product_list)
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = tmp_path / "inventory.snap"
+    store = make_store()
+    save_snapshot(store, path)
+
+    loaded = load_store(path)
+    assert [str(item) for item in loaded.product] == \
+        [str(item) for item in store.product]
+    assert [type(item) for item in loaded.product] == \
+        [type(item) for item in store.product]
+    assert loaded.get_product("Shipping").maximum == 2
+    assert loaded.get_product("Bose QuietComfort Earbuds").active is False
+    assert loaded.product[0].promotion is loaded.product[1].promotion
+    assert loaded.product[2].promotion.percent == 30
+    assert loaded.get_total_quantity() == store.get_total_quantity()
+
+
+def test_snapshot_builds_products_lazily(tmp_path):
+    path = tmp_path / "inventory.snap"
+    save_snapshot(make_store(), path)
+
+    with Snapshot(path) as snapshot:
+        assert len(snapshot) == 4
+        assert snapshot.get_total_quantity() == 850
+        assert snapshot._products == {}
+        assert snapshot[-1].name == "Shipping"
+        assert snapshot[3] is snapshot[-1]
+        assert snapshot.find("Windows License").price == 125
+        assert snapshot.find("Unknown") is None
+        assert len(snapshot._products) == 2
+
+
+def test_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / "inventory.snap"
+    path.write_bytes(b"not a snapshot file at all, just some bytes")
+    with pytest.raises(SnapshotError):
+        Snapshot(path)
@@ -0,0 +1,529 @@
+import random
+import threading
+
+import pytest
+import indexes
+import promotions
+from products import Product
+from products import LimitedProduct
+from products import NonStockedProduct
+from store import Store
+
+
+def test_get_product_by_name():
+    # Create a store
+    macbook = Product("MacBook Air M2", price=1450, quantity=100)
+    pixel = Product("Google Pixel 7", price=500, quantity=250)
+    store = Store([macbook, pixel])
+
+    assert store.get_product("Google Pixel 7") is pixel
+    assert store.get_product("Unknown") is None
+
+
+def test_contains_uses_name_not_price():
+    # Two different products with the same price
+    earbuds = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    speaker = Product("Bose SoundLink", price=250, quantity=10)
+    store = Store([earbuds])
+
+    assert "Bose QuietComfort Earbuds" in store
+    assert earbuds in store
+    assert speaker not in store
+    assert "Bose SoundLink" not in store
+
+    earbuds.deactivate()
+    assert "Bose QuietComfort Earbuds" not in store
+
+
+def test_remove_product_updates_index():
+    # Products with equal prices must not be confused on removal
+    first = Product("First", price=10, quantity=1)
+    second = Product("Second", price=10, quantity=1)
+    store = Store([first, second])
+
+    store.remove_product(second)
+    assert store.product == [first] and store.product[0] is first
+    assert store.get_product("Second") is None
+    assert store.get_product("First") is first
+
+    with pytest.raises(ValueError):
+        store.remove_product(second)
+
+
+def test_add_stores_keeps_index():
+    macbook = Product("MacBook Air M2", price=1450, quantity=100)
+    pixel = Product("Google Pixel 7", price=500, quantity=250)
+    merged = Store([macbook]) + Store([pixel])
+
+    assert merged.get_product("MacBook Air M2") is macbook
+    assert merged.get_product("Google Pixel 7") is pixel
+    assert len(merged.product) == 2
+
+
+def test_active_products_view_tracks_changes():
+    macbook = Product("MacBook Air M2", price=1450, quantity=2)
+    pixel = Product("Google Pixel 7", price=500, quantity=250)
+    store = Store([macbook, pixel])
+
+    view = store.active_products
+    version = store.active_version
+    assert view == (macbook, pixel)
+    # Unchanged store hands out the same view
+    assert store.active_products is view
+
+    macbook.buy(2)  # Selling out deactivates the product
+    assert store.active_version != version
+    assert store.active_products == (pixel,)
+
+    macbook.active = True
+    pixel.deactivate()
+    assert store.active_products == (macbook,)
+    assert store.get_all_products() == [macbook]
+
+    store.remove_product(macbook)
+    assert store.active_products == ()
+
+
+def test_total_quantity_is_maintained_on_write():
+    macbook = Product("MacBook Air M2", price=1450, quantity=100)
+    pixel = Product("Google Pixel 7", price=500, quantity=250)
+    store = Store([macbook, pixel])
+    assert store.get_total_quantity() == 350
+
+    macbook.buy(10)
+    pixel.quantity = 200
+    assert store.get_total_quantity() == 290
+    assert store.check_consistency()
+
+    store.remove_product(pixel)
+    assert store.get_total_quantity() == 90
+
+    merged = store + Store([Product("Shipping", price=10, quantity=5)])
+    assert merged.get_total_quantity() == 95
+    macbook.buy(5)  # Shared products update both stores
+    assert store.get_total_quantity() == 85
+    assert merged.get_total_quantity() == 90
+    assert store.check_consistency() and merged.check_consistency()
+
+
+def test_order_is_all_or_nothing():
+    macbook = Product("MacBook Air M2", price=1450, quantity=100)
+    pixel = Product("Google Pixel 7", price=500, quantity=250)
+    shipping = LimitedProduct("Shipping", price=10, quantity=1, maximum=1)
+    store = Store([macbook, pixel, shipping])
+
+    result = store.place_order([(macbook, 10), (pixel, 5), (pixel, 246),
+                                (shipping, 1), (shipping, 1)])
+    assert not result.ok
+    assert [line.error for line in result.errors] == \
+        ["Insufficient quantity.", "Insufficient quantity."]
+    assert result.total_price is None
+    # Nothing was taken from stock
+    assert macbook.quantity == 100 and pixel.quantity == 250
+    assert shipping.quantity == 1
+
+    with pytest.raises(ValueError):
+        store.order([(macbook, 1), (pixel, 251)])
+    assert macbook.quantity == 100
+
+    assert store.order([(macbook, 2), (pixel, 250), (shipping, 3)]) == \
+        1450 * 2 + 500 * 250 + 10
+    assert pixel.quantity == 0 and pixel.active is False
+    assert store.get_total_quantity() == 98
+    assert store.check_consistency()
+
+
+def test_order_rejects_invalid_lines():
+    macbook = Product("MacBook Air M2", price=1450, quantity=100)
+    outsider = Product("Not Sold Here", price=1, quantity=1)
+    store = Store([macbook])
+
+    result = store.place_order([(macbook, "2"), (macbook, 0),
+                                (outsider, 1), (macbook, 1)])
+    assert [line.ok for line in result.lines] == [False, False, False, True]
+    assert result.lines[3].price == 1450
+    assert macbook.quantity == 100
+
+
+def test_concurrent_orders_never_oversell():
+    import threading
+
+    product_list = [Product(f"Item {number}", price=1, quantity=200)
+                    for number in range(20)]
+    store = Store(product_list, lock_stripes=8)
+    sold = []
+
+    def shopper(seed):
+        random_gen = random.Random(seed)
+        for _ in range(300):
+            lines = [(random_gen.choice(product_list),
+                      random_gen.randint(1, 5))
+                     for _ in range(random_gen.randint(1, 4))]
+            result = store.place_order(lines)
+            if result.ok:
+                sold.append(sum(line.quantity for line in result.lines))
+
+    threads = [threading.Thread(target=shopper, args=(seed,))
+               for seed in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(item.quantity >= 0 for item in product_list)
+    assert sum(sold) == 20 * 200 - store.get_total_quantity()
+    assert store.check_consistency()
+
+
+def test_add_merges_products_with_the_same_name():
+    west = Store([Product("MacBook Air M2", price=1450, quantity=100),
+                  Product("Google Pixel 7", price=500, quantity=250)])
+    east = Store([Product("MacBook Air M2", price=1400, quantity=20),
+                  Product("Bose QuietComfort Earbuds", price=250,
+                          quantity=500)])
+    merged = west + east
+
+    assert [item.name for item in merged.product] == \
+        ["MacBook Air M2", "Google Pixel 7", "Bose QuietComfort Earbuds"]
+    macbook = merged.get_product("MacBook Air M2")
+    assert macbook.quantity == 120 and macbook.price == 1450
+    # Neither source store changes
+    assert west.get_product("MacBook Air M2").quantity == 100
+    assert east.get_product("MacBook Air M2").quantity == 20
+    assert macbook is not west.get_product("MacBook Air M2")
+    assert merged.get_total_quantity() == 870
+    assert merged.check_consistency()
+
+    cheapest = west.merge(east, conflict='lowest_price')
+    assert cheapest.get_product("MacBook Air M2").price == 1400
+
+    with pytest.raises(ValueError):
+        west.merge(east, conflict='average')
+
+
+def test_merge_from_folds_stock_in_place():
+    macbook = Product("MacBook Air M2", price=1450, quantity=0)
+    store = Store([macbook])
+    promotion = promotions.PercentDiscount("30% off!", percent=30)
+    incoming = Product("MacBook Air M2", price=1400, quantity=20)
+    incoming.promotion = promotion
+    pixel = Product("Google Pixel 7", price=500, quantity=250)
+
+    store.merge_from(Store([incoming, pixel]), conflict='other')
+    assert store.product == [macbook, pixel]
+    assert store.product[0] is macbook
+    assert macbook.quantity == 20 and macbook.active is True
+    assert macbook.price == 1400 and macbook.promotion is promotion
+    assert store.get_total_quantity() == 270
+    assert store.check_consistency()
+
+
+def test_price_queries_follow_changes():
+    macbook = Product("MacBook Air M2", price=1450, quantity=100)
+    earbuds = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    pixel = Product("Google Pixel 7", price=500, quantity=250)
+    store = Store([macbook, earbuds, pixel])
+
+    assert store.products_in_price_range(200, 600) == [earbuds, pixel]
+    assert store.cheapest(2) == [earbuds, pixel]
+    assert store.most_expensive(1) == [macbook]
+
+    pixel.price = 199
+    assert store.cheapest(1)[0] is pixel
+    earbuds.deactivate()
+    assert store.products_in_price_range(200, 600) == []
+    earbuds.active = True
+    store.remove_product(macbook)
+    assert store.most_expensive(5) == [earbuds, pixel]
+    store.add_product(Product("Shipping", price=250, quantity=1))
+    assert sorted(item.name for item in
+                  store.products_in_price_range(250, 250)) == \
+        ["Bose QuietComfort Earbuds", "Shipping"]
+    assert store.check_consistency()
+
+    with pytest.raises(ValueError):
+        pixel.price = -1
+
+
+def test_lowest_stock_and_alerts():
+
+    random_gen = random.Random(3)
+    product_list = [Product(f"Item {number}", price=1,
+                            quantity=random_gen.randint(6, 100))
+                    for number in range(50)]
+    store = Store(product_list +
+                  [NonStockedProduct("Windows License", price=125)])
+    alerts = []
+
+    def alert(product, quantity):
+        alerts.append((product.name, quantity))
+
+    store.add_stock_alert(5, alert)
+
+    for _ in range(300):
+        product = random_gen.choice(product_list)
+        if product.quantity:
+            store.order([(product, random_gen.randint(1, product.quantity))])
+        lowest = store.lowest_stock(5)
+        assert [item.quantity for item in lowest] == \
+            sorted(item.quantity for item in product_list)[:5]
+    assert store.check_consistency()
+
+    crossed = [name for name, quantity in alerts]
+    assert len(crossed) == len(set(crossed))
+    assert all(quantity <= 5 for _, quantity in alerts)
+    assert set(crossed) == {item.name for item in product_list
+                            if item.quantity <= 5}
+
+    alerts.clear()
+    product_list[0].quantity = 100
+    product_list[0].quantity = 1
+    assert alerts == [("Item 0", 1)]
+    store.remove_stock_alert(alert)
+    product_list[0].quantity = 100
+    product_list[0].quantity = 1
+    assert len(alerts) == 1
+
+
+def test_quote_prices_without_taking_stock():
+    macbook = Product("MacBook Air M2", price=1450, quantity=10)
+    earbuds = Product("Bose QuietComfort Earbuds", price=250, quantity=2)
+    store = Store([macbook, earbuds])
+
+    result = store.quote([(macbook, 3), (earbuds, 1)])
+    assert result.ok
+    assert [line.price for line in result.lines] == [4350, 250]
+    assert result.total_price == 4600
+    assert macbook.quantity == 10
+    assert store.get_total_quantity() == 12
+    assert store.quote([(earbuds, 5)]).errors[0].error == \
+        "Insufficient quantity."
+
+    # Cached line prices follow price and promotion changes
+    macbook.price = 1000
+    assert store.quote([(macbook, 3)]).total_price == 3000
+    discount = promotions.PercentDiscount("10% off!", percent=10)
+    macbook.promotion = promotions.ThirdOneFree("Third One Free!")
+    assert store.quote([(macbook, 3)]).total_price == 2000
+    macbook.promotion = discount
+    assert store.quote([(macbook, 3)]).total_price == 900
+    discount.percent = 50
+    assert store.quote([(macbook, 3)]).total_price == 500
+    assert store.order([(macbook, 3)]) == 500
+    assert macbook.quantity == 7
+
+
+def test_search_by_prefix_and_pages():
+    product_list = [Product(f"Pixel {number} Case", price=10, quantity=5)
+                    for number in range(25)]
+    pixel = Product("Google Pixel 7", price=500, quantity=1)
+    macbook = Product("MacBook Air M2", price=1450, quantity=100)
+    store = Store(product_list + [pixel, macbook])
+
+    assert store.search("mac air") == ([macbook], 1)
+    assert store.search("AIR m") == ([macbook], 1)
+    assert store.search("pixel google")[0] == [pixel]
+    page, total = store.search("pix", page=3, per_page=10)
+    assert total == 26
+    assert [item.name for item in page] == \
+        sorted(item.name for item in product_list + [pixel])[20:]
+    assert store.search("case 1", per_page=50)[1] == 11  # 1, 10 to 19
+    assert store.search("case 1")[0][0].name == "Pixel 1 Case"
+    assert store.search("nothing") == ([], 0)
+    assert store.search("", per_page=100)[1] == 27
+    # Products are listed once even with several words matching
+    pix = Product("Pixie Pixel Bundle", price=1, quantity=1)
+    store.add_product(pix)
+    assert store.search("pix", per_page=50)[0] == \
+        sorted(product_list + [pixel, pix], key=lambda item: item.name)
+    store.remove_product(pix)
+
+    pixel.buy(1)  # sold out products are not found
+    store.remove_product(macbook)
+    assert store.search("pixel google") == ([], 0)
+    assert store.search("mac") == ([], 0)
+    assert store.search("pix")[1] == 25
+    assert store.check_consistency()
+    with pytest.raises(ValueError):
+        store.search("pix", page=0)
+
+
+def test_snapshot_is_frozen_while_orders_go_on():
+    macbook = Product("MacBook Air M2", price=1450, quantity=10)
+    earbuds = Product("Bose QuietComfort Earbuds", price=250, quantity=2)
+    pixel = Product("Google Pixel 7", price=500, quantity=5)
+    store = Store([macbook, earbuds, pixel])
+
+    with store.snapshot() as snapshot:
+        store.order([(macbook, 3), (earbuds, 2)])
+        macbook.price = 1000
+        macbook.promotion = promotions.ThirdOneFree("Third One Free!")
+        store.remove_product(pixel)
+        pixel.quantity = 0
+        store.add_product(Product("Windows License", price=125,
+                                  quantity=1))
+
+        assert snapshot.get_total_quantity() == 17
+        assert snapshot.get_inventory_value() == 1450 * 10 + 250 * 2 + \
+            500 * 5
+        frozen = snapshot.get_all_products()
+        assert [(item.name, item.quantity, item.price) for item in frozen] \
+            == [("MacBook Air M2", 10, 1450),
+                ("Bose QuietComfort Earbuds", 2, 250),
+                ("Google Pixel 7", 5, 500)]
+        assert frozen[0].promotion is None
+        assert frozen[0].buy(1) == 1450  # copies are detached
+        assert snapshot.get_product("Windows License") is None
+        assert snapshot.get_product("Google Pixel 7").active is True
+        assert snapshot.value_of(earbuds, 'active') is True
+        assert len(snapshot.product) == 3
+
+        # The store itself moved on
+        assert store.get_total_quantity() == 8
+        assert macbook.quantity == 7
+        assert store.check_consistency()
+    assert len(store._snapshots) == 0
+    with pytest.raises(ValueError):
+        snapshot.get_total_quantity()
+
+
+def test_merged_stores_do_not_pile_up_on_products():
+    macbook = Product("MacBook Air M2", price=1450, quantity=100)
+    store = Store([macbook])
+    other = Store([Product("Google Pixel 7", price=500, quantity=250)])
+    for _ in range(2000):
+        store + other
+    assert len(macbook._observers) == 1
+    store.order([(macbook, 1)])
+    assert macbook.quantity == 99
+
+
+def test_reactivated_product_keeps_its_place():
+    product_list = [Product(f"Item {number}", price=10, quantity=5)
+                    for number in range(4)]
+    store = Store(product_list)
+    product_list[1].deactivate()
+    product_list[1].active = True
+    assert store.get_all_products() == product_list
+
+
+def test_failing_stock_alert_does_not_fail_the_order(caplog):
+    macbook = Product("MacBook Air M2", price=1450, quantity=3)
+    pixel = Product("Google Pixel 7", price=500, quantity=3)
+    store = Store([macbook, pixel])
+    alerts = []
+
+    def broken(product, quantity):
+        raise RuntimeError("Pager is down.")
+
+    def alert(product, quantity):
+        # The whole order is taken before any alert runs
+        alerts.append((product.name, quantity,
+                       store.get_total_quantity()))
+
+    store.add_stock_alert(1, broken)
+    store.add_stock_alert(1, alert)
+    result = store.place_order([(macbook, 2), (pixel, 3)])
+    assert result.ok
+    assert alerts == [("MacBook Air M2", 1, 1), ("Google Pixel 7", 0, 1)]
+    assert macbook.quantity == 1 and pixel.quantity == 0
+    assert "Pager is down." in caplog.text
+
+
+def test_snapshot_reads_products_outside_the_lock():
+    product_list = [Product(f"Item {number}", price=10, quantity=5)
+                    for number in range(4)]
+    store = Store(product_list, lock_stripes=4)
+    with store.snapshot() as snapshot:
+        product_list[0].deactivate()
+        product_list[0].active = True
+        product_list[2].quantity = 1
+        assert [item.name for item in snapshot.get_all_products()] == \
+            [item.name for item in product_list]
+        # Products changed while the view reads them keep their old values
+        members, before = snapshot._members()
+        product_list[1].deactivate()
+        product_list[3].price = 20
+        frozen = snapshot._freeze(members, before)
+        assert [item.active for item in frozen] == [True] * 4
+        assert [item.quantity for item in frozen] == [5, 5, 5, 5]
+        assert [item.name for item in snapshot.get_all_products()] == \
+            [item.name for item in product_list]
+        assert snapshot.get_inventory_value() == 4 * 10 * 5
+
+
+def test_price_index_matches_sorted_prices_across_blocks(monkeypatch):
+    monkeypatch.setattr(indexes, 'BLOCK_SIZE', 4)
+    random_gen = random.Random(3)
+    product_list = [Product(f"Item {number}",
+                            price=random_gen.randint(1, 50), quantity=5)
+                    for number in range(200)]
+    store = Store(product_list[:150])
+    store.add_products(product_list[150:190])
+    for product in product_list[190:]:
+        store.add_product(product)
+
+    def expected():
+        return sorted((item for item in product_list if item.active),
+                      key=lambda item: (item.price, id(item)))
+
+    for _ in range(300):
+        product = random_gen.choice(product_list)
+        if random_gen.random() < 0.5:
+            product.price = random_gen.randint(1, 50)
+        else:
+            product.active = not product.active
+    def ids(product_list):
+        return [id(item) for item in product_list]
+
+    assert ids(store.cheapest(500)) == ids(expected())
+    assert ids(store.most_expensive(7)) == ids(expected()[::-1][:7])
+    assert ids(store.products_in_price_range(10, 20)) == \
+        ids([item for item in expected() if 10 <= item.price <= 20])
+    assert store.check_consistency()
+
+
+def test_search_postings_across_blocks(monkeypatch):
+    monkeypatch.setattr(indexes, 'BLOCK_SIZE', 4)
+    random_gen = random.Random(5)
+    product_list = [Product(f"Case {random_gen.randint(0, 99)} Pixel",
+                            price=10, quantity=5) for _ in range(60)]
+    store = Store(product_list[:40])
+    for product in product_list[40:]:
+        store.add_product(product)
+    for product in random_gen.sample(product_list, 20):
+        product.deactivate()
+
+    def ids(items):
+        return [id(item) for item in items]
+
+    expected = sorted((item for item in product_list if item.active),
+                      key=lambda item: (item.name, id(item)))
+    assert ids(store.search("pix", per_page=100)[0]) == ids(expected)
+    assert ids(store.search("case 1 pi", per_page=100)[0]) == \
+        ids([item for item in expected
+             if item.name.split()[1].startswith("1")])
+    assert store.check_consistency()
+
+
+def test_stock_alert_may_order_from_a_locked_store():
+    macbook = Product("MacBook Air M2", price=1450, quantity=3)
+    restock = Product("MacBook Air M2 Refurbished", price=1000, quantity=9)
+    store = Store([macbook, restock], lock_stripes=1)
+    store.add_stock_alert(1, lambda product, quantity:
+                          store.order([(restock, 1)]))
+    cart = [store.hold([(macbook, 1)])]
+    finished = []
+
+    def shop():
+        store.order([(macbook, 2)])
+        store.checkout(cart)
+        store.place_orders([[(restock, 7)]])
+        finished.append(True)
+
+    thread = threading.Thread(target=shop, daemon=True)
+    thread.start()
+    thread.join(5)
+    assert finished, "an alert ordering from the store deadlocked"
+    assert macbook.quantity == 0
+    assert restock.quantity == 0